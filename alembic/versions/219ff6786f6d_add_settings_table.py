@@ -20,56 +20,19 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('classes',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('name', sa.String(), nullable=False),
-    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
-    sa.PrimaryKeyConstraint('id'),
-    sa.UniqueConstraint('name')
-    )
-    op.create_table('images',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('path', sa.String(), nullable=False),
-    sa.Column('width', sa.Integer(), nullable=True),
-    sa.Column('height', sa.Integer(), nullable=True),
-    sa.Column('depth', sa.Integer(), nullable=True),
-    sa.PrimaryKeyConstraint('id'),
-    sa.UniqueConstraint('path')
-    )
+    # The initial migration already creates every other table; only the
+    # settings table is new here. It may also exist already when
+    # Base.metadata.create_all ran against a database stuck at the
+    # previous revision.
+    if sa.inspect(op.get_bind()).has_table("settings"):
+        return
     op.create_table('settings',
     sa.Column('key', sa.String(), nullable=False),
     sa.Column('value', sa.String(), nullable=True),
     sa.PrimaryKeyConstraint('key')
     )
-    op.create_table('undo_history',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('action_type', sa.String(), nullable=False),
-    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
-    sa.Column('details', sa.Text(), nullable=True),
-    sa.PrimaryKeyConstraint('id')
-    )
-    op.create_table('annotations',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('image_id', sa.Integer(), nullable=False),
-    sa.Column('class_id', sa.Integer(), nullable=False),
-    sa.Column('xmin', sa.Integer(), nullable=True),
-    sa.Column('ymin', sa.Integer(), nullable=True),
-    sa.Column('xmax', sa.Integer(), nullable=True),
-    sa.Column('ymax', sa.Integer(), nullable=True),
-    sa.ForeignKeyConstraint(['class_id'], ['classes.id'], ),
-    sa.ForeignKeyConstraint(['image_id'], ['images.id'], ),
-    sa.PrimaryKeyConstraint('id')
-    )
-    # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('annotations')
-    op.drop_table('undo_history')
     op.drop_table('settings')
-    op.drop_table('images')
-    op.drop_table('classes')
-    # ### end Alembic commands ###
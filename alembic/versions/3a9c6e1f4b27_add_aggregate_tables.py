@@ -0,0 +1,139 @@
+"""Add aggregate tables
+
+Revision ID: 3a9c6e1f4b27
+Revises: 7d2f0a8c3e15
+Create Date: 2026-10-19 12:41:18.209533
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9c6e1f4b27'
+down_revision: Union[str, Sequence[str], None] = '7d2f0a8c3e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_annotations_insert
+    AFTER INSERT ON annotations BEGIN
+        INSERT INTO class_counts (class_id, count) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET count = count + 1;
+        INSERT INTO image_box_counts (image_id, count) VALUES (NEW.image_id, 1)
+            ON CONFLICT (image_id) DO UPDATE SET count = count + 1;
+        UPDATE project_stats SET annotations = annotations + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_annotations_delete
+    AFTER DELETE ON annotations BEGIN
+        UPDATE class_counts SET count = count - 1 WHERE class_id = OLD.class_id;
+        DELETE FROM class_counts WHERE class_id = OLD.class_id AND count <= 0;
+        UPDATE image_box_counts SET count = count - 1 WHERE image_id = OLD.image_id;
+        DELETE FROM image_box_counts WHERE image_id = OLD.image_id AND count <= 0;
+        UPDATE project_stats SET annotations = annotations - 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_annotations_update
+    AFTER UPDATE OF class_id, image_id ON annotations BEGIN
+        UPDATE class_counts SET count = count - 1 WHERE class_id = OLD.class_id;
+        DELETE FROM class_counts WHERE class_id = OLD.class_id AND count <= 0;
+        UPDATE image_box_counts SET count = count - 1 WHERE image_id = OLD.image_id;
+        DELETE FROM image_box_counts WHERE image_id = OLD.image_id AND count <= 0;
+        INSERT INTO class_counts (class_id, count) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET count = count + 1;
+        INSERT INTO image_box_counts (image_id, count) VALUES (NEW.image_id, 1)
+            ON CONFLICT (image_id) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_images_insert
+    AFTER INSERT ON images BEGIN
+        UPDATE project_stats SET images = images + 1,
+            verified_images = verified_images + NEW.verified WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_images_delete
+    AFTER DELETE ON images BEGIN
+        UPDATE project_stats SET images = images - 1,
+            verified_images = verified_images - OLD.verified WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_images_verified
+    AFTER UPDATE OF verified ON images BEGIN
+        UPDATE project_stats
+            SET verified_images = verified_images + NEW.verified - OLD.verified
+            WHERE id = 1;
+    END
+    """,
+)
+TRIGGER_NAMES = (
+    'trg_annotations_insert',
+    'trg_annotations_delete',
+    'trg_annotations_update',
+    'trg_images_insert',
+    'trg_images_delete',
+    'trg_images_verified',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('verified', sa.Boolean(), server_default='0', nullable=False))
+
+    op.create_table('class_counts',
+    sa.Column('class_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['class_id'], ['classes.id'], ),
+    sa.PrimaryKeyConstraint('class_id')
+    )
+    op.create_table('image_box_counts',
+    sa.Column('image_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['image_id'], ['images.id'], ),
+    sa.PrimaryKeyConstraint('image_id')
+    )
+    op.create_table('project_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('images', sa.Integer(), nullable=False),
+    sa.Column('annotations', sa.Integer(), nullable=False),
+    sa.Column('verified_images', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill from the existing rows, then keep up through triggers.
+    op.execute(
+        "INSERT INTO class_counts (class_id, count) "
+        "SELECT class_id, count(*) FROM annotations GROUP BY class_id"
+    )
+    op.execute(
+        "INSERT INTO image_box_counts (image_id, count) "
+        "SELECT image_id, count(*) FROM annotations GROUP BY image_id"
+    )
+    op.execute(
+        "INSERT INTO project_stats (id, images, annotations, verified_images) "
+        "SELECT 1, (SELECT count(*) FROM images), "
+        "(SELECT count(*) FROM annotations), "
+        "(SELECT count(*) FROM images WHERE verified)"
+    )
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGER_NAMES:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table('project_stats')
+    op.drop_table('image_box_counts')
+    op.drop_table('class_counts')
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('verified')
@@ -0,0 +1,41 @@
+"""Add box issues
+
+Revision ID: b8f2c4d6e1a9
+Revises: e4b1d7a2c9f3
+Create Date: 2026-10-19 16:05:41.203117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f2c4d6e1a9'
+down_revision: Union[str, Sequence[str], None] = 'e4b1d7a2c9f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('box_issues',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('image_id', sa.Integer(), nullable=False),
+    sa.Column('annotation_id', sa.Integer(), nullable=False),
+    sa.Column('other_annotation_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['image_id'], ['images.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_box_issues_kind_image_id', 'box_issues', ['kind', 'image_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_box_issues_kind_image_id', table_name='box_issues')
+    op.drop_table('box_issues')
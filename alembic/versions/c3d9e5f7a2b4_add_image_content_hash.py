@@ -0,0 +1,34 @@
+"""Add image content hash
+
+Revision ID: c3d9e5f7a2b4
+Revises: b8f2c4d6e1a9
+Create Date: 2026-10-19 17:32:10.648215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d9e5f7a2b4'
+down_revision: Union[str, Sequence[str], None] = 'b8f2c4d6e1a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Plain add_column: batch mode would recreate images and drop its
+    # aggregate triggers.
+    op.add_column('images', sa.Column('content_hash', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('file_size', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('file_mtime_ns', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('images', 'file_mtime_ns')
+    op.drop_column('images', 'file_size')
+    op.drop_column('images', 'content_hash')
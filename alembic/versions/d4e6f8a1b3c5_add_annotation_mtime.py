@@ -0,0 +1,30 @@
+"""Add annotation file mtime
+
+Revision ID: d4e6f8a1b3c5
+Revises: c3d9e5f7a2b4
+Create Date: 2026-10-19 19:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e6f8a1b3c5'
+down_revision: Union[str, Sequence[str], None] = 'c3d9e5f7a2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Plain add_column: batch mode would recreate images and drop its
+    # aggregate triggers.
+    op.add_column('images', sa.Column('annotation_mtime_ns', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('images', 'annotation_mtime_ns')
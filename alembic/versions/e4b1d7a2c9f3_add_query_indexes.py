@@ -0,0 +1,39 @@
+"""Add query indexes
+
+Revision ID: e4b1d7a2c9f3
+Revises: 3a9c6e1f4b27
+Create Date: 2026-10-19 14:22:06.518342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b1d7a2c9f3'
+down_revision: Union[str, Sequence[str], None] = '3a9c6e1f4b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Plain create_index: batch mode would recreate the tables and drop
+    # the aggregate triggers.
+    op.create_index(
+        'ix_annotations_class_id_min_side',
+        'annotations',
+        ['class_id', sa.text('min(xmax - xmin, ymax - ymin)'), 'image_id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_image_box_counts_count', 'image_box_counts', ['count', 'image_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_image_box_counts_count', table_name='image_box_counts')
+    op.drop_index('ix_annotations_class_id_min_side', table_name='annotations')
@@ -0,0 +1,8 @@
+"""
+Performance benchmarks for labelImg's hot paths.
+
+    python -m benchmarks [--quick] [--only NAME ...] [--output results.json]
+
+Every benchmark builds its own synthetic data in a temporary directory and
+runs headless on the offscreen Qt platform.
+"""
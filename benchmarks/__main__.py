@@ -0,0 +1,74 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks import common
+
+SUITES = ("scan", "io", "canvas", "db", "sqlite")
+
+
+def environment():
+    from PyQt6.QtCore import QT_VERSION_STR
+    from libs import __version__
+
+    return {
+        "labelimg": __version__,
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM"),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run the labelImg benchmarks."
+    )
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="suites to run")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplier for the dataset sizes (1.0 = 100k files, 5k shapes, ...)",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="shorthand for --scale 0.02, for CI"
+    )
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    scale = 0.02 if args.quick else args.scale
+
+    common.qt_app()
+    report = {"environment": environment(), "scale": scale, "results": {}}
+    for name in args.only or SUITES:
+        module = __import__(f"benchmarks.bench_{name}", fromlist=["run"])
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix=f"labelimg-bench-{name}-") as tmp_dir:
+            results = module.run(scale, tmp_dir)
+        report["results"].update(results)
+        for key, stats in results.items():
+            p50 = stats.get("p50_ms")
+            p50 = f"p50 {p50:10.2f} ms" if p50 is not None else " " * 17
+            rate = stats.get("items_per_s")
+            rate = f"{rate:12.0f}/s" if rate else ""
+            if "bytes_per_image" in stats:
+                rate = f"{stats['bytes_per_image']:10.1f} bytes/image"
+            print(f"{key:<40} {p50} {rate}", file=sys.stderr)
+        print(f"  [{name} done in {time.perf_counter() - start:.1f} s]", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
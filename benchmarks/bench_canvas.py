@@ -0,0 +1,59 @@
+"""load_labels, Canvas.paintEvent and hover hit-testing with many shapes."""
+import random
+
+from benchmarks.common import (
+    main_window,
+    measure,
+    scaled,
+    synthetic_boxes,
+    to_label_shapes,
+)
+
+SHAPES = 5_000
+PAINT_SHAPES = (100, 1_000, 5_000)
+HOVER_MOVES = 2_000
+
+
+def run(scale, tmp_dir):
+    window = main_window(tmp_dir)
+    from PyQt6.QtCore import QEvent, QPointF, Qt
+    from PyQt6.QtGui import QColor, QMouseEvent, QPixmap
+
+    canvas = window.canvas
+    pixmap = QPixmap(1920, 1080)
+    pixmap.fill(QColor(90, 90, 90))
+    canvas.load_pixmap(pixmap)
+    canvas.resize(1920, 1080)
+
+    shapes = to_label_shapes(synthetic_boxes(scaled(SHAPES, scale)))
+    results = {
+        "load_labels": measure(lambda: window.load_labels(shapes), 5, len(shapes))
+    }
+
+    for count in sorted({scaled(n, scale) for n in PAINT_SHAPES}):
+        window.load_labels(shapes[:count])
+        # grab() renders the widget through paintEvent, also offscreen.
+        results[f"paint_event_{count}_shapes"] = measure(canvas.grab, 20)
+
+    window.load_labels(shapes)
+    rng = random.Random(0)
+    events = []
+    for _ in range(scaled(HOVER_MOVES, scale)):
+        pos = QPointF(rng.uniform(0, 1920), rng.uniform(0, 1080))
+        events.append(
+            QMouseEvent(
+                QEvent.Type.MouseMove,
+                pos,
+                pos,
+                Qt.MouseButton.NoButton,
+                Qt.MouseButton.NoButton,
+                Qt.KeyboardModifier.NoModifier,
+            )
+        )
+
+    def hover():
+        for event in events:
+            canvas.mouseMoveEvent(event)
+
+    results[f"hover_hit_test_{len(shapes)}_shapes"] = measure(hover, 3, len(events))
+    return results
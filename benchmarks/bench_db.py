@@ -0,0 +1,57 @@
+"""update_db_statistics ingesting a synthetic Pascal VOC dataset, then queries and box checks over it."""
+import os
+
+from benchmarks.common import main_window, measure, scaled, synthetic_boxes
+
+IMAGES = 2_000
+BOXES_PER_IMAGE = 10
+
+
+def run(scale, tmp_dir):
+    window = main_window(tmp_dir)
+    from libs.box_checks import check_boxes
+    from libs.database import init_db
+    from libs.dataset_query import DatasetQuery
+    from libs.image_catalog import ImageCatalog
+    from libs.pascal_voc_io import PascalVocWriter
+
+    root = os.path.join(tmp_dir, "db")
+    os.makedirs(root)
+    boxes = synthetic_boxes(BOXES_PER_IMAGE)
+    images = []
+    for i in range(scaled(IMAGES, scale)):
+        path = os.path.join(root, f"img_{i}.jpg")
+        open(path, "wb").close()
+        writer = PascalVocWriter("db", path, (1080, 1920, 3))
+        for label, x1, y1, x2, y2 in boxes:
+            writer.add_bnd_box(x1, y1, x2, y2, label, False)
+        writer.save(os.path.splitext(path)[0] + ".xml")
+        images.append(path)
+
+    Session = init_db(os.path.join(root, "labelImg.db"))
+    window.db_session = Session()
+    window.m_img_list = ImageCatalog(images)
+    try:
+        results = {
+            # The first run ingests every image, later ones find them known.
+            "update_db_statistics_cold": measure(
+                window.update_db_statistics, 1, len(images)
+            ),
+            "update_db_statistics_warm": measure(
+                window.update_db_statistics, 3, len(images)
+            ),
+        }
+        label = boxes[0][0]
+        query = DatasetQuery().with_box(label, smaller_than=200).box_count(minimum=5)
+        results["dataset_query"] = measure(
+            lambda: query.paths(window.db_session), 5, len(images) * len(boxes)
+        )
+        results["check_boxes"] = measure(
+            lambda: check_boxes(window.db_session, size_of=lambda path: (1920, 1080)),
+            3,
+            len(images) * len(boxes),
+        )
+        return results
+    finally:
+        window.db_session.close()
+        Session.kw["bind"].dispose()
@@ -0,0 +1,72 @@
+"""Read and write throughput of the Pascal VOC, YOLO and CreateML formats."""
+import os
+
+from benchmarks.common import LABELS, measure, qt_app, scaled, synthetic_boxes
+
+FILES = 200
+BOXES_PER_FILE = 50
+IMG_SIZE = (1080, 1920, 3)
+
+
+def run(scale, tmp_dir):
+    qt_app()
+    from PyQt6.QtGui import QImage
+    from libs.create_ml_io import CreateMLReader, CreateMLWriter
+    from libs.pascal_voc_io import PascalVocReader, PascalVocWriter
+    from libs.yolo_io import YoloReader, YOLOWriter
+
+    files = scaled(FILES, scale)
+    boxes = synthetic_boxes(BOXES_PER_FILE)
+    root = os.path.join(tmp_dir, "io")
+    os.makedirs(root)
+    names = [os.path.join(root, f"img_{i}") for i in range(files)]
+    image = QImage(IMG_SIZE[1], IMG_SIZE[0], QImage.Format.Format_RGB32)
+    count = files * BOXES_PER_FILE
+
+    def write_voc():
+        for name in names:
+            writer = PascalVocWriter("io", name + ".jpg", IMG_SIZE)
+            for label, x1, y1, x2, y2 in boxes:
+                writer.add_bnd_box(x1, y1, x2, y2, label, False)
+            writer.save(name + ".xml")
+
+    def read_voc():
+        for name in names:
+            PascalVocReader(name + ".xml").get_shapes()
+
+    def write_yolo():
+        for name in names:
+            writer = YOLOWriter("io", name + ".jpg", IMG_SIZE)
+            for label, x1, y1, x2, y2 in boxes:
+                writer.add_bnd_box(x1, y1, x2, y2, label, False)
+            writer.save(list(LABELS), name + ".txt")
+
+    def read_yolo():
+        for name in names:
+            YoloReader(name + ".txt", image).get_shapes()
+
+    create_ml_shapes = [
+        {"label": label, "points": [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]}
+        for label, x1, y1, x2, y2 in boxes
+    ]
+
+    def write_create_ml():
+        for name in names:
+            if os.path.exists(name + ".json"):
+                os.remove(name + ".json")
+            CreateMLWriter(
+                "io", name + ".jpg", IMG_SIZE, create_ml_shapes, name + ".json"
+            ).write()
+
+    def read_create_ml():
+        for name in names:
+            CreateMLReader(name + ".json", name + ".jpg").get_shapes()
+
+    return {
+        "pascal_voc_write": measure(write_voc, 3, count),
+        "pascal_voc_read": measure(read_voc, 3, count),
+        "yolo_write": measure(write_yolo, 3, count),
+        "yolo_read": measure(read_yolo, 3, count),
+        "create_ml_write": measure(write_create_ml, 3, count),
+        "create_ml_read": measure(read_create_ml, 3, count),
+    }
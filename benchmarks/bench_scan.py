@@ -0,0 +1,38 @@
+"""scan_all_images over a synthetic directory tree, and lookups in its result."""
+import os
+
+from benchmarks.common import measure, qt_app, scaled
+
+FILES = 100_000
+PER_DIRECTORY = 5_000
+
+
+def make_tree(root, count):
+    """count images spread over sub-directories, plus one annotation per ten."""
+    for i in range(count):
+        directory = os.path.join(root, f"part_{i // PER_DIRECTORY:03d}")
+        if i % PER_DIRECTORY == 0:
+            os.makedirs(directory)
+        open(os.path.join(directory, f"img_{i}.jpg"), "wb").close()
+        if i % 10 == 0:
+            open(os.path.join(directory, f"img_{i}.xml"), "wb").close()
+
+
+def run(scale, tmp_dir):
+    qt_app()
+    from labelImg import scan_all_images
+    from libs.image_catalog import ImageCatalog
+
+    count = scaled(FILES, scale)
+    root = os.path.join(tmp_dir, "scan")
+    make_tree(root, count)
+    results = {"scan_all_images": measure(lambda: scan_all_images(root), 3, count)}
+
+    catalog = ImageCatalog(scan_all_images(root))
+    # The worst case of the former list scans: the end of the list.
+    probes = [catalog[-1 - i] for i in range(min(1000, count))]
+    results["catalog_index"] = measure(
+        lambda: [catalog.index(path) for path in probes], 5, len(probes)
+    )
+    results["catalog_memory"] = {"bytes_per_image": catalog.memory_usage() / count}
+    return results
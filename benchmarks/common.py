@@ -0,0 +1,85 @@
+import os
+import random
+import statistics
+import sys
+import time
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+LABELS = ["dog", "cat", "person", "car", "bicycle", "bird", "horse", "boat"]
+
+_app = None
+
+
+def qt_app():
+    """The QApplication, created on the offscreen platform if needed."""
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+
+    if QApplication.instance() is None:
+        _app = QApplication([])
+    return QApplication.instance()
+
+
+def measure(fn, repeat, items=1):
+    """
+    Calls fn() repeat times and returns latency statistics in milliseconds
+    plus throughput, counting items units of work per call.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "calls": repeat,
+        "items_per_call": items,
+        "mean_ms": total / repeat * 1000,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[min(repeat - 1, int(repeat * 0.95))] * 1000,
+        "max_ms": samples[-1] * 1000,
+        "items_per_s": items * repeat / total if total else None,
+    }
+
+
+def synthetic_boxes(count, width=1920, height=1080, seed=0):
+    """(label, x_min, y_min, x_max, y_max) tuples inside a width x height image."""
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        w, h = rng.randint(8, width // 4), rng.randint(8, height // 4)
+        x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+        boxes.append((rng.choice(LABELS), x, y, x + w, y + h))
+    return boxes
+
+
+def to_label_shapes(boxes):
+    """Boxes in the (label, points, line_color, fill_color, difficult) form of the readers."""
+    return [
+        (label, [(x1, y1), (x2, y1), (x2, y2), (x1, y2)], None, None, False)
+        for label, x1, y1, x2, y2 in boxes
+    ]
+
+
+def scaled(value, scale, minimum=1):
+    return max(minimum, int(value * scale))
+
+
+def main_window(tmp_dir):
+    """
+    A MainWindow whose settings file lives in tmp_dir, so benchmarks neither
+    read nor overwrite the user's ~/.labelImgSettings.pkl.
+    """
+    qt_app()
+    from labelImg import MainWindow
+
+    class_file = os.path.join(ROOT, "data", "predefined_classes.txt")
+    # The settings path is taken from HOME when the window is built.
+    with mock.patch.dict(os.environ, {"HOME": tmp_dir}):
+        return MainWindow(None, class_file, None)
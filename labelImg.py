@@ -3,6 +3,7 @@
 
 import argparse
 import codecs
+import logging
 import os.path
 import platform
 import shutil
@@ -28,9 +29,9 @@ from PyQt6.QtWidgets import (
     QDockWidget,
     QFileDialog,
     QHBoxLayout,
+    QInputDialog,
     QLabel,
-    QListWidget,
-    QListWidgetItem,
+    QListView,
     QMainWindow,
     QMenu,
     QMessageBox,
@@ -44,7 +45,14 @@ from PyQt6.QtWidgets import (
 
 from libs.combobox import ComboBox
 from libs.default_label_combobox import DefaultLabelComboBox
-from libs.resources import qInitResources
+try:
+    from libs.resources import qInitResources
+except ImportError:
+    # A fresh checkout or an install built without `make resources`.
+    from libs import compile_resources
+
+    compile_resources()
+    from libs.resources import qInitResources
 from libs.constants import (
     SETTING_FILENAME,
     SETTING_RECENT_FILES,
@@ -67,6 +75,7 @@ from libs.constants import (
     SETTING_LABEL_FILE_FORMAT,
     DEFAULT_ENCODING,
     SETTING_AUTO_SCROLL,
+    SETTING_UNDO_LOG,
 )
 
 from libs.utils import (
@@ -75,6 +84,7 @@ from libs.utils import (
     add_actions,
     format_shortcut,
     generate_color_by_text,
+    set_color_palette,
     natural_sort,
     Struct,
     trimmed,
@@ -88,7 +98,11 @@ from libs.zoomWidget import ZoomWidget
 from libs.lightWidget import LightWidget
 from libs.labelDialog import LabelDialog
 from libs.colorDialog import ColorDialog
+from libs.annotation_index import AnnotationIndex
+from libs.file_list_model import FileListModel
+from libs.image_catalog import ImageCatalog
 from libs.labelFile import LabelFile, LabelFileError, LabelFileFormat
+from libs.save_queue import SaveQueue
 from libs.toolBar import ToolBar
 from libs.pascal_voc_io import PascalVocReader
 from libs.pascal_voc_io import XML_EXT
@@ -96,12 +110,19 @@ from libs.yolo_io import YoloReader
 from libs.yolo_io import TXT_EXT
 from libs.create_ml_io import CreateMLReader
 from libs.create_ml_io import JSON_EXT
-from libs.hashableQListWidgetItem import HashableQListWidgetItem
-from libs.database import init_db, Image, Annotation, Class
-from libs.statistics_dialog import StatisticsDialog
-from libs.undo_manager import UndoManager
+from libs import perf
+from libs import storage
+from libs.label_list_model import LabelListModel
+from libs.log import setup_logging
+from libs.perf_hud import PerfHud
+from libs.startup_profile import EXIT_AFTER_STARTUP_ENV, PROFILE_FLAG, profile_startup
+from libs.undo_manager import UndoManager, EditLabelCommand
 
 __appname__ = "labelImg"
+# Images after the current one fetched ahead from remote storage
+READ_AHEAD = 4
+
+logger = logging.getLogger("labelImg")
 
 
 class WindowMixin(object):
@@ -125,6 +146,12 @@ class WindowMixin(object):
 
 class MainWindow(QMainWindow, WindowMixin):
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = list(range(3))
+    # Emitted from the save queue thread: annotation path, image path, error
+    # message or "".
+    annotation_saved = pyqtSignal(str, str, str)
+    # Emitted from the image hashing thread: done, total / hashed, error or "".
+    hash_progress = pyqtSignal(int, int)
+    hashing_finished = pyqtSignal(int, str)
 
     def __init__(
         self,
@@ -150,7 +177,25 @@ class MainWindow(QMainWindow, WindowMixin):
         self.db_session = None
 
         # Undo Manager
-        self.undo_manager = UndoManager()
+        self.undo_manager = UndoManager(
+            log_history=settings.get(SETTING_UNDO_LOG, True)
+        )
+
+        # Auto-save writes annotations in the background
+        self.save_queue = SaveQueue(
+            on_done=lambda path, image_path, error: self.annotation_saved.emit(
+                path, image_path, str(error) if error else ""
+            )
+        )
+        self.annotation_saved.connect(self.annotation_save_finished)
+
+        # Perceptual hashing of the project images, see find_duplicate_images
+        self.hash_job = None
+        self.hash_progress.connect(self.image_hash_progress)
+        self.hashing_finished.connect(self.image_hashing_finished)
+
+        # Read-only COCO annotations of the project, see import_coco_dialog
+        self.coco_index = None
 
         # Save as Pascal voc xml
         self.default_save_dir = default_save_dir
@@ -159,7 +204,10 @@ class MainWindow(QMainWindow, WindowMixin):
         )
 
         # For loading all image under a directory
-        self.m_img_list = []
+        self.m_img_list = ImageCatalog()
+        # The whole directory while m_img_list holds a query's working set.
+        self.project_images = None
+        self.annotation_index = AnnotationIndex(self.m_img_list)
         self.dir_name = None
         self.label_hist = []
         self.last_open_dir = None
@@ -179,13 +227,11 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.label_hist:
             self.default_label = self.label_hist[0]
         else:
-            print("Not find:/data/predefined_classes.txt (optional)")
+            logger.info("Not find:/data/predefined_classes.txt (optional)")
 
         # Main widgets and related state.
         self.label_dialog = LabelDialog(parent=self, list_item=self.label_hist)
 
-        self.items_to_shapes = {}
-        self.shapes_to_items = {}
         self.prev_label_text = ""
 
         list_layout = QVBoxLayout()
@@ -218,26 +264,30 @@ class MainWindow(QMainWindow, WindowMixin):
         self.combo_box = ComboBox(self)
         list_layout.addWidget(self.combo_box)
 
-        # Create and add a widget for showing current label items
-        self.label_list = QListWidget()
+        # Create and add a widget for showing current label items.
+        # Its model is bound to the canvas shapes once the canvas exists.
+        self.label_list = QListView()
+        self.label_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.label_list.setUniformItemSizes(True)
         label_list_container = QWidget()
         label_list_container.setLayout(list_layout)
-        self.label_list.itemActivated.connect(self.label_selection_changed)
-        self.label_list.itemSelectionChanged.connect(self.label_selection_changed)
-        self.label_list.itemDoubleClicked.connect(self.edit_label)
-        # Connect to itemChanged to detect checkbox changes.
-        self.label_list.itemChanged.connect(self.label_item_changed)
         list_layout.addWidget(self.label_list)
 
         self.dock = QDockWidget(get_str("boxLabelText"), self)
         self.dock.setObjectName(get_str("labels"))
         self.dock.setWidget(label_list_container)
 
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.itemDoubleClicked.connect(self.file_item_double_clicked)
+        self.file_list_model = FileListModel(
+            self.m_img_list, self.annotation_index, self
+        )
+        self.file_list = QListView()
+        self.file_list.setModel(self.file_list_model)
+        self.file_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.doubleClicked.connect(self.file_item_double_clicked)
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
-        file_list_layout.addWidget(self.file_list_widget)
+        file_list_layout.addWidget(self.file_list)
         file_list_container = QWidget()
         file_list_container.setLayout(file_list_layout)
         self.file_dock = QDockWidget(get_str("fileList"), self)
@@ -262,6 +312,14 @@ class MainWindow(QMainWindow, WindowMixin):
             settings.get(SETTING_DRAW_SQUARE, False)
         )
 
+        self.label_model = LabelListModel(self.canvas, self)
+        self.label_list.setModel(self.label_model)
+        self.label_list.activated.connect(self.label_selection_changed)
+        self.label_list.selectionModel().selectionChanged.connect(
+            self.label_selection_changed
+        )
+        self.label_list.doubleClicked.connect(self.edit_label)
+
         scroll = QScrollArea()
         scroll.setWidget(self.canvas)
         scroll.setWidgetResizable(True)
@@ -294,7 +352,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         undo_action = action(
             "Undo",
-            self.undo_manager.undo,
+            self.undo,
             "Ctrl+Z",
             "undo",
             "Undo last action",
@@ -302,7 +360,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         redo_action = action(
             "Redo",
-            self.undo_manager.redo,
+            self.redo,
             ["Ctrl+Shift+Z", "Ctrl+Y"],
             "redo",
             "Redo last action",
@@ -324,6 +382,38 @@ class MainWindow(QMainWindow, WindowMixin):
             get_str("openDir"),
         )
 
+        open_archive = action(
+            "Open Dataset Archive...",
+            self.open_archive_dialog,
+            None,
+            "open",
+            "Open the images of a .zip or .tar archive without extracting it",
+        )
+
+        open_remote = action(
+            "Open Remote Dataset...",
+            self.open_remote_dialog,
+            None,
+            "open",
+            "Open the images under an s3:// URL",
+        )
+
+        import_coco = action(
+            "Import COCO Annotations...",
+            self.import_coco_dialog,
+            None,
+            "open",
+            "Show the boxes of a COCO instances file for images without annotations",
+        )
+
+        export_coco = action(
+            "Export COCO...",
+            self.export_coco_dialog,
+            None,
+            "save",
+            "Write the annotations of the project as one COCO instances file",
+        )
+
         change_save_dir = action(
             get_str("changeSaveDir"),
             self.change_save_dir_dialog,
@@ -363,6 +453,30 @@ class MainWindow(QMainWindow, WindowMixin):
             get_str("prevImgDetail"),
         )
 
+        open_next_unlabelled = action(
+            "Next Unlabelled Image",
+            self.open_next_unlabelled_image,
+            "Alt+D",
+            "next",
+            "Open the next image without annotations",
+        )
+
+        open_prev_unlabelled = action(
+            "Previous Unlabelled Image",
+            self.open_prev_unlabelled_image,
+            "Alt+A",
+            "prev",
+            "Open the previous image without annotations",
+        )
+
+        open_next_unverified = action(
+            "Next Unverified Image",
+            self.open_next_unverified_image,
+            "Alt+V",
+            "verify",
+            "Open the next annotated image that is not verified yet",
+        )
+
         verify = action(
             get_str("verifyImg"),
             self.verify_image,
@@ -379,6 +493,54 @@ class MainWindow(QMainWindow, WindowMixin):
             "Show Project Statistics",
         )
 
+        find_images = action(
+            "Find Images...",
+            self.find_images,
+            "Ctrl+Alt+F",
+            "labels",
+            "Show only the images matching a query of the project database",
+        )
+
+        show_all_images = action(
+            "Show All Images",
+            self.show_all_images,
+            "Ctrl+Alt+A",
+            "labels",
+            "Leave the query working set and list every image again",
+        )
+
+        check_boxes = action(
+            "Check Boxes...",
+            self.check_boxes,
+            None,
+            "labels",
+            "Find out-of-bounds, degenerate and duplicate boxes in the project",
+        )
+
+        find_duplicates = action(
+            "Find Duplicate Images...",
+            self.find_duplicate_images,
+            None,
+            "labels",
+            "Hash the project images and list near-identical ones",
+        )
+
+        change_class = action(
+            "Rename, Merge or Delete Class...",
+            self.change_class,
+            None,
+            "labels",
+            "Rename, merge or delete a class in every annotation file",
+        )
+
+        export_perf = action(
+            "Export Performance Histograms",
+            self.export_perf_histograms,
+            None,
+            "save",
+            "Save the recorded timings as JSON",
+        )
+
         save = action(
             get_str("save"),
             self.save_file,
@@ -764,14 +926,33 @@ class MainWindow(QMainWindow, WindowMixin):
         self.auto_scroll_option.setCheckable(True)
         self.auto_scroll_option.setChecked(settings.get(SETTING_AUTO_SCROLL, True))
 
+        self.undo_log_option = QAction("Log Undo History", self)
+        self.undo_log_option.setCheckable(True)
+        self.undo_log_option.setChecked(self.undo_manager.log_history)
+        self.undo_log_option.toggled.connect(self.undo_manager.set_log_history)
+
+        self.perf_hud = PerfHud(self.scroll_area)
+        self.perf_hud_option = QAction("Performance HUD", self)
+        self.perf_hud_option.setShortcut("Ctrl+Alt+P")
+        self.perf_hud_option.setCheckable(True)
+        self.perf_hud_option.toggled.connect(self.perf_hud.set_active)
+        self.perf_hud_option.setChecked(perf.is_enabled())
+
         add_actions(
             self.menus.file,
             (
                 open,
                 open_dir,
+                open_archive,
+                open_remote,
                 change_save_dir,
                 open_annotation,
+                import_coco,
+                export_coco,
                 copy_prev_bounding,
+                open_next_unlabelled,
+                open_prev_unlabelled,
+                open_next_unverified,
                 self.menus.recentFiles,
                 save,
                 save_format,
@@ -792,7 +973,15 @@ class MainWindow(QMainWindow, WindowMixin):
                 self.single_class_mode,
                 self.display_label_option,
                 self.auto_scroll_option,
+                self.undo_log_option,
+                self.perf_hud_option,
+                export_perf,
                 statistics,
+                find_images,
+                show_all_images,
+                check_boxes,
+                find_duplicates,
+                change_class,
                 labels,
                 advanced_mode,
                 None,
@@ -939,7 +1128,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.update_file_menu()
 
         # Since loading the file may take some time, make sure it runs in the background.
-        if self.file_path and os.path.isdir(self.file_path):
+        if self.file_path and storage.is_dataset_root(self.file_path):
             self.queue_event(partial(self.import_dir_images, self.file_path or ""))
         elif self.file_path:
             # Se for um arquivo, carregamos o diretório pai primeiro (sem abrir a primeira imagem)
@@ -962,7 +1151,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.statusBar().addPermanentWidget(self.label_coordinates)
 
         # Open Dir if default file
-        if self.file_path and os.path.isdir(self.file_path):
+        if self.file_path and storage.is_dataset_root(self.file_path):
             self.open_dir_dialog(dir_path=self.file_path, silent=True)
 
     # Support Functions #
@@ -997,7 +1186,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.set_dirty()
 
     def no_shapes(self):
-        return not self.items_to_shapes
+        return not self.label_model.rowCount()
 
     def toggle_advanced_mode(self, value=True):
         self._beginner = not value
@@ -1040,18 +1229,16 @@ class MainWindow(QMainWindow, WindowMixin):
         self.dirty = True
         self.actions.save.setEnabled(True)
         # Change background color of current item in file list to indicate unsaved changes
-        item = self.file_list_widget.currentItem()
-        if item:
-            item.setBackground(QColor("#FFCCCC"))  # Light red highlight
+        index = self.file_list.currentIndex()
+        if index.isValid():
+            self.file_list_model.set_dirty_row(index.row())
 
     def set_clean(self):
         self.dirty = False
         self.actions.save.setEnabled(False)
         self.actions.create.setEnabled(True)
         # Reset background color
-        item = self.file_list_widget.currentItem()
-        if item:
-            item.setBackground(Qt.GlobalColor.transparent)  # Reset to default
+        self.file_list_model.set_dirty_row(None)
 
     def toggle_actions(self, value=True):
         """Enable/Disable widgets which depend on an opened image."""
@@ -1069,9 +1256,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.statusBar().showMessage(message, delay)
 
     def reset_state(self):
-        self.items_to_shapes.clear()
-        self.shapes_to_items.clear()
-        self.label_list.clear()
+        self.label_model.clear()
         self.file_path = None
         self.image_data = None
         self.label_file = None
@@ -1079,10 +1264,10 @@ class MainWindow(QMainWindow, WindowMixin):
         self.label_coordinates.clear()
         self.combo_box.cb.clear()
 
-    def current_item(self):
-        items = self.label_list.selectedItems()
-        if items:
-            return items[0]
+    def current_shape(self):
+        indexes = self.label_list.selectionModel().selectedIndexes()
+        if indexes:
+            return self.label_model.shape(indexes[0].row())
         return None
 
     def add_recent_file(self, file_path):
@@ -1184,24 +1369,26 @@ class MainWindow(QMainWindow, WindowMixin):
     def edit_label(self):
         if not self.canvas.editing():
             return
-        item = self.current_item()
-        if not item:
+        shape = self.current_shape()
+        if not shape:
             return
         if len(self.label_hist) > 0:
             self.label_dialog = LabelDialog(parent=self, list_item=self.label_hist)
-        text = self.label_dialog.pop_up(item.text())
+        text = self.label_dialog.pop_up(shape.label)
 
-        if text is not None:
-            item.setText(text)
-            item.setBackground(generate_color_by_text(text))
+        if text is not None and text != shape.label:
+            self.undo_manager.push(
+                EditLabelCommand(self.canvas, shape, shape.label, text)
+            )
+            self.label_model.shape_changed(shape)
             self.set_dirty()
             self.update_combo_box()
 
     # Tzutalin 20160906 : Add file list and dock to move faster
-    def file_item_double_clicked(self, item=None):
-        filename = item.text()
-        if filename:
-            self.cur_img_idx = self.m_img_list.index(filename)
+    def file_item_double_clicked(self, index=None):
+        if index is not None and index.isValid():
+            filename = self.file_list_model.path(index)
+            self.cur_img_idx = index.row()
             self.update_progress_label()
             self.load_file(filename)
 
@@ -1212,21 +1399,16 @@ class MainWindow(QMainWindow, WindowMixin):
         if not self.canvas.editing():
             return
 
-        item = self.current_item()
-        if not item:  # If not selected Item, take the first one
-            item = self.label_list.item(self.label_list.count() - 1)
+        shape = self.current_shape()
+        if not shape and self.label_model.rowCount():
+            # If not selected Item, take the last one
+            shape = self.label_model.shape(self.label_model.rowCount() - 1)
 
         difficult = self.diffc_button.isChecked()
 
-        shape = self.items_to_shapes.get(item)
-        if shape:
-            if difficult != shape.difficult:
-                shape.difficult = difficult
-                self.set_dirty()
-            else:  # User probably changed item visibility
-                self.canvas.set_shape_visible(
-                    shape, item.checkState() == Qt.CheckState.Checked
-                )
+        if shape and difficult != shape.difficult:
+            shape.difficult = difficult
+            self.set_dirty()
 
     # React to canvas signals.
     def shape_selection_changed(self, selected=False):
@@ -1234,8 +1416,9 @@ class MainWindow(QMainWindow, WindowMixin):
             self._no_selection_slot = False
         else:
             shape = self.canvas.selected_shape
-            if shape:
-                self.shapes_to_items[shape].setSelected(True)
+            index = self.label_model.index_of(shape) if shape else None
+            if index is not None and index.isValid():
+                self.label_list.setCurrentIndex(index)
             else:
                 self.label_list.clearSelection()
         self.actions.delete.setEnabled(selected)
@@ -1246,13 +1429,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def add_label(self, shape):
         shape.paint_label = self.display_label_option.isChecked()
-        item = HashableQListWidgetItem(shape.label)
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-        item.setCheckState(Qt.CheckState.Checked)
-        item.setBackground(generate_color_by_text(shape.label))
-        self.items_to_shapes[item] = shape
-        self.shapes_to_items[shape] = item
-        self.label_list.addItem(item)
+        self.label_model.add_shape(shape)
         for action in self.actions.onShapesPresent:
             action.setEnabled(True)
         self.update_combo_box()
@@ -1263,16 +1440,14 @@ class MainWindow(QMainWindow, WindowMixin):
         if shape is None:
             # print('rm empty label')
             return
-        item = self.shapes_to_items[shape]
-        self.label_list.takeItem(self.label_list.row(item))
-        del self.shapes_to_items[shape]
-        del self.items_to_shapes[item]
+        self.label_model.remove_shape(shape)
         self.update_combo_box()
 
     def load_labels(self, shapes):
         s = []
+        paint_label = self.display_label_option.isChecked()
         for label, points, line_color, fill_color, difficult in shapes:
-            shape = Shape(label=label)
+            shape = Shape(label=label, paint_label=paint_label)
             for x, y in points:
 
                 # Ensure the labels are within the bounds of the image. If not, fix them.
@@ -1295,17 +1470,20 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 shape.fill_color = generate_color_by_text(label)
 
-            self.add_label(shape)
-        self.update_combo_box()
+            if label not in self.label_hist:
+                self.label_hist.append(label)
+
+        # Canvas and label list are filled in one batch instead of per shape.
         self.canvas.load_shapes(s)
+        self.label_model.set_shapes(s)
+        if s:
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(True)
+        self.update_combo_box()
 
     def update_combo_box(self):
         # 1. Update the filter Combobox (labels actually present in the list)
-        items_text_list = [
-            str(self.label_list.item(i).text()) for i in range(self.label_list.count())
-        ]
-
-        unique_text_list = list(set(items_text_list))
+        unique_text_list = list(set(self.label_model.labels()))
         unique_text_list.append("")
         unique_text_list.sort()
         self.combo_box.update_items(unique_text_list)
@@ -1315,10 +1493,51 @@ class MainWindow(QMainWindow, WindowMixin):
             self.default_label_combo_box.update_items(self.label_hist)
 
     def save_labels(self, annotation_file_path):
-        annotation_file_path = annotation_file_path
+        annotation_file_path, write, args = self.annotation_snapshot(
+            annotation_file_path
+        )
+        # A queued save of the same file must not land after this one.
+        self.save_queue.wait(annotation_file_path)
+        try:
+            with perf.span("save_labels"):
+                write(*args)
+            logger.info("Image:%s -> Annotation:%s", self.file_path, annotation_file_path)
+            self.annotation_status_saved(annotation_file_path)
+            self.save_queue.drop_failed(annotation_file_path, self.file_path)
+            self.sync_saved_annotation(self.file_path)
+            return True
+        except LabelFileError as e:
+            self.error_message("Error saving label data", "<b>%s</b>" % e)
+            return False
+
+    def save_labels_later(self, annotation_file_path):
+        """Queue the save on the writer thread and return immediately."""
+        annotation_file_path, write, args = self.annotation_snapshot(
+            annotation_file_path
+        )
+        self.save_queue.submit(annotation_file_path, self.file_path, write, *args)
+        self.annotation_status_saved(annotation_file_path)
+        return annotation_file_path
+
+    def annotation_status_saved(self, annotation_file_path):
+        self.file_list_model.refresh_row(
+            self.annotation_index.mark_saved(
+                self.file_path, annotation_file_path, self.label_file.verified
+            )
+        )
+
+    def annotation_snapshot(self, annotation_file_path):
+        """
+        Returns (annotation path, write function, arguments). The arguments
+        are plain data copied from the canvas, so the write can run on
+        another thread while the canvas moves on to the next image.
+        """
         if self.label_file is None:
             self.label_file = LabelFile()
             self.label_file.verified = self.canvas.verified
+        # Own copy, so toggling "verified" later does not reach a queued save.
+        label_file = LabelFile()
+        label_file.verified = self.label_file.verified
 
         def format_shape(s):
             return dict(
@@ -1331,61 +1550,77 @@ class MainWindow(QMainWindow, WindowMixin):
             )
 
         shapes = [format_shape(shape) for shape in self.canvas.shapes]
+        # The writers only need the size, which the decoded image already has.
+        image_shape = LabelFile.image_shape(self.file_path, self.image)
+        colors = (self.line_color.getRgb(), self.fill_color.getRgb())
         # Can add different annotation formats here
+        if self.label_file_format == LabelFileFormat.PASCAL_VOC:
+            if annotation_file_path[-4:].lower() != ".xml":
+                annotation_file_path += XML_EXT
+            write = label_file.save_pascal_voc_format
+            args = (annotation_file_path, shapes, self.file_path, image_shape) + colors
+        elif self.label_file_format == LabelFileFormat.YOLO:
+            if annotation_file_path[-4:].lower() != ".txt":
+                annotation_file_path += TXT_EXT
+            write = label_file.save_yolo_format
+            args = (
+                annotation_file_path,
+                shapes,
+                self.file_path,
+                image_shape,
+                list(self.label_hist),
+            ) + colors
+        elif self.label_file_format == LabelFileFormat.CREATE_ML:
+            if annotation_file_path[-5:].lower() != ".json":
+                annotation_file_path += JSON_EXT
+            write = label_file.save_create_ml_format
+            args = (
+                annotation_file_path,
+                shapes,
+                self.file_path,
+                image_shape,
+                list(self.label_hist),
+            ) + colors
+        else:
+            write = label_file.save
+            args = (annotation_file_path, shapes, self.file_path, self.image_data) + colors
+        return annotation_file_path, write, args
+
+    def annotation_save_finished(self, annotation_file_path, image_path, error):
+        if error:
+            self.status("Error saving %s" % annotation_file_path)
+            if image_path == self.file_path:
+                # The canvas still holds the boxes: saving again retries.
+                if self.save_queue.drop_failed(annotation_file_path, image_path):
+                    self.set_dirty()
+                self.error_message("Error saving label data", "<b>%s</b>" % error)
+                return
+            answer = QMessageBox.question(
+                self,
+                "Error saving label data",
+                "Saving the annotations of %s failed:\n%s\n\nTry again?"
+                % (image_path, error),
+                QMessageBox.StandardButton.Retry | QMessageBox.StandardButton.Cancel,
+            )
+            if answer == QMessageBox.StandardButton.Retry:
+                self.save_queue.retry_failed()
+        else:
+            logger.info("Annotation saved in background: %s", annotation_file_path)
+            self.sync_saved_annotation(image_path)
+
+    def sync_saved_annotation(self, image_path):
+        """Update the database rows of image_path from its saved annotation."""
+        if not self.db_session or not image_path:
+            return
+        from libs.annotation_sync import sync_annotations
+
         try:
-            if self.label_file_format == LabelFileFormat.PASCAL_VOC:
-                if annotation_file_path[-4:].lower() != ".xml":
-                    annotation_file_path += XML_EXT
-                self.label_file.save_pascal_voc_format(
-                    annotation_file_path,
-                    shapes,
-                    self.file_path,
-                    self.image_data,
-                    self.line_color.getRgb(),
-                    self.fill_color.getRgb(),
-                )
-            elif self.label_file_format == LabelFileFormat.YOLO:
-                if annotation_file_path[-4:].lower() != ".txt":
-                    annotation_file_path += TXT_EXT
-                self.label_file.save_yolo_format(
-                    annotation_file_path,
-                    shapes,
-                    self.file_path,
-                    self.image_data,
-                    self.label_hist,
-                    self.line_color.getRgb(),
-                    self.fill_color.getRgb(),
-                )
-            elif self.label_file_format == LabelFileFormat.CREATE_ML:
-                if annotation_file_path[-5:].lower() != ".json":
-                    annotation_file_path += JSON_EXT
-                self.label_file.save_create_ml_format(
-                    annotation_file_path,
-                    shapes,
-                    self.file_path,
-                    self.image_data,
-                    self.label_hist,
-                    self.line_color.getRgb(),
-                    self.fill_color.getRgb(),
-                )
-            else:
-                self.label_file.save(
-                    annotation_file_path,
-                    shapes,
-                    self.file_path,
-                    self.image_data,
-                    self.line_color.getRgb(),
-                    self.fill_color.getRgb(),
-                )
-            print(
-                "Image:{0} -> Annotation:{1}".format(
-                    self.file_path, annotation_file_path
-                )
+            sync_annotations(
+                self.db_session, [image_path], self.default_save_dir, size_of=image_size
             )
-            return True
-        except LabelFileError as e:
-            self.error_message("Error saving label data", "<b>%s</b>" % e)
-            return False
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error("Failed to update the database for %s: %s", image_path, e)
 
     def copy_selected_shape(self):
         self.add_label(self.canvas.copy_selected_shape())
@@ -1394,38 +1629,21 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def combo_selection_changed(self, index):
         text = self.combo_box.cb.itemText(index)
-        for i in range(self.label_list.count()):
-            if text == "":
-                self.label_list.item(i).setCheckState(Qt.CheckState.Checked)
-            elif text != self.label_list.item(i).text():
-                self.label_list.item(i).setCheckState(Qt.CheckState.Unchecked)
-            else:
-                self.label_list.item(i).setCheckState(Qt.CheckState.Checked)
+        self.label_model.set_visible_where(
+            lambda shape: text == "" or shape.label == text
+        )
 
     def default_label_combo_selection_changed(self, index):
         self.default_label = self.label_hist[index]
 
     def label_selection_changed(self):
-        item = self.current_item()
-        if item and self.canvas.editing():
+        shape = self.current_shape()
+        if shape and self.canvas.editing():
             self._no_selection_slot = True
-            self.canvas.select_shape(self.items_to_shapes[item])
-            shape = self.items_to_shapes[item]
+            self.canvas.select_shape(shape)
             # Add Chris
             self.diffc_button.setChecked(shape.difficult)
 
-    def label_item_changed(self, item):
-        shape = self.items_to_shapes[item]
-        label = item.text()
-        if label != shape.label:
-            shape.label = item.text()
-            shape.line_color = generate_color_by_text(shape.label)
-            self.set_dirty()
-        else:  # User probably changed item visibility
-            self.canvas.set_shape_visible(
-                shape, item.checkState() == Qt.CheckState.Checked
-            )
-
     # Callback functions:
     def new_shape(self):
         """Pop-up and give focus to the label editor.
@@ -1561,13 +1779,26 @@ class MainWindow(QMainWindow, WindowMixin):
         self.set_light(self.light_widget.value() + increment)
 
     def toggle_polygons(self, value):
-        for item, shape in self.items_to_shapes.items():
-            item.setCheckState(
-                Qt.CheckState.Checked if value else Qt.CheckState.Unchecked
-            )
+        self.label_model.set_visible_where(lambda shape: value)
+
+    def undo(self):
+        self.undo_manager.undo()
+        self.sync_label_list()
 
+    def redo(self):
+        self.undo_manager.redo()
+        self.sync_label_list()
+
+    def sync_label_list(self):
+        """Rebind the label list to the canvas after it changed the shapes itself."""
+        self.label_model.set_shapes(self.canvas.shapes)
+        self.update_combo_box()
+
+    @perf.timed("load_file")
     def load_file(self, file_path=None):
         """Load the specified file, or the last opened file if None."""
+        if self.file_path:
+            self.undo_manager.close_image(self.canvas.shapes)
         self.reset_state()
         self.canvas.setEnabled(False)
         if file_path is None:
@@ -1576,23 +1807,25 @@ class MainWindow(QMainWindow, WindowMixin):
         # shapes type:
         # [label, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
         unicode_file_path = file_path
-        unicode_file_path = os.path.abspath(unicode_file_path)
+        unicode_file_path = storage.absolute(unicode_file_path)
         # Tzutalin 20160906 : Add file list and dock to move faster
         # Highlight the file item
-        if unicode_file_path and self.file_list_widget.count() > 0:
-            if unicode_file_path in self.m_img_list:
-                index = self.m_img_list.index(unicode_file_path)
-                file_widget_item = self.file_list_widget.item(index)
-                file_widget_item.setSelected(True)
+        if unicode_file_path and len(self.m_img_list) > 0:
+            index = self.m_img_list.get_index(unicode_file_path)
+            if index is not None:
+                file_list_index = self.file_list_model.index(index)
+                self.file_list.setCurrentIndex(file_list_index)
                 if self.auto_scroll_option.isChecked():
-                    self.file_list_widget.scrollToItem(file_widget_item)
+                    self.file_list.scrollTo(file_list_index)
                 self.cur_img_idx = index
                 self.update_progress_label()
+                storage.storage_for(unicode_file_path).read_ahead(
+                    self.m_img_list[index + 1 : index + 1 + READ_AHEAD]
+                )
             else:
-                self.file_list_widget.clear()
-                self.m_img_list.clear()
+                self.file_list_model.clear()
 
-        if unicode_file_path and os.path.exists(unicode_file_path):
+        if unicode_file_path and storage.exists(unicode_file_path):
             if LabelFile.is_label_file(unicode_file_path):
                 try:
                     self.label_file = LabelFile(unicode_file_path)
@@ -1619,10 +1852,11 @@ class MainWindow(QMainWindow, WindowMixin):
                 self.label_file = None
                 self.canvas.verified = False
 
-            if isinstance(self.image_data, QImage):
-                image = self.image_data
-            else:
-                image = QImage.fromData(self.image_data)
+            with perf.span("decode_image"):
+                if isinstance(self.image_data, QImage):
+                    image = self.image_data
+                else:
+                    image = QImage.fromData(self.image_data)
             if image.isNull():
                 msg = QMessageBox()
                 msg.setIcon(QMessageBox.Icon.Critical)
@@ -1652,7 +1886,7 @@ class MainWindow(QMainWindow, WindowMixin):
                             if os.path.exists(f):
                                 os.remove(f)
 
-                    self.import_dir_images(self.last_open_dir)
+                    self.remove_image_from_list(unicode_file_path)
                     if self.img_count > 0:
                         self.cur_img_idx = min(self.cur_img_idx, self.img_count - 1)
                         self.load_file(self.m_img_list[self.cur_img_idx])
@@ -1673,20 +1907,21 @@ class MainWindow(QMainWindow, WindowMixin):
             self.add_recent_file(self.file_path)
             self.toggle_actions(True)
             self.show_bounding_box_from_annotation_file(self.file_path)
+            self.undo_manager.open_image(self.file_path, self.canvas)
 
             counter = self.counter_str()
             self.setWindowTitle(f"{__appname__} {file_path} {counter}")
 
-            # Save the current file as the last opened file immediately
+            # Remember the current file as the last opened one; the write is
+            # deferred and merged with other navigation steps.
             self.settings[SETTING_FILENAME] = self.file_path
-            self.settings.save()
+            self.settings.save_later()
 
             # Default : select last item if there is at least one item
-            if self.label_list.count():
-                self.label_list.setCurrentItem(
-                    self.label_list.item(self.label_list.count() - 1)
+            if self.label_model.rowCount():
+                self.label_list.setCurrentIndex(
+                    self.label_model.index(self.label_model.rowCount() - 1)
                 )
-                self.label_list.item(self.label_list.count() - 1).setSelected(True)
 
             self.canvas.setFocus()
             return True
@@ -1701,33 +1936,62 @@ class MainWindow(QMainWindow, WindowMixin):
     def show_bounding_box_from_annotation_file(self, file_path):
         if file_path is None:
             return
+        annotation_path = self.indexed_annotation_path(file_path)
+        if annotation_path is None:
+            annotation_path = self.find_annotation_file(file_path)
+        if not annotation_path:
+            if self.coco_index is not None:
+                shapes = self.coco_index.shapes(file_path)
+                if shapes:
+                    self.load_labels(shapes)
+            return
+        if annotation_path.endswith(XML_EXT):
+            self.load_pascal_xml_by_filename(annotation_path)
+        elif annotation_path.endswith(TXT_EXT):
+            self.load_yolo_txt_by_filename(annotation_path)
+        else:
+            self.load_create_ml_json_by_filename(annotation_path, file_path)
+        self.file_list_model.refresh_row(
+            self.annotation_index.set_verified(file_path, self.canvas.verified)
+        )
+
+    def find_annotation_file(self, file_path):
+        """Annotation file of file_path by priority, or None; stats the candidates."""
         if self.default_save_dir is not None:
             basename = os.path.basename(os.path.splitext(file_path)[0])
             xml_path = os.path.join(self.default_save_dir, basename + XML_EXT)
             txt_path = os.path.join(self.default_save_dir, basename + TXT_EXT)
             json_path = os.path.join(self.default_save_dir, basename + JSON_EXT)
-
-            """Annotation file priority:
-            PascalXML > YOLO
-            """
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
-
         else:
             xml_path = os.path.splitext(file_path)[0] + XML_EXT
             txt_path = os.path.splitext(file_path)[0] + TXT_EXT
             json_path = os.path.splitext(file_path)[0] + JSON_EXT
 
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
+        """Annotation file priority:
+        PascalXML > YOLO
+        """
+        self.save_queue.wait(xml_path, txt_path, json_path)
+        for path in (xml_path, txt_path, json_path):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def indexed_annotation_path(self, file_path):
+        """
+        Annotation file of file_path from the annotation index: a path, ""
+        when it has none, or None when the index cannot tell.
+        """
+        if self.annotation_index.save_dir != (self.default_save_dir or None):
+            return None
+        annotation_path = self.annotation_index.annotation_path(file_path)
+        if annotation_path:
+            # Saves update the index when queued; wait for the file itself.
+            self.save_queue.wait(annotation_path)
+        return annotation_path
+
+    def refresh_annotation_index(self):
+        self.annotation_index.rebuild(self.default_save_dir)
+        self.file_list_model.refresh_all()
 
     def resizeEvent(self, event):
         if (
@@ -1799,27 +2063,22 @@ class MainWindow(QMainWindow, WindowMixin):
         settings[SETTING_AUTO_SCROLL] = self.auto_scroll_option.isChecked()
         settings[SETTING_DRAW_SQUARE] = self.draw_squares_option.isChecked()
         settings[SETTING_LABEL_FILE_FORMAT] = self.label_file_format
+        settings[SETTING_UNDO_LOG] = self.undo_log_option.isChecked()
         settings.save()
+        self.save_queue.wait()
+        if self.hash_job is not None:
+            self.hash_job.stop()
+        if self.file_path:
+            self.undo_manager.close_image(self.canvas.shapes)
+        self.undo_manager.close()
+        storage.close_all()
 
     def load_recent(self, filename):
         if self.may_continue():
             self.load_file(filename)
 
     def scan_all_images(self, folder_path):
-        extensions = [
-            f".{fmt.data().decode('ascii').lower()}"
-            for fmt in QImageReader.supportedImageFormats()
-        ]
-        images = []
-
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relative_path = os.path.join(root, file)
-                    path = os.path.abspath(relative_path)
-                    images.append(path)
-        natural_sort(images, key=lambda x: x.lower())
-        return images
+        return scan_all_images(folder_path)
 
     def change_save_dir_dialog(self, _value=False):
         if self.default_save_dir is not None:
@@ -1836,6 +2095,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         if dir_path is not None and len(dir_path) > 1:
             self.default_save_dir = dir_path
+            self.refresh_annotation_index()
 
         if self.file_path:
             self.show_bounding_box_from_annotation_file(self.file_path)
@@ -1894,16 +2154,54 @@ class MainWindow(QMainWindow, WindowMixin):
                 | QFileDialog.Option.DontResolveSymlinks,
             )
         else:
-            target_dir_path = default_open_dir_path
+            target_dir_path = dir_path or default_open_dir_path
         self.last_open_dir = target_dir_path
 
+        # Set first: importing ingests the annotations found there.
+        try:
+            self.default_save_dir = storage.project_dir(target_dir_path)
+        except (OSError, RuntimeError, ValueError) as e:
+            QMessageBox.warning(self, "Open", "Cannot open %s:\n%s" % (target_dir_path, e))
+            return
         self.import_dir_images(target_dir_path)
-        self.default_save_dir = target_dir_path
-
-        self.default_save_dir = target_dir_path
         if self.file_path:
             self.show_bounding_box_from_annotation_file(file_path=self.file_path)
 
+    def open_archive_dialog(self, _value=False):
+        if not self.may_continue():
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "%s - Open Dataset Archive" % __appname__,
+            os.path.dirname(self.last_open_dir or "."),
+            "Dataset archives (%s)" % " ".join("*" + ext for ext in storage.ARCHIVE_EXTS),
+        )
+        if path:
+            self.open_dir_dialog(dir_path=path, silent=True)
+
+    def open_remote_dialog(self, _value=False):
+        if not self.may_continue():
+            return
+        url, ok = QInputDialog.getText(
+            self,
+            "%s - Open Remote Dataset" % __appname__,
+            "URL (s3://bucket/prefix):",
+            text=self.last_open_dir if storage.is_remote(self.last_open_dir or "") else "s3://",
+        )
+        url = url.strip()
+        if not ok or not url:
+            return
+        if not storage.is_remote(url):
+            QMessageBox.warning(self, "Open", "%s is not a supported URL." % url)
+            return
+        self.open_dir_dialog(dir_path=url, silent=True)
+        if self.dir_name == url and self.default_save_dir:
+            # The bucket is never written; say where the work goes.
+            self.status(
+                "Annotations of %s are saved in %s; Change Save Dir picks another"
+                % (url, self.default_save_dir)
+            )
+
     def import_dir_images(self, dir_path, load_first=True):
         if not self.may_continue() or not dir_path:
             return
@@ -1913,13 +2211,16 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # Init DB
         try:
-            db_path = os.path.join(dir_path, "labelImg.db")
+            os.makedirs(storage.project_dir(dir_path), exist_ok=True)
+            db_path = os.path.join(storage.project_dir(dir_path), "labelImg.db")
 
             # Skip if database is already initialized for this path
             cur_db_path = getattr(self, "current_db_path", None)
             if cur_db_path == db_path and self.db_session:
                 Session = None  # Already initialized
             else:
+                from libs.database import init_db
+
                 Session = init_db(db_path)
                 self.db_session = Session()
                 self.current_db_path = db_path
@@ -1927,38 +2228,47 @@ class MainWindow(QMainWindow, WindowMixin):
             if self.undo_manager:
                 self.undo_manager.set_db_session(self.db_session)
 
+            self.attach_coco_index()
+
             # Load existing classes from DB to history and prioritize them
             from libs.database import Class
 
             classes = self.db_session.query(Class).all()
+            self.sync_class_palette(classes)
             if classes:
                 # If we have classes in project, clear defaults and use project classes
                 self.label_hist = [cls.name for cls in classes]
                 self.update_combo_box()
-                print(
-                    f"Project loaded: {len(classes)} classes found and synchronized: {self.label_hist}"
+                logger.info(
+                    "Project loaded: %d classes found and synchronized: %s",
+                    len(classes),
+                    self.label_hist,
                 )
             else:
-                print(
-                    "Project loaded: No classes found in database yet. Current history:",
+                logger.info(
+                    "Project loaded: No classes found in database yet. Current history: %s",
                     self.label_hist,
                 )
 
         except Exception as e:
-            print(f"Failed to init DB in import_dir_images: {e}")
+            logger.error("Failed to init DB in import_dir_images: %s", e)
 
         self.file_path = None
-        self.file_list_widget.clear()
-        self.m_img_list = self.scan_all_images(dir_path)
+        self.cur_img_idx = -1
+        self.project_images = None
+        self.file_list_model.set_paths(self.scan_all_images(dir_path))
+        self.refresh_annotation_index()
         self.img_count = len(self.m_img_list)
         if load_first:
             self.open_next_image()
-        for imgPath in self.m_img_list:
-            item = QListWidgetItem(imgPath)
-            self.file_list_widget.addItem(item)
         self.update_progress_label()
         self.update_db_statistics()
 
+    def remove_image_from_list(self, path):
+        """Drop a deleted image from the list without rescanning the directory."""
+        self.file_list_model.remove_path(path)
+        self.img_count = len(self.m_img_list)
+
     def update_progress_label(self):
         if self.img_count > 0:
             self.prog_label.setText(
@@ -1984,18 +2294,35 @@ class MainWindow(QMainWindow, WindowMixin):
             self.canvas.verified = self.label_file.verified
             self.paint_canvas()
             self.save_file()
+            # YOLO files have no verified flag for the sync to read.
+            self.record_verified(self.file_path, self.label_file.verified)
 
-    def open_prev_image(self, _value=False):
-        # Proceeding prev image without dialog if having any label
+    def record_verified(self, image_path, verified):
+        if not self.db_session:
+            return
+        from libs.annotation_sync import set_verified
+
+        try:
+            set_verified(self.db_session, image_path, verified)
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error("Failed to store the verified flag of %s: %s", image_path, e)
+
+    def may_leave_image(self):
+        """Auto-save or ask about unsaved changes; False to stay on the image."""
         if self.auto_saving.isChecked():
             if self.default_save_dir is not None:
                 if self.dirty is True:
-                    self.save_file()
+                    self.save_file(in_background=True)
             else:
                 self.change_save_dir_dialog()
-                return
+                return False
 
-        if not self.may_continue():
+        return self.may_continue()
+
+    def open_prev_image(self, _value=False):
+        # Proceeding prev image without dialog if having any label
+        if not self.may_leave_image():
             return
 
         if self.img_count <= 0:
@@ -2012,15 +2339,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def open_next_image(self, _value=False):
         # Proceeding next image without dialog if having any label
-        if self.auto_saving.isChecked():
-            if self.default_save_dir is not None:
-                if self.dirty is True:
-                    self.save_file()
-            else:
-                self.change_save_dir_dialog()
-                return
-
-        if not self.may_continue():
+        if not self.may_leave_image():
             return
 
         if self.img_count <= 0:
@@ -2044,6 +2363,29 @@ class MainWindow(QMainWindow, WindowMixin):
         if filename:
             self.load_file(filename)
 
+    def open_next_unlabelled_image(self, _value=False):
+        self.open_image_found_by(self.annotation_index.next_unlabelled)
+
+    def open_prev_unlabelled_image(self, _value=False):
+        self.open_image_found_by(self.annotation_index.prev_unlabelled)
+
+    def open_next_unverified_image(self, _value=False):
+        self.open_image_found_by(self.annotation_index.next_unverified)
+
+    def open_image_found_by(self, find):
+        """Open the image at find(current position) of the annotation index."""
+        if not self.m_img_list or not self.may_leave_image():
+            return
+        if self.annotation_index.save_dir != (self.default_save_dir or None):
+            self.refresh_annotation_index()
+        current = getattr(self, "cur_img_idx", -1) if self.file_path else -1
+        position = find(current)
+        if position is None:
+            self.status("No more matching images")
+            return
+        self.cur_img_idx = position
+        self.load_file(self.m_img_list[position])
+
     def open_file(self, _value=False):
         if not self.may_continue():
             return
@@ -2065,13 +2407,19 @@ class MainWindow(QMainWindow, WindowMixin):
             self.img_count = 1
             self.load_file(filename)
 
-    def save_file(self, _value=False):
+    def save_file(self, _value=False, in_background=False):
         if self.default_save_dir is not None and len(self.default_save_dir):
             if self.file_path:
                 image_file_name = os.path.basename(self.file_path)
                 saved_file_name = os.path.splitext(image_file_name)[0]
                 saved_path = os.path.join(self.default_save_dir, saved_file_name)
-                self._save_file(saved_path)
+                if in_background:
+                    saved_path = self.save_labels_later(saved_path)
+                    self.set_clean()
+                    self.statusBar().showMessage("Saving to  %s" % saved_path)
+                    self.statusBar().show()
+                else:
+                    self._save_file(saved_path)
         else:
             image_file_dir = os.path.dirname(self.file_path)
             image_file_name = os.path.basename(self.file_path)
@@ -2116,6 +2464,8 @@ class MainWindow(QMainWindow, WindowMixin):
     def close_file(self, _value=False):
         if not self.may_continue():
             return
+        if self.file_path:
+            self.undo_manager.close_image(self.canvas.shapes)
         self.reset_state()
         self.set_clean()
         self.toggle_actions(False)
@@ -2130,7 +2480,13 @@ class MainWindow(QMainWindow, WindowMixin):
                 "You are about to permanently delete this image file.\nAre you sure you want to delete\n%s?"
                 % delete_path
             )
+            if not storage.is_local(delete_path):
+                QMessageBox.information(
+                    self, "Attention", "Images inside an archive or object store cannot be deleted."
+                )
+                return
             if QMessageBox.warning(self, "Attention", msg, yes | no) == yes:
+                self.save_queue.wait()
                 if os.path.exists(delete_path):
                     os.remove(delete_path)
 
@@ -2147,7 +2503,7 @@ class MainWindow(QMainWindow, WindowMixin):
                         os.remove(annotation_path)
                         break
 
-                self.import_dir_images(self.last_open_dir, load_first=False)
+                self.remove_image_from_list(delete_path)
                 if self.img_count > 0:
                     self.cur_img_idx = min(self.cur_img_idx, self.img_count - 1)
                     filename = self.m_img_list[self.cur_img_idx]
@@ -2271,7 +2627,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.set_format(FORMAT_YOLO)
         t_yolo_parse_reader = YoloReader(txt_path, self.image)
         shapes = t_yolo_parse_reader.get_shapes()
-        print(shapes)
+        logger.debug("YOLO shapes: %s", shapes)
         self.load_labels(shapes)
         self.canvas.verified = t_yolo_parse_reader.verified
 
@@ -2289,9 +2645,8 @@ class MainWindow(QMainWindow, WindowMixin):
         self.canvas.verified = create_ml_parse_reader.verified
 
     def copy_previous_bounding_boxes(self):
-        current_index = self.m_img_list.index(self.file_path)
-        if current_index - 1 >= 0:
-            prev_file_path = self.m_img_list[current_index - 1]
+        prev_file_path = self.m_img_list.neighbour(self.file_path, -1)
+        if prev_file_path is not None:
             self.show_bounding_box_from_annotation_file(prev_file_path)
             self.save_file()
 
@@ -2302,20 +2657,22 @@ class MainWindow(QMainWindow, WindowMixin):
     def toggle_draw_square(self):
         self.canvas.set_drawing_shape_to_square(self.draw_squares_option.isChecked())
 
+    @perf.timed("update_db_statistics")
     def update_db_statistics(self):
         if not self.db_session or not self.m_img_list:
             return
 
         self.statusBar().showMessage("Updating statistics...")
         QApplication.processEvents()
+        # The annotation files are read below.
+        self.save_queue.wait()
+
+        from libs.annotation_sync import sync_annotations
+        from libs.database import Class
 
         try:
             # Sync Classes
-            for i in range(self.label_list.count()):
-                item = self.label_list.item(i)
-                if not item:
-                    continue
-                class_name = item.text()
+            for class_name in set(self.label_model.labels()):
                 if not class_name:
                     continue
                 # Check if exists
@@ -2327,67 +2684,43 @@ class MainWindow(QMainWindow, WindowMixin):
                     self.db_session.add(new_class)
             self.db_session.commit()
 
-            # Iterate over all images in the list
-            for img_path in self.m_img_list:
-
-                # Add Image to DB if not exists
-                existing_image = (
-                    self.db_session.query(Image).filter_by(path=img_path).first()
-                )
-                if not existing_image:
-                    existing_image = Image(path=img_path)
-                    self.db_session.add(existing_image)
-                    self.db_session.flush()  # to get ID
-
-                    # Load annotations for this image (without full loading in GUI)
-                    xml_path = os.path.splitext(img_path)[0] + XML_EXT
-
-                    shapes = []
-                    if os.path.isfile(xml_path):
-                        # We need a lightweight iterator or reusing libraries.
-                        # For now, let's just rely on what we have.
-                        # Use PascalVocReader just to get shapes
-                        try:
-                            reader = PascalVocReader(xml_path)
-                            shapes = reader.get_shapes()
-                        except:
-                            pass
-
-                    for (
-                        label,
-                        create_ml_points,
-                        line_color,
-                        fill_color,
-                        difficult,
-                    ) in shapes:
-                        # Ensure class exists
-                        cls = self.db_session.query(Class).filter_by(name=label).first()
-                        if not cls:
-                            cls = Class(name=label)
-                            self.db_session.add(cls)
-                            self.db_session.flush()
-
-                        ann = Annotation(image_id=existing_image.id, class_id=cls.id)
-                        self.db_session.add(ann)
-
-            self.db_session.commit()
+            # Images whose annotation file changed since it was read, in
+            # any format, are read again.
+            sync_annotations(
+                self.db_session,
+                self.project_images or self.m_img_list,
+                self.default_save_dir,
+                size_of=image_size,
+            )
 
             # Refresh history from DB - prioritize project classes
             classes = self.db_session.query(Class).all()
+            self.sync_class_palette(classes)
             if classes:
                 project_classes = sorted([cls.name for cls in classes])
                 self.label_hist = project_classes
                 self.update_combo_box()
-                print(
-                    f"Project statistics: {len(project_classes)} classes synchronized."
+                logger.info(
+                    "Project statistics: %d classes synchronized.", len(project_classes)
                 )
 
             self.statusBar().showMessage("Statistics updated.", 5000)
 
         except Exception as e:
-            print(f"Error updating statistics: {e}")
+            logger.error("Error updating statistics: %s", e)
             self.statusBar().showMessage(f"Error updating statistics: {e}", 5000)
 
+    def sync_class_palette(self, classes):
+        """Give every project class a fixed color and use them as the palette."""
+        changed = False
+        for cls in classes:
+            if not cls.color:
+                cls.color = generate_color_by_text(cls.name).name()
+                changed = True
+        if changed:
+            self.db_session.commit()
+        set_color_palette({cls.name: cls.color for cls in classes})
+
     def show_statistics_dialog(self):
         if not self.db_session:
             QMessageBox.warning(
@@ -2397,9 +2730,361 @@ class MainWindow(QMainWindow, WindowMixin):
             )
             return
 
+        from libs.statistics_dialog import StatisticsDialog
+
         dlg = StatisticsDialog(self, self.db_session)
         dlg.exec()
 
+    def find_images(self, _value=False):
+        if not self.db_session:
+            QMessageBox.warning(
+                self,
+                "Find Images",
+                "Database not initialized. Please open a directory first.",
+            )
+            return
+
+        from libs.database import Class
+        from libs.query_dialog import QueryDialog
+
+        class_names = [
+            name for (name,) in self.db_session.query(Class.name).order_by(Class.name)
+        ]
+        dlg = QueryDialog(self, class_names)
+        if not dlg.exec():
+            return
+        query = dlg.query()
+        # Queries read the boxes from the database.
+        self.update_db_statistics()
+        with perf.span("dataset_query"):
+            paths = query.paths(self.db_session)
+        self.set_working_set(paths)
+        self.status("Working set: %d images (%s)" % (self.img_count, query))
+
+    def check_boxes(self, _value=False):
+        if not self.db_session:
+            QMessageBox.warning(
+                self,
+                "Check Boxes",
+                "Database not initialized. Please open a directory first.",
+            )
+            return
+
+        from libs.box_checks import check_boxes
+        from libs.dataset_query import DatasetQuery
+
+        self.update_db_statistics()
+        self.status("Checking boxes...")
+        QApplication.processEvents()
+
+        with perf.span("check_boxes"):
+            counts = check_boxes(self.db_session, size_of=image_size)
+        query = DatasetQuery().has_issue()
+        images = query.count(self.db_session)
+        lines = [
+            "%s: %d boxes" % (kind.replace("_", " ").capitalize(), count)
+            for kind, count in counts.items()
+        ]
+        if not images:
+            QMessageBox.information(
+                self, "Check Boxes", "\n".join(lines + ["", "No issues found."])
+            )
+            return
+        answer = QMessageBox.question(
+            self,
+            "Check Boxes",
+            "\n".join(lines + ["", "Show only the %d images with issues?" % images]),
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.set_working_set(query.paths(self.db_session))
+            self.status("Working set: %d images (%s)" % (self.img_count, query))
+
+    def find_duplicate_images(self, _value=False):
+        if not self.db_session:
+            QMessageBox.warning(
+                self,
+                "Find Duplicate Images",
+                "Database not initialized. Please open a directory first.",
+            )
+            return
+        if self.hash_job is not None and self.hash_job.is_running():
+            self.status("Still hashing images...")
+            return
+
+        from sqlalchemy.orm import sessionmaker
+        from libs.image_hash import HashJob
+
+        # Only images known to the database are hashed.
+        self.update_db_statistics()
+        self.hash_job = HashJob(
+            sessionmaker(bind=self.db_session.get_bind()),
+            on_progress=self.hash_progress.emit,
+            on_done=lambda hashed, error: self.hashing_finished.emit(
+                hashed, str(error) if error else ""
+            ),
+        )
+        self.hash_job.start()
+
+    def image_hash_progress(self, done, total):
+        self.status("Hashing images: %d of %d" % (done, total), 0)
+
+    def image_hashing_finished(self, hashed, error):
+        if error:
+            self.status("Hashing images failed: %s" % error)
+            return
+        if not self.db_session:
+            return
+
+        from libs.duplicates_dialog import DuplicatesDialog
+        from libs.image_hash import duplicate_clusters
+
+        # The job wrote with its own session.
+        self.db_session.expire_all()
+        with perf.span("duplicate_clusters"):
+            clusters = duplicate_clusters(self.db_session)
+        self.status("%d images hashed, %d duplicate clusters" % (hashed, len(clusters)))
+        dlg = DuplicatesDialog(self, clusters, open_image=self.open_duplicate)
+        if dlg.exec():
+            self.set_working_set(dlg.paths())
+            self.status("Working set: %d images (duplicates)" % self.img_count)
+
+    def open_duplicate(self, path):
+        if path in self.m_img_list and self.may_leave_image():
+            self.load_file(path)
+
+    def change_class(self, _value=False):
+        if not self.db_session:
+            QMessageBox.warning(
+                self,
+                "Change Class",
+                "Database not initialized. Please open a directory first.",
+            )
+            return
+        if not self.may_continue():
+            return
+
+        from libs.class_change_dialog import ClassChangeDialog
+        from libs.class_ops import apply_class_change, plan_class_change
+        from libs.database import Class
+
+        # Offer the classes the annotation files use now.
+        self.update_db_statistics()
+        class_names = [
+            name for (name,) in self.db_session.query(Class.name).order_by(Class.name)
+        ]
+        dlg = ClassChangeDialog(self, class_names)
+        if not dlg.exec() or not dlg.mapping():
+            return
+        # The rewrite reads the files the queue may still be writing.
+        self.save_queue.wait()
+        image_paths = self.project_images or self.m_img_list
+        plan = plan_class_change(
+            self.db_session,
+            image_paths,
+            dlg.mapping(),
+            self.default_save_dir,
+            size_of=image_size,
+        )
+        answer = QMessageBox.question(
+            self,
+            "Change Class",
+            "\n".join(plan.report() + ["", "Apply these changes?"]),
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        with perf.span("class_change"):
+            errors = apply_class_change(self.db_session, plan)
+        if errors:
+            QMessageBox.warning(
+                self,
+                "Change Class",
+                "No file and no database row was changed; these files failed:\n"
+                + "\n".join("%s: %s" % error for error in errors[:20]),
+            )
+            return
+
+        classes = self.db_session.query(Class).all()
+        self.sync_class_palette(classes)
+        self.label_hist = sorted(cls.name for cls in classes)
+        self.update_combo_box()
+        self.refresh_annotation_index()
+        if self.file_path:
+            self.load_file(self.file_path)
+        self.status("%d annotation files updated" % len(plan.files))
+
+    def set_working_set(self, paths):
+        """List only paths, in directory order, until show_all_images()."""
+        if self.project_images is None:
+            self.project_images = ImageCatalog(self.m_img_list)
+        positions = sorted(
+            position
+            for position in map(self.project_images.get_index, paths)
+            if position is not None
+        )
+        self.show_image_list(self.project_images[position] for position in positions)
+
+    def show_all_images(self, _value=False):
+        if self.project_images is None:
+            return
+        project_images, self.project_images = self.project_images, None
+        self.show_image_list(project_images)
+        self.status("Showing all %d images" % self.img_count)
+
+    def show_image_list(self, paths):
+        self.file_list_model.set_paths(paths)
+        self.refresh_annotation_index()
+        self.img_count = len(self.m_img_list)
+        position = self.m_img_list.get_index(self.file_path)
+        if position is None:
+            # Next opens the first image of the new list.
+            self.cur_img_idx = -1
+        else:
+            self.cur_img_idx = position
+            self.file_list.setCurrentIndex(self.file_list_model.index(position))
+        self.update_progress_label()
+
+    def attach_coco_index(self):
+        """Reopens the COCO file imported into the current project, if any."""
+        from libs.coco_io import COCO_SETTING, CocoIndex
+        from libs.database import Setting
+
+        self.coco_index = None
+        setting = self.db_session.get(Setting, COCO_SETTING)
+        if setting is None or not os.path.isfile(setting.value):
+            return
+        try:
+            with perf.span("coco_index"):
+                self.coco_index = CocoIndex(setting.value, self.default_save_dir)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Cannot read COCO annotations %s: %s", setting.value, e)
+
+    def import_coco_dialog(self, _value=False):
+        if not self.db_session:
+            QMessageBox.warning(
+                self,
+                "Import COCO",
+                "Database not initialized. Please open a directory first.",
+            )
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "%s - Import COCO Annotations" % __appname__,
+            self.default_save_dir or ".",
+            "COCO files (*.json)",
+        )
+        if not path:
+            return
+
+        from libs.coco_io import COCO_SETTING, CocoIndex
+        from libs.database import Setting
+
+        self.status("Indexing %s..." % path)
+        QApplication.processEvents()
+        try:
+            with perf.span("coco_index"):
+                coco_index = CocoIndex(path, self.default_save_dir)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.warning(
+                self, "Import COCO", "Cannot read %s:\n%s" % (path, e)
+            )
+            return
+        self.coco_index = coco_index
+        self.db_session.merge(Setting(key=COCO_SETTING, value=coco_index.json_path))
+        self.db_session.commit()
+        self.status(
+            "COCO annotations of %d images from %s" % (len(coco_index), path)
+        )
+        if self.file_path and not self.canvas.shapes:
+            self.show_bounding_box_from_annotation_file(self.file_path)
+
+    def export_coco_dialog(self, _value=False):
+        if not self.db_session:
+            QMessageBox.warning(
+                self,
+                "Export COCO",
+                "Database not initialized. Please open a directory first.",
+            )
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "%s - Export COCO" % __appname__,
+            os.path.join(self.default_save_dir or ".", "instances.json"),
+            "COCO files (*.json)",
+        )
+        if not path:
+            return
+
+        from libs.annotation_sync import sync_annotations
+        from libs.coco_io import export_coco
+
+        self.status("Exporting COCO...")
+        QApplication.processEvents()
+        # The boxes are exported from the database: bring it up to date
+        # with the annotation files first.
+        self.save_queue.wait()
+        try:
+            sync_annotations(
+                self.db_session,
+                self.project_images or self.m_img_list,
+                self.default_save_dir,
+                size_of=image_size,
+            )
+        except Exception as e:
+            self.db_session.rollback()
+            QMessageBox.warning(
+                self, "Export COCO", "Cannot read the annotations:\n%s" % e
+            )
+            return
+        try:
+            with perf.span("export_coco"):
+                images, boxes = export_coco(
+                    self.db_session, path, root=self.dir_name, size_of=image_size
+                )
+        except OSError as e:
+            QMessageBox.warning(
+                self, "Export COCO", "Cannot write %s:\n%s" % (path, e)
+            )
+            return
+        self.status("Exported %d images and %d boxes to %s" % (images, boxes, path))
+
+    def export_perf_histograms(self):
+        if not perf.snapshot():
+            QMessageBox.information(
+                self,
+                "Performance",
+                "No timings recorded yet. Enable View > Performance HUD first.",
+            )
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "%s - Export Performance Histograms" % __appname__,
+            "labelImg-perf.json",
+            "JSON files (*.json)",
+        )
+        if path:
+            perf.export_histograms(path)
+            self.status("Performance histograms saved to %s" % path)
+
+
+def scan_all_images(folder_path):
+    """Naturally sorted absolute paths of the readable images under folder_path."""
+    extensions = tuple(
+        f".{fmt.data().decode('ascii').lower()}"
+        for fmt in QImageReader.supportedImageFormats()
+    )
+    images = storage.root_storage(folder_path).scan_images(folder_path, extensions)
+    natural_sort(images, key=lambda x: x.lower())
+    return images
+
+
+def image_size(path):
+    """(width, height) of the image at path read from its header, or None."""
+    reader = storage.image_reader(path)
+    if reader is None:
+        return None
+    size = reader.size()
+    return (size.width(), size.height()) if size.isValid() else None
+
 
 def inverted(color):
     return QColor(*[255 - v for v in color.getRgb()])
@@ -2407,9 +3092,7 @@ def inverted(color):
 
 def read(filename, default=None):
     try:
-        reader = QImageReader(filename)
-        reader.setAutoTransform(True)
-        return reader.read()
+        return storage.read_image(filename)
     except:
         return default
 
@@ -2435,9 +3118,16 @@ def get_main_app(argv=None):
         nargs="?",
     )
     argparser.add_argument("save_dir", nargs="?")
+    argparser.add_argument(
+        PROFILE_FLAG,
+        action="store_true",
+        help="print an import-time breakdown of the startup and exit",
+    )
     args = argparser.parse_args(argv[1:])
 
-    args.image_dir = args.image_dir and os.path.normpath(args.image_dir)
+    # normpath would fold the // of a remote URL such as s3://bucket/prefix.
+    if args.image_dir and not storage.is_remote(args.image_dir):
+        args.image_dir = os.path.normpath(args.image_dir)
     args.class_file = args.class_file and os.path.normpath(args.class_file)
     args.save_dir = args.save_dir and os.path.normpath(args.save_dir)
 
@@ -2449,7 +3139,12 @@ def get_main_app(argv=None):
 
 def main():
     """construct main app and run it"""
+    setup_logging()
+    if PROFILE_FLAG in sys.argv[1:]:
+        return profile_startup(sys.argv)
     app, _win = get_main_app(sys.argv)
+    if os.environ.get(EXIT_AFTER_STARTUP_ENV):
+        QTimer.singleShot(0, app.quit)
     return app.exec()
 
 
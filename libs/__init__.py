@@ -2,34 +2,37 @@ __version_info__ = ("1", "8", "6")
 __version__ = ".".join(__version_info__)
 
 
-# Auto-compile Qt6 resources if not present
-def _ensure_resources():
-    from pathlib import Path
+# Compiled Qt resources, for checkouts and installs that skipped `make resources`
+def compile_resources():
+    """
+    Writes libs/resources.py from resources.qrc with pyside6-rcc, as
+    `make resources` does. Raises ImportError saying what is missing when
+    it cannot.
+    """
     import subprocess
+    from pathlib import Path
+
+    from libs.atomic_io import atomic_write
 
     resources_py = Path(__file__).parent / "resources.py"
     resources_qrc = Path(__file__).parent.parent / "resources.qrc"
-
-    if not resources_py.exists() and resources_qrc.exists():
-        try:
-            # pyside6-rcc is now a mandatory dependency in pyproject.toml
-            subprocess.run(
-                ["pyside6-rcc", "-o", str(resources_py), str(resources_qrc)], check=True
-            )
-
-            # Post-process: Ensure the generated file uses PyQt6 imports
-            with open(resources_py, "r") as f:
-                content = f.read()
-
-            if "from PySide6" in content:
-                content = content.replace("from PySide6", "from PyQt6")
-                with open(resources_py, "w") as f:
-                    f.write(content)
-        except Exception:
-            pass  # Fail silently or handle if needed
-
-
-_ensure_resources()
+    hint = "%s is missing; build it with `make resources`" % resources_py
+    if not resources_qrc.exists():
+        raise ImportError("%s (%s not found)" % (hint, resources_qrc))
+    try:
+        result = subprocess.run(
+            ["pyside6-rcc", str(resources_qrc)], capture_output=True, check=True
+        )
+    except OSError as e:
+        raise ImportError("%s (pyside6-rcc: %s)" % (hint, e)) from e
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.decode("utf-8", "replace").strip()
+        raise ImportError("%s (pyside6-rcc failed: %s)" % (hint, error)) from e
+    source = result.stdout.decode("utf-8").replace("from PySide6", "from PyQt6")
+    try:
+        atomic_write(str(resources_py), source, "utf-8")
+    except OSError as e:
+        raise ImportError("%s (cannot write it: %s)" % (hint, e)) from e
 
 
 # Database initialization helper with automatic Alembic migrations
@@ -0,0 +1,180 @@
+"""
+Which images of the catalog have annotation files, and which are verified.
+
+The index is built from one os.scandir() of the save directory (or of
+each image directory when annotations sit next to the images) instead of
+stat calls per image, and is then kept up to date as files are saved.
+Flags live in bytearrays aligned with the catalog positions, so the next
+unlabelled image is a memchr away.
+
+Whether an annotation is verified is only known once its file has been
+read; it is probed lazily, at most once per file, while searching.
+"""
+import os
+
+from libs.create_ml_io import JSON_EXT
+from libs.pascal_voc_io import XML_EXT
+from libs.yolo_io import TXT_EXT
+
+# Format bits, in the order annotations are looked up when an image is opened.
+FORMAT_BITS = ((XML_EXT, 1), (TXT_EXT, 2), (JSON_EXT, 4))
+_BIT_OF_EXT = dict(FORMAT_BITS)
+# Maps format bits to 1 (labelled) or 0, for bytearray.translate().
+_LABELLED_TABLE = bytes([0] + [1] * 255)
+
+# Verified states.
+UNKNOWN, UNVERIFIED, VERIFIED = 0, 1, 2
+
+# Enough of the file to hold the root element of a Pascal VOC file or the
+# first entry of a CreateML file.
+_PROBE_SIZE = 1024
+
+
+class AnnotationIndex(object):
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.save_dir = None
+        self._formats = bytearray()
+        self._labelled = bytearray()
+        self._verified = bytearray()
+        # 1 where an annotated image is not known to be verified.
+        self._to_review = bytearray()
+
+    def rebuild(self, save_dir=None):
+        """Scan for annotation files of every image in the catalog."""
+        self.save_dir = save_dir or None
+        listings = {}
+        formats = bytearray(len(self.catalog))
+        for position, path in enumerate(self.catalog):
+            directory, name = os.path.split(path)
+            directory = self.save_dir or directory
+            found = listings.get(directory)
+            if found is None:
+                found = listings[directory] = _scan(directory)
+            formats[position] = found.get(os.path.splitext(name)[0], 0)
+        self._formats = formats
+        self._labelled = formats.translate(_LABELLED_TABLE)
+        self._verified = bytearray(len(formats))
+        self._to_review = bytearray(self._labelled)
+
+    def __len__(self):
+        return len(self._formats)
+
+    def annotation_dir(self, image_path):
+        return self.save_dir or os.path.dirname(image_path)
+
+    def formats(self, image_path):
+        """Format bits of image_path, or None when it is not indexed."""
+        position = self._position(image_path)
+        if position is None:
+            return None
+        return self._formats[position]
+
+    def annotation_path(self, image_path):
+        """
+        Annotation file of image_path by lookup priority, "" when it has
+        none, or None when the image is not indexed.
+        """
+        bits = self.formats(image_path)
+        if bits is None:
+            return None
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        for ext, bit in FORMAT_BITS:
+            if bits & bit:
+                return os.path.join(self.annotation_dir(image_path), stem + ext)
+        return ""
+
+    def is_labelled(self, position):
+        return bool(self._labelled[position])
+
+    def verified_state(self, position):
+        return self._verified[position]
+
+    def mark_saved(self, image_path, annotation_path, verified):
+        """Record a save of image_path; returns its position or None."""
+        position = self._position(image_path)
+        if position is None:
+            return None
+        directory, name = os.path.split(annotation_path)
+        bit = _BIT_OF_EXT.get(os.path.splitext(name)[1])
+        if bit is None or directory != self.annotation_dir(image_path):
+            return None
+        self._formats[position] |= bit
+        self._labelled[position] = 1
+        self._set_verified(position, verified)
+        return position
+
+    def set_verified(self, image_path, verified):
+        """Record the verified flag of a loaded image; returns its position or None."""
+        position = self._position(image_path)
+        if position is None or not self._labelled[position]:
+            return None
+        self._set_verified(position, verified)
+        return position
+
+    def remove(self, position):
+        for flags in (self._formats, self._labelled, self._verified, self._to_review):
+            del flags[position]
+
+    def next_unlabelled(self, position):
+        return _found(self._labelled.find(b"\0", position + 1))
+
+    def prev_unlabelled(self, position):
+        return _found(self._labelled.rfind(b"\0", 0, max(position, 0)))
+
+    def next_unverified(self, position):
+        """Next annotated image that is not verified; unknown flags are probed."""
+        start = position + 1
+        while True:
+            candidate = self._to_review.find(b"\1", start)
+            if candidate < 0:
+                return None
+            if self._verified[candidate] == UNKNOWN:
+                self._set_verified(candidate, self._probe_verified(candidate))
+            if self._verified[candidate] != VERIFIED:
+                return candidate
+            start = candidate + 1
+
+    def _set_verified(self, position, verified):
+        self._verified[position] = VERIFIED if verified else UNVERIFIED
+        self._to_review[position] = 0 if verified else 1
+
+    def _probe_verified(self, position):
+        annotation_path = self.annotation_path(self.catalog[position])
+        if not annotation_path or annotation_path.endswith(TXT_EXT):
+            return False
+        try:
+            with open(annotation_path, "rb") as f:
+                head = f.read(_PROBE_SIZE)
+        except OSError:
+            return False
+        if annotation_path.endswith(XML_EXT):
+            root = head[head.find(b"<annotation") :]
+            return b'verified="yes"' in root[: root.find(b">") + 1]
+        return b'"verified": true' in head
+
+    def _position(self, image_path):
+        position = self.catalog.get_index(image_path)
+        if position is None or position >= len(self._formats):
+            return None
+        return position
+
+
+def _scan(directory):
+    """{stem: format bits} of the annotation files in directory."""
+    found = {}
+    try:
+        with os.scandir(directory or ".") as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                bit = _BIT_OF_EXT.get(ext)
+                if bit and entry.is_file():
+                    found[stem] = found.get(stem, 0) | bit
+    except OSError:
+        pass
+    return found
+
+
+def _found(position):
+    return None if position < 0 else position
@@ -0,0 +1,196 @@
+"""
+Keeps the images and annotations tables in step with the annotation files.
+
+    sync_annotations(session, image_paths, save_dir)
+    set_verified(session, image_path, verified)
+
+The statistics, queries, box checks, class changes and COCO export all
+read boxes from the database, while the GUI edits the files. Each image
+row records the mtime of the annotation file its boxes came from
+(annotation_mtime_ns, 0 for none); an image is read again only when that
+no longer matches, so a sync of an unchanged project costs a listing of
+each annotation directory and a stat per annotation file.
+
+Annotation files are looked up like the GUI does: <stem>.xml, .txt, then
+.json in save_dir, or next to the image without one. YOLO files carry no
+"verified" flag, so the stored one, written by set_verified(), is kept.
+"""
+import logging
+import os
+
+from sqlalchemy import delete, insert, select, update
+
+from libs.create_ml_io import JSON_EXT, CreateMLReader
+from libs.database import Annotation, Class, Image
+from libs.pascal_voc_io import XML_EXT, PascalVocReader
+from libs.yolo_io import TXT_EXT, YoloReader
+
+logger = logging.getLogger(__name__)
+
+# In the order the GUI prefers them.
+ANNOTATION_EXTS = (XML_EXT, TXT_EXT, JSON_EXT)
+# Paths per IN (...) query.
+_CHUNK = 500
+# From this many images on, directories are listed once instead of
+# stat'ing every candidate file.
+_LISTING_MIN = 64
+
+
+def annotation_file(image_path, save_dir=None, listing=None):
+    """
+    (path, mtime_ns) of the annotation file of image_path, or (None, 0).
+    listing(directory) returns {name: os.DirEntry}; without it the
+    candidates are stat'ed one by one.
+    """
+    directory = save_dir or os.path.dirname(image_path)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    entries = listing(directory) if listing is not None else None
+    for ext in ANNOTATION_EXTS:
+        try:
+            if entries is None:
+                path = os.path.join(directory, stem + ext)
+                return path, os.stat(path).st_mtime_ns
+            entry = entries.get(stem + ext)
+            if entry is not None:
+                return entry.path, entry.stat().st_mtime_ns
+        except OSError:
+            continue
+    return None, 0
+
+
+def sync_annotations(session, image_paths, save_dir=None, size_of=None):
+    """
+    Reads the annotation files of image_paths that changed since they were
+    last read, creating missing image rows; returns how many were read.
+
+    size_of(path) returns (width, height) or None; YOLO boxes need the
+    image size and are skipped until it is known.
+    """
+    listings = {}
+
+    def listing(directory):
+        entries = listings.get(directory)
+        if entries is None:
+            entries = listings[directory] = _listing(directory)
+        return entries
+
+    image_paths = list(image_paths)
+    if len(image_paths) < _LISTING_MIN:
+        listing = None
+    class_ids = dict(session.execute(select(Class.name, Class.id)).all())
+    read = 0
+    for start in range(0, len(image_paths), _CHUNK):
+        chunk = image_paths[start : start + _CHUNK]
+        rows = {
+            row.path: row
+            for row in session.execute(
+                select(
+                    Image.id,
+                    Image.path,
+                    Image.width,
+                    Image.height,
+                    Image.annotation_mtime_ns,
+                ).where(Image.path.in_(chunk))
+            )
+        }
+        for image_path in chunk:
+            path, mtime_ns = annotation_file(image_path, save_dir, listing)
+            row = rows.get(image_path)
+            if row is not None and row.annotation_mtime_ns == mtime_ns:
+                continue
+            size = (row.width, row.height) if row is not None else (None, None)
+            if path is not None and path.endswith(TXT_EXT) and None in size:
+                size = (size_of and size_of(image_path)) or size
+            shapes, verified = _read(path, image_path, size)
+            if shapes is None:
+                # YOLO without a known size: try again next time.
+                mtime_ns = None
+                shapes = []
+            values = {"annotation_mtime_ns": mtime_ns}
+            if verified is not None:
+                values["verified"] = verified
+            if None not in size:
+                values["width"], values["height"] = size
+            if row is None:
+                image_id = session.execute(
+                    insert(Image).values(path=image_path, **values)
+                ).inserted_primary_key[0]
+            else:
+                image_id = row.id
+                session.execute(
+                    delete(Annotation).where(Annotation.image_id == image_id)
+                )
+                session.execute(update(Image).where(Image.id == image_id).values(**values))
+            boxes = []
+            for label, points, _line_color, _fill_color, _difficult in shapes:
+                class_id = class_ids.get(label)
+                if class_id is None:
+                    class_id = class_ids[label] = session.execute(
+                        insert(Class).values(name=label)
+                    ).inserted_primary_key[0]
+                xs = [x for x, _ in points]
+                ys = [y for _, y in points]
+                boxes.append({
+                    "image_id": image_id,
+                    "class_id": class_id,
+                    "xmin": min(xs),
+                    "ymin": min(ys),
+                    "xmax": max(xs),
+                    "ymax": max(ys),
+                })
+            if boxes:
+                session.execute(insert(Annotation), boxes)
+            read += 1
+    session.commit()
+    # Rows changed behind the ORM's back.
+    session.expire_all()
+    if read:
+        logger.info("Read the annotations of %d images", read)
+    return read
+
+
+def set_verified(session, image_path, verified):
+    """
+    Stores the verified flag of image_path, which YOLO files cannot carry;
+    False when the image has no row yet.
+    """
+    result = session.execute(
+        update(Image).where(Image.path == image_path).values(verified=verified)
+    )
+    session.commit()
+    session.expire_all()
+    return result.rowcount > 0
+
+
+def _listing(directory):
+    try:
+        with os.scandir(directory) as found:
+            return {entry.name: entry for entry in found}
+    except OSError:
+        return {}
+
+
+def _read(path, image_path, size):
+    """
+    (shapes, verified) from an annotation file; verified is None when the
+    format has no such flag, and shapes None when it cannot be read yet.
+    """
+    if path is None:
+        return [], False
+    try:
+        if path.endswith(XML_EXT):
+            reader = PascalVocReader(path)
+            return reader.get_shapes(), reader.verified
+        if path.endswith(TXT_EXT):
+            if None in size:
+                return None, None
+            class_list_path = os.path.join(os.path.dirname(path), "classes.txt")
+            reader = YoloReader(
+                path, None, class_list_path, img_size=(size[1], size[0], 3)
+            )
+            return reader.get_shapes(), None
+        reader = CreateMLReader(path, image_path)
+        return reader.get_shapes(), reader.verified
+    except (OSError, ValueError, IndexError, KeyError) as e:
+        logger.warning("Cannot read annotations %s: %s", path, e)
+        return [], None
@@ -0,0 +1,177 @@
+"""
+Images read in place from a .zip or uncompressed .tar dataset archive.
+
+The member index (name, offset, sizes, compression) is built once and
+saved as members.json in the sidecar directory; it is rebuilt when the
+archive's size or mtime changes. Listing a tar otherwise means reading
+the whole archive, and a zip's central directory for a million members
+takes seconds to parse.
+
+The archive is memory-mapped. A stored (uncompressed) member is a slice
+of the mapping; a deflated one is inflated from its slice. Compressed
+tars (.tar.gz, ...) have no random access and are refused.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from libs.atomic_io import atomic_write
+from libs.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "members.json"
+INDEX_VERSION = 1
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4s22xHH")
+_ZIP_LOCAL_SIGNATURE = b"PK\x03\x04"
+_ZIP_STORED, _ZIP_DEFLATED = 0, 8
+
+
+class ArchiveStorage(Storage):
+
+    def __init__(self, archive_path, index_dir):
+        self.archive_path = archive_path
+        self.index_dir = index_dir
+        self.kind = "zip" if archive_path.lower().endswith(".zip") else "tar"
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        stat = os.stat(archive_path)
+        self._mtime_ns = stat.st_mtime_ns
+        self.members = self._load_index(stat)
+        if self.members is None:
+            self.members = self._build_index()
+            self._save_index(stat)
+
+    # Paths
+
+    def path(self, member):
+        return os.path.join(self.archive_path, *member.split("/"))
+
+    def member(self, path):
+        relative = path[len(self.archive_path) + 1 :]
+        return relative.replace(os.sep, "/")
+
+    # Storage interface
+
+    def scan_images(self, root, extensions):
+        return [
+            self.path(name)
+            for name in self.members
+            if name.lower().endswith(extensions)
+        ]
+
+    def exists(self, path):
+        return self.member(path) in self.members
+
+    def read_bytes(self, path):
+        offset, size, compressed_size, method = self.members[self.member(path)]
+        mapping = self._mapping()
+        if self.kind == "tar":
+            return mapping[offset : offset + size]
+        signature, name_length, extra_length = _ZIP_LOCAL_HEADER.unpack_from(
+            mapping, offset
+        )
+        if signature != _ZIP_LOCAL_SIGNATURE:
+            raise ValueError("bad zip member header in %s" % self.archive_path)
+        start = offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length
+        data = mapping[start : start + compressed_size]
+        if method == _ZIP_STORED:
+            return data
+        if method == _ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS, size)
+        # bzip2, lzma: rare for images, left to zipfile.
+        import zipfile
+
+        with zipfile.ZipFile(self.archive_path) as archive:
+            return archive.read(self.member(path))
+
+    def stat(self, path):
+        # Members only change with the archive.
+        return self.members[self.member(path)][1], self._mtime_ns
+
+    def project_dir(self, root):
+        return self.index_dir
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+                self._map = self._file = None
+
+    # Internals
+
+    def _mapping(self):
+        with self._lock:
+            if self._map is None:
+                self._file = open(self.archive_path, "rb")
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def _build_index(self):
+        """{name: (offset, size, compressed size, method)} in archive order."""
+        members = {}
+        if self.kind == "zip":
+            import zipfile
+
+            with zipfile.ZipFile(self.archive_path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        members[info.filename] = (
+                            info.header_offset,
+                            info.file_size,
+                            info.compress_size,
+                            info.compress_type,
+                        )
+        else:
+            import tarfile
+
+            try:
+                archive = tarfile.open(self.archive_path, "r:")
+            except tarfile.ReadError:
+                raise ValueError(
+                    "%s is not an uncompressed tar archive" % self.archive_path
+                )
+            with archive:
+                for info in archive:
+                    if info.isfile():
+                        members[info.name] = (info.offset_data, info.size, info.size, 0)
+        logger.info("Indexed %d members of %s", len(members), self.archive_path)
+        return members
+
+    def _load_index(self, stat):
+        try:
+            with open(os.path.join(self.index_dir, INDEX_FILE), "rb") as f:
+                index = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if (
+            index.get("version") != INDEX_VERSION
+            or index.get("size") != stat.st_size
+            or index.get("mtime_ns") != stat.st_mtime_ns
+        ):
+            return None
+        return {entry[0]: tuple(entry[1:]) for entry in index["members"]}
+
+    def _save_index(self, stat):
+        index = {
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "members": [[name] + list(entry) for name, entry in self.members.items()],
+        }
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            atomic_write(
+                os.path.join(self.index_dir, INDEX_FILE),
+                json.dumps(index, separators=(",", ":")),
+                "utf-8",
+            )
+        except OSError as e:
+            logger.warning("Could not save the member index of %s: %s", self.archive_path, e)
@@ -0,0 +1,183 @@
+"""
+Crash-safe file replacement for annotation writers.
+
+Data is written to a temporary file in the target's directory, flushed to
+disk and moved over the target with os.replace(), so a reader (or the next
+start after a crash or a full disk) sees either the old file or the new
+one, never a truncated mix.
+
+Bulk exports can wrap their writes in batched_fsync(): files are then
+replaced without waiting on the disk one by one, and everything is synced
+in one pass when the block ends.
+"""
+import contextlib
+import os
+import tempfile
+import threading
+
+_batch = threading.local()
+# The process umask, read on first use by _umask().
+_umask_value = None
+_umask_lock = threading.Lock()
+
+
+def atomic_write(path, data, encoding=None):
+    """Replace path with data (str, written with encoding, or bytes)."""
+    if isinstance(data, str):
+        data = data.encode(encoding or "utf-8")
+    with atomic_open(path, "wb") as f:
+        f.write(data)
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode="w", encoding=None):
+    """
+    File object on a temporary file that replaces path when the block
+    exits normally. On an exception the temporary file is removed and path
+    is left as it was.
+    """
+    if "w" not in mode:
+        raise ValueError("atomic_open only supports writing, got mode %r" % mode)
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            pending = getattr(_batch, "paths", None)
+            if pending is None:
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    if pending is None:
+        _fsync_directory(directory)
+    else:
+        pending.add(path)
+
+
+@contextlib.contextmanager
+def batched_fsync():
+    """
+    Defer the fsync of every atomic write in the block (on this thread) to
+    its end. A crash inside the block can lose the newest files but still
+    never leaves a partially written one behind.
+    """
+    if getattr(_batch, "paths", None) is not None:
+        yield  # nested: the outermost block syncs
+        return
+    _batch.paths = set()
+    try:
+        yield
+    finally:
+        paths, _batch.paths = _batch.paths, None
+        sync_files(paths)
+
+
+def stage_write(path, data, encoding=None):
+    """
+    Write data to a temporary file next to path, with path's permissions,
+    without replacing it; returns the temporary path for replace_staged()
+    or discard_staged(). Lets a group of files be replaced only once all of
+    them were written.
+    """
+    if isinstance(data, str):
+        data = data.encode(encoding or "utf-8")
+    path = os.path.abspath(path)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix="." + os.path.basename(path) + ".",
+        suffix=".tmp",
+        dir=os.path.dirname(path),
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            pending = getattr(_batch, "paths", None)
+            if pending is None:
+                os.fsync(f.fileno())
+            else:
+                pending.add(tmp_path)
+        os.chmod(tmp_path, _file_mode(path))
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def replace_staged(staged):
+    """Move the {path: temporary path} of stage_write() over their paths."""
+    for path, tmp_path in staged.items():
+        os.replace(tmp_path, path)
+    for directory in {os.path.dirname(os.path.abspath(path)) for path in staged}:
+        _fsync_directory(directory)
+
+
+def discard_staged(tmp_paths):
+    for tmp_path in tmp_paths:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+
+
+def sync_files(paths):
+    """fsync the given files, then each of their directories once."""
+    directories = set()
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        directories.add(os.path.dirname(path))
+    for directory in directories:
+        _fsync_directory(directory)
+
+
+def _file_mode(path):
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        # Permissions a plain open() would give a new file.
+        return 0o666 & ~_umask()
+
+
+def _umask():
+    global _umask_value
+    with _umask_lock:
+        if _umask_value is None:
+            _umask_value = _read_umask()
+        return _umask_value
+
+
+def _read_umask():
+    # Linux reports it without changing it; elsewhere it can only be read
+    # by setting it, which briefly affects files created by other threads.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0o077)
+    os.umask(umask)
+    return umask
+
+
+def _fsync_directory(directory):
+    # Makes the rename itself durable; directories cannot be opened on Windows.
+    if os.name != "posix":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
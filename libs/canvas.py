@@ -3,6 +3,7 @@ from PyQt6.QtCore import Qt, pyqtSignal, QPointF, QPoint, QRectF, QLineF
 from PyQt6.QtWidgets import QWidget, QMenu, QApplication
 
 
+from libs import perf
 from libs.shape import Shape
 from libs.utils import distance
 from libs.undo_manager import CreateShapeCommand, DeleteShapeCommand, MoveShapeCommand
@@ -126,6 +127,7 @@ class Canvas(QWidget):
     def selected_vertex(self):
         return self.h_vertex is not None
 
+    @perf.timed("mouse_move_event")
     def mouseMoveEvent(self, ev):
         """Update line with last point and current coordinates."""
         pos = self.transform_pos(ev.position())
@@ -578,6 +580,7 @@ class Canvas(QWidget):
         if not self.bounded_move_shape(shape, point - offset):
             self.bounded_move_shape(shape, point + offset)
 
+    @perf.timed("paint_event")
     def paintEvent(self, event):
         if not self.pixmap:
             return super().paintEvent(event)
@@ -806,6 +809,7 @@ class Canvas(QWidget):
 
     def load_shapes(self, shapes):
         self.shapes = list(shapes)
+        self.visible = {}
         self.selected_shape = None
         self.current = None
         self.repaint()
@@ -814,6 +818,11 @@ class Canvas(QWidget):
         self.visible[shape] = value
         self.repaint()
 
+    def set_shapes_visible(self, visibility):
+        """Apply a {shape: visible} mapping with a single repaint."""
+        self.visible.update(visibility)
+        self.update()
+
     def current_cursor(self):
         cursor = QApplication.overrideCursor()
         if cursor is not None:
@@ -0,0 +1,62 @@
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QFormLayout,
+    QLabel,
+    QVBoxLayout,
+)
+
+RENAME = "Rename or merge into"
+DELETE = "Delete its boxes"
+
+
+class ClassChangeDialog(QDialog):
+    """Picks a class and what happens to it across the whole dataset."""
+
+    def __init__(self, parent, class_names):
+        super().__init__(parent)
+        self.setWindowTitle("Rename, Merge or Delete Class")
+
+        self.source = QComboBox()
+        self.source.addItems(list(class_names))
+        self.action = QComboBox()
+        self.action.addItems([RENAME, DELETE])
+        # Typing a new name renames; picking an existing class merges.
+        self.target = QComboBox()
+        self.target.setEditable(True)
+        self.target.addItems(list(class_names))
+        self.target.setCurrentText("")
+        self.action.currentTextChanged.connect(
+            lambda text: self.target.setEnabled(text == RENAME)
+        )
+
+        form = QFormLayout()
+        form.addRow("Class", self.source)
+        form.addRow("Action", self.action)
+        form.addRow("New name", self.target)
+
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(
+            QLabel("Changes every annotation file of the open directory.")
+        )
+        layout.addLayout(form)
+        layout.addWidget(buttons)
+
+    def mapping(self):
+        """{old name: new name or None}, or {} when nothing would change."""
+        source = self.source.currentText()
+        if not source:
+            return {}
+        if self.action.currentText() == DELETE:
+            return {source: None}
+        target = self.target.currentText().strip()
+        if not target or target == source:
+            return {}
+        return {source: target}
@@ -0,0 +1,329 @@
+"""
+Dataset-wide class rename, merge and delete.
+
+    plan = plan_class_change(session, images, {"pedestrian": "person"},
+                             save_dir=save_dir)
+    print("\\n".join(plan.report()))      # dry run
+    apply_class_change(session, plan)
+
+A mapping takes class names to their new name, or to None to delete their
+boxes. Renaming onto an existing class merges the two.
+
+Planning first brings the database up to date with the annotation files
+(libs.annotation_sync), which then tells which images have boxes of the
+changed classes, so only their annotation files are rewritten; the files
+are edited in place (everything but the changed labels is kept) by a
+process pool. YOLO files are only touched when class indices move: a
+rename is a classes.txt change, while merging or deleting shifts the
+indices after the removed class, so those directories are rewritten
+whole. Each classes.txt is written once.
+
+Every new file is written next to its original first, and they replace
+the originals only once all of them were written, so a failure leaves
+the dataset as it was. The database is updated in a single transaction
+after the files. A class with boxes in the database but in none of the
+planned files is left alone there, rather than renamed away from files
+that still use it.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import delete, select, update
+
+from libs.annotation_sync import sync_annotations
+from libs.atomic_io import batched_fsync, discard_staged, replace_staged, stage_write
+from libs.constants import DEFAULT_ENCODING
+from libs.create_ml_io import JSON_EXT
+from libs.database import Annotation, Class, Image
+from libs.pascal_voc_io import XML_EXT
+from libs.yolo_io import TXT_EXT
+
+CLASSES_FILE = "classes.txt"
+# Below this many files the rewrite runs in the calling process.
+MIN_PARALLEL_FILES = 64
+
+
+class ClassChangePlan(object):
+    """What apply_class_change() will do; report() is the dry run."""
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+        self.images = 0
+        self.boxes = {}
+        # path -> task argument of _rewrite_file
+        self.files = {}
+        # classes.txt path -> (old lines, new lines)
+        self.class_lists = {}
+        # changed classes found in the planned files or class lists
+        self.located = set()
+
+    def unlocated(self):
+        """Changed classes with boxes in the database but in no planned file."""
+        return sorted(
+            name for name in self.mapping
+            if self.boxes.get(name) and name not in self.located
+        )
+
+    def report(self):
+        lines = []
+        for old, new in sorted(self.mapping.items()):
+            action = "delete" if new is None else "-> %s" % new
+            lines.append(
+                "%s %s: %d boxes" % (old, action, self.boxes.get(old, 0))
+            )
+        lines.append("%d images in the database have these boxes" % self.images)
+        by_format = {}
+        for path in self.files:
+            ext = os.path.splitext(path)[1]
+            by_format[ext] = by_format.get(ext, 0) + 1
+        for ext, count in sorted(by_format.items()):
+            lines.append("%d %s files to rewrite" % (count, ext))
+        for path in sorted(self.class_lists):
+            lines.append("%s to update" % path)
+        for name in self.unlocated():
+            lines.append(
+                "%s: no annotation file has these boxes; the database keeps them"
+                % name
+            )
+        return lines
+
+
+def plan_class_change(session, image_paths, mapping, save_dir=None, size_of=None):
+    """
+    Plans mapping for the images of image_paths (the open directory);
+    annotations are looked up in save_dir, or next to each image. The
+    database is synced with their annotation files first; size_of is
+    passed on to sync_annotations().
+    """
+    mapping = dict(mapping)
+    for old in mapping:
+        if mapping[old] == old:
+            raise ValueError("%s is mapped onto itself" % old)
+    plan = ClassChangePlan(mapping)
+    image_paths = set(image_paths)
+    sync_annotations(session, image_paths, save_dir, size_of=size_of)
+
+    affected = session.execute(
+        select(Image.path, Class.name)
+        .join(Annotation, Annotation.image_id == Image.id)
+        .join(Class, Class.id == Annotation.class_id)
+        .where(Class.name.in_(list(mapping)))
+    ).all()
+    paths = {}
+    for path, name in affected:
+        plan.boxes[name] = plan.boxes.get(name, 0) + 1
+        paths.setdefault(path, set()).add(name)
+    plan.images = len(paths)
+
+    for path in sorted(paths.keys() & image_paths):
+        directory = save_dir or os.path.dirname(path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for ext in (XML_EXT, JSON_EXT):
+            annotation_path = os.path.join(directory, stem + ext)
+            if os.path.isfile(annotation_path):
+                plan.files[annotation_path] = mapping
+                plan.located.update(paths[path])
+
+    # classes.txt decides for YOLO, whatever the database holds.
+    directories = {save_dir} if save_dir else {os.path.dirname(p) for p in image_paths}
+    for directory in sorted(directories):
+        _plan_yolo_directory(plan, directory)
+    return plan
+
+
+def _plan_yolo_directory(plan, directory):
+    classes_path = os.path.join(directory, CLASSES_FILE)
+    try:
+        with open(classes_path, encoding=DEFAULT_ENCODING) as f:
+            old_classes = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return
+    plan.located.update(name for name in old_classes if name in plan.mapping)
+    new_classes = []
+    for name in old_classes:
+        name = plan.mapping.get(name, name)
+        if name is not None and name not in new_classes:
+            new_classes.append(name)
+    index_map = {}
+    for old_index, name in enumerate(old_classes):
+        name = plan.mapping.get(name, name)
+        index_map[old_index] = None if name is None else new_classes.index(name)
+    if new_classes != old_classes:
+        plan.class_lists[classes_path] = (old_classes, new_classes)
+    if all(old == new for old, new in index_map.items()):
+        return  # a pure rename: classes.txt is all there is to change
+    # Indices of removed classes go, and the ones after them move; every
+    # file may refer to them.
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(TXT_EXT) and entry.name != CLASSES_FILE:
+                plan.files[entry.path] = index_map
+
+
+def apply_class_change(session, plan, max_workers=None):
+    """
+    Rewrites the planned files, then updates the database in one
+    transaction. Returns [(path, error message)] of files that failed;
+    unless all of them succeeded, neither the files nor the database are
+    changed.
+    """
+    tasks = list(plan.files.items())
+    staged = {}
+    try:
+        with batched_fsync():
+            for classes_path, (_, new_classes) in plan.class_lists.items():
+                staged[classes_path] = stage_write(
+                    classes_path,
+                    "".join(name + "\n" for name in new_classes),
+                    DEFAULT_ENCODING,
+                )
+            if len(tasks) < MIN_PARALLEL_FILES:
+                results = [_rewrite_file(task) for task in tasks]
+            else:
+                workers = max_workers or os.cpu_count() or 1
+                chunk = max(1, len(tasks) // (workers * 4))
+                # spawn: forking a process that runs Qt threads is not safe.
+                with ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                ) as pool:
+                    results = list(pool.map(_rewrite_file, tasks, chunksize=chunk))
+        errors = []
+        for path, tmp_path, error in results:
+            if error:
+                errors.append((path, error))
+            elif tmp_path:
+                staged[path] = tmp_path
+        if errors:
+            discard_staged(staged.values())
+            return errors
+        replace_staged(staged)
+    except BaseException:
+        discard_staged(staged.values())
+        raise
+    unlocated = plan.unlocated()
+    _update_database(
+        session,
+        {old: new for old, new in plan.mapping.items() if old not in unlocated},
+    )
+    return []
+
+
+def _update_database(session, mapping):
+    """Class rows and their annotations; the triggers keep the counts."""
+    try:
+        for old, new in mapping.items():
+            source = session.execute(
+                select(Class.id).where(Class.name == old)
+            ).scalar()
+            if source is None:
+                continue
+            target = None
+            if new is not None:
+                target = session.execute(
+                    select(Class.id).where(Class.name == new)
+                ).scalar()
+                if target is None:
+                    session.execute(
+                        update(Class).where(Class.id == source).values(name=new)
+                    )
+                    continue
+            annotations = Annotation.__table__
+            if target is None:
+                session.execute(
+                    delete(annotations).where(annotations.c.class_id == source)
+                )
+            else:
+                session.execute(
+                    update(annotations)
+                    .where(annotations.c.class_id == source)
+                    .values(class_id=target)
+                )
+            session.execute(delete(Class.__table__).where(Class.id == source))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    session.expire_all()
+
+
+def _rewrite_file(task):
+    """
+    Process pool entry point: (path, mapping) -> (path, staged temporary
+    path or None when unchanged, error or None).
+    """
+    path, mapping = task
+    try:
+        if path.endswith(XML_EXT):
+            data = _rewrite_pascal_voc(path, mapping)
+        elif path.endswith(JSON_EXT):
+            data = _rewrite_create_ml(path, mapping)
+        else:
+            data = _rewrite_yolo(path, mapping)
+        if data is None:
+            return path, None, None
+        return path, stage_write(path, data, DEFAULT_ENCODING), None
+    except Exception as e:
+        return path, None, "%s: %s" % (type(e).__name__, e)
+
+
+# The _rewrite_* functions return the new content, or None when unchanged.
+
+
+def _rewrite_pascal_voc(path, mapping):
+    from lxml import etree
+
+    parser = etree.XMLParser(remove_blank_text=True, encoding=DEFAULT_ENCODING)
+    root = etree.parse(path, parser).getroot()
+    changed = False
+    for obj in root.findall("object"):
+        name = obj.find("name")
+        if name is None or name.text not in mapping:
+            continue
+        new = mapping[name.text]
+        if new is None:
+            root.remove(obj)
+        else:
+            name.text = new
+        changed = True
+    if changed:
+        # Same layout as PascalVocWriter.prettify
+        return etree.tostring(
+            root, pretty_print=True, encoding=DEFAULT_ENCODING
+        ).replace(b"  ", b"\t")
+    return None
+
+
+def _rewrite_yolo(path, index_map):
+    with open(path, encoding=DEFAULT_ENCODING) as f:
+        lines = f.read().splitlines()
+    output = []
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        new = index_map.get(int(fields[0]), int(fields[0]))
+        if new is not None:
+            output.append(" ".join([str(new)] + fields[1:]) + "\n")
+    return "".join(output)
+
+
+def _rewrite_create_ml(path, mapping):
+    with open(path, encoding=DEFAULT_ENCODING) as f:
+        entries = json.load(f)
+    changed = False
+    for entry in entries:
+        annotations = []
+        for annotation in entry.get("annotations", []):
+            label = annotation.get("label")
+            if label in mapping:
+                changed = True
+                if mapping[label] is None:
+                    continue
+                annotation["label"] = mapping[label]
+            annotations.append(annotation)
+        entry["annotations"] = annotations
+    if changed:
+        return json.dumps(entries)
+    return None
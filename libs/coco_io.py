@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+COCO detection files (instances.json), read and written a record at a time.
+
+    export_coco(session, "instances.json", root=dir_path)
+    index = CocoIndex("instances.json", index_dir)
+    shapes = index.shapes(image_path)
+
+export_coco() streams the categories, images and annotations of the
+project database into the file, so the document never exists in memory.
+
+CocoIndex scans a COCO file once, decoding one array element at a time,
+and keeps only the categories, the images and the byte range of every
+annotation grouped by image. The index is saved as coco_index.json in
+index_dir and rebuilt when the file's size or mtime changes. shapes()
+then reads just the annotations of one image from the file.
+"""
+import codecs
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import select
+
+from libs.atomic_io import atomic_open, atomic_write
+from libs.constants import DEFAULT_ENCODING
+from libs.database import Annotation, Class, Image
+
+ENCODE_METHOD = DEFAULT_ENCODING
+INDEX_FILE = "coco_index.json"
+# Project setting holding the path of the imported COCO file
+COCO_SETTING = "coco.annotations"
+INDEX_VERSION = 1
+
+# Bytes read at a time while indexing, and rows fetched at a time while
+# exporting.
+CHUNK_SIZE = 1 << 20
+BATCH_SIZE = 1000
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_ELEMENT_END = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+_UTF8_BOM = codecs.BOM_UTF8
+
+logger = logging.getLogger(__name__)
+
+
+def export_coco(session, output_path, root=None, size_of=None):
+    """
+    Writes the project to output_path; returns (images, annotations).
+
+    file_name is the image path relative to root, or its base name.
+    Images without a known size get it from size_of(path), which returns
+    (width, height) or None.
+    """
+    connection = session.connection()
+    images = annotations = 0
+    with atomic_open(output_path, "w", encoding=ENCODE_METHOD) as f:
+        f.write('{"info": {"description": "Exported by labelImg"},\n"categories": [')
+        rows = connection.execute(select(Class.id, Class.name).order_by(Class.id))
+        for i, (class_id, name) in enumerate(rows):
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps({"id": class_id, "name": name, "supercategory": ""}))
+
+        f.write('\n],\n"images": [')
+        rows = connection.execute(
+            select(Image.id, Image.path, Image.width, Image.height)
+            .order_by(Image.id)
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+        for image_id, path, width, height in rows:
+            if (width is None or height is None) and size_of is not None:
+                width, height = size_of(path) or (width, height)
+            f.write(",\n" if images else "\n")
+            f.write(json.dumps({
+                "id": image_id,
+                "file_name": _file_name(path, root),
+                "width": width,
+                "height": height,
+            }))
+            images += 1
+
+        f.write('\n],\n"annotations": [')
+        rows = connection.execute(
+            select(
+                Annotation.id,
+                Annotation.image_id,
+                Annotation.class_id,
+                Annotation.xmin,
+                Annotation.ymin,
+                Annotation.xmax,
+                Annotation.ymax,
+            )
+            # Rows written by older versions may carry only a class.
+            .where(Annotation.xmin.is_not(None))
+            .order_by(Annotation.image_id, Annotation.id)
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+        for annotation_id, image_id, class_id, x1, y1, x2, y2 in rows:
+            width, height = x2 - x1, y2 - y1
+            f.write(",\n" if annotations else "\n")
+            f.write(json.dumps({
+                "id": annotation_id,
+                "image_id": image_id,
+                "category_id": class_id,
+                "bbox": [x1, y1, width, height],
+                "area": width * height,
+                "iscrowd": 0,
+                "segmentation": [],
+            }))
+            annotations += 1
+        f.write("\n]}\n")
+    logger.info("Exported %d images and %d annotations to %s",
+                images, annotations, output_path)
+    return images, annotations
+
+
+def _file_name(path, root):
+    if root is None:
+        return os.path.basename(path)
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+class CocoIndex(object):
+
+    def __init__(self, json_path, index_dir=None):
+        self.json_path = os.path.abspath(json_path)
+        self.index_dir = index_dir or os.path.dirname(self.json_path)
+        # {category id: name}, {image id: (file_name, width, height)},
+        # {image id: [offset, length, offset, length, ...]}
+        self.categories = {}
+        self.images = {}
+        self.annotations = {}
+        stat = os.stat(self.json_path)
+        if not self._load_index(stat):
+            self._build_index()
+            self._save_index(stat)
+        self._by_name = {
+            image[0].replace("\\", "/"): image_id
+            for image_id, image in self.images.items()
+        }
+
+    def __len__(self):
+        return len(self.images)
+
+    def image_id(self, image_path):
+        """Id of the image whose file_name ends image_path, or None."""
+        parts = image_path.replace(os.sep, "/").split("/")
+        for start in range(len(parts)):
+            image_id = self._by_name.get("/".join(parts[start:]))
+            if image_id is not None:
+                return image_id
+        return None
+
+    def read_annotations(self, image_id):
+        """The annotation records of image_id, read from the file."""
+        ranges = self.annotations.get(image_id)
+        if not ranges:
+            return []
+        records = []
+        with open(self.json_path, "rb") as f:
+            for i in range(0, len(ranges), 2):
+                f.seek(ranges[i])
+                records.append(json.loads(f.read(ranges[i + 1])))
+        return records
+
+    def shapes(self, image_path):
+        """Shapes of image_path, as load_labels() takes them."""
+        image_id = self.image_id(image_path)
+        if image_id is None:
+            return []
+        shapes = []
+        for record in self.read_annotations(image_id):
+            bbox = record.get("bbox")
+            if not bbox or len(bbox) != 4:
+                continue
+            x, y, width, height = bbox
+            label = self.categories.get(record.get("category_id"))
+            if label is None:
+                label = str(record.get("category_id"))
+            points = [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+            shapes.append((label, points, None, None, False))
+        return shapes
+
+    # Internals
+
+    def _build_index(self):
+        with open(self.json_path, "rb") as f:
+            scanner = _Scanner(f)
+            for key, value, offset, length in scanner.top_level():
+                if key == "annotations":
+                    self.annotations.setdefault(value["image_id"], []).extend(
+                        (offset, length)
+                    )
+                elif key == "images":
+                    self.images[value["id"]] = (
+                        value["file_name"],
+                        value.get("width"),
+                        value.get("height"),
+                    )
+                elif key == "categories":
+                    self.categories[value["id"]] = value["name"]
+        logger.info(
+            "Indexed %d images and %d categories of %s",
+            len(self.images), len(self.categories), self.json_path,
+        )
+
+    def _load_index(self, stat):
+        try:
+            with open(os.path.join(self.index_dir, INDEX_FILE), "rb") as f:
+                index = json.loads(f.read())
+        except (OSError, ValueError):
+            return False
+        if (
+            index.get("version") != INDEX_VERSION
+            or index.get("path") != self.json_path
+            or index.get("size") != stat.st_size
+            or index.get("mtime_ns") != stat.st_mtime_ns
+        ):
+            return False
+        self.categories = {entry[0]: entry[1] for entry in index["categories"]}
+        self.images = {entry[0]: tuple(entry[1:]) for entry in index["images"]}
+        self.annotations = {entry[0]: entry[1:] for entry in index["annotations"]}
+        return True
+
+    def _save_index(self, stat):
+        index = {
+            "version": INDEX_VERSION,
+            "path": self.json_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "categories": [list(entry) for entry in self.categories.items()],
+            "images": [[image_id] + list(image) for image_id, image in self.images.items()],
+            "annotations": [
+                [image_id] + ranges for image_id, ranges in self.annotations.items()
+            ],
+        }
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            atomic_write(
+                os.path.join(self.index_dir, INDEX_FILE),
+                json.dumps(index, separators=(",", ":")),
+                "utf-8",
+            )
+        except OSError as e:
+            logger.warning("Could not save the index of %s: %s", self.json_path, e)
+
+
+class _Scanner(object):
+    """
+    Reads a JSON object from a binary file a chunk at a time, keeping the
+    byte offset of the text it has consumed.
+    """
+
+    def __init__(self, f, chunk_size=None):
+        self.f = f
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buffer = ""
+        self.ascii = True  # whether buffer is, so that characters are bytes
+        self.pos = 0
+        self.offset = 0  # byte offset of buffer[pos]
+        self.eof = False
+        if f.read(len(_UTF8_BOM)) == _UTF8_BOM:
+            self.offset = len(_UTF8_BOM)
+        else:
+            f.seek(0)
+
+    def top_level(self):
+        """
+        Yields (key, element, byte offset, byte length) for every element of
+        the arrays of the top-level object; other values are skipped.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()[0]
+            self._expect(":")
+            if self._peek() == "[":
+                self._advance(self.pos + 1)
+                if self._peek() == "]":
+                    self._advance(self.pos + 1)
+                else:
+                    for value, offset, length in self._elements():
+                        yield key, value, offset, length
+            else:
+                self._value()
+            if self._next_of(",}") == "}":
+                return
+
+    def _elements(self):
+        """
+        Yields (element, byte offset, byte length) up to the end of the
+        array. Elements that are whole in the buffer take a fast path.
+        """
+        decode = self.json.raw_decode
+        element_end = _ELEMENT_END.match
+        while True:
+            try:
+                value, end = decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                end = None
+            if end is None or end == len(self.buffer):
+                value, offset, length = self._value()
+            else:
+                offset = self.offset
+                self._advance(end)
+                length = self.offset - offset
+            yield value, offset, length
+            found = element_end(self.buffer, self.pos)
+            if found is None:
+                separator = self._next_of(",]")
+            else:
+                separator = found.group(1)
+                self._advance(found.end())
+            if separator == "]":
+                return
+
+    def _fill(self, size):
+        """Reads at least size more bytes; False at the end of the file."""
+        if self.eof:
+            return False
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        data = self.f.read(max(size, self.chunk_size))
+        if not data:
+            self.eof = True
+            self.buffer += self.decoder.decode(b"", final=True)
+            self.ascii = self.buffer.isascii()
+            return False
+        self.buffer += self.decoder.decode(data)
+        self.ascii = self.buffer.isascii()
+        return True
+
+    def _advance(self, end):
+        if self.ascii:
+            self.offset += end - self.pos
+        else:
+            self.offset += len(self.buffer[self.pos:end].encode("utf-8"))
+        self.pos = end
+
+    def _peek(self):
+        """Next character after whitespace, or "" at the end of the file."""
+        while True:
+            self._advance(_WHITESPACE.match(self.buffer, self.pos).end())
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError("expected %r at byte %d, found %r" % (char, self.offset, found))
+        self._advance(self.pos + 1)
+
+    def _next_of(self, chars):
+        found = self._peek()
+        if not found or found not in chars:
+            raise ValueError("expected one of %r at byte %d, found %r"
+                             % (chars, self.offset, found))
+        self._advance(self.pos + 1)
+        return found
+
+    def _value(self):
+        """(value, byte offset, byte length) of the next value."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Cut off by the end of the buffer, or invalid. Doubling
+                # the buffer keeps decoding a large value linear.
+                if self._fill(len(self.buffer)):
+                    continue
+                raise ValueError("invalid JSON at byte %d" % self.offset)
+            # A number may continue in the next chunk.
+            if end == len(self.buffer) and self._fill(self.chunk_size):
+                continue
+            offset = self.offset
+            self._advance(end)
+            return value, offset, self.offset - offset
@@ -19,3 +19,4 @@ SETTING_DRAW_SQUARE = "draw/square"
 SETTING_LABEL_FILE_FORMAT = "labelFileFormat"
 DEFAULT_ENCODING = "utf-8"
 SETTING_AUTO_SCROLL = "autoscroll"
+SETTING_UNDO_LOG = "undo/log"
@@ -1,14 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
 import json
-from pathlib import Path
+import logging
 
+from libs.atomic_io import atomic_write
 from libs.constants import DEFAULT_ENCODING
 import os
 
 JSON_EXT = '.json'
 ENCODE_METHOD = DEFAULT_ENCODING
 
+logger = logging.getLogger(__name__)
+
 
 class CreateMLWriter:
     def __init__(self, folder_name, filename, img_size, shapes, output_file, database_src='Unknown', local_img_path=None):
@@ -68,7 +71,7 @@ class CreateMLWriter:
         if not exists:
             output_dict.append(output_image_dict)
 
-        Path(self.output_file).write_text(json.dumps(output_dict), ENCODE_METHOD)
+        atomic_write(self.output_file, json.dumps(output_dict), ENCODE_METHOD)
 
     def calculate_coordinates(self, x1, x2, y1, y2):
         if x1 < x2:
@@ -102,7 +105,7 @@ class CreateMLReader:
         try:
             self.parse_json()
         except ValueError:
-            print("JSON decoding failed")
+            logger.warning("JSON decoding failed: %s", self.json_path)
 
     def parse_json(self):
         with open(self.json_path, "r") as file:
@@ -1,22 +1,54 @@
 import os
 import logging
+import sqlite3
 from sqlalchemy import (
     create_engine,
+    event,
+    text,
+    Boolean,
     Column,
     Integer,
     String,
     DateTime,
+    Float,
     ForeignKey,
+    Index,
     Text,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import func
-from alembic.config import Config
-from alembic import command
+
+# Revision of the newest migration in alembic/versions. Databases stamped
+# with it skip Alembic entirely; tests check it against the scripts.
+SCHEMA_HEAD = "d4e6f8a1b3c5"
+
+logger = logging.getLogger(__name__)
 
 # Global set to track which databases have been migrated in this session
 _MIGRATED_DATABASES = set()
 
+# Engine tuning. Each value can be overridden per project by a row in the
+# settings table keyed "sqlite.<name>", read when the database is opened.
+ENGINE_SETTING_PREFIX = "sqlite."
+ENGINE_DEFAULTS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative means KiB instead of pages
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # milliseconds a writer waits for a lock
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+}
+_PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+_PRAGMA_CHOICES = {
+    "journal_mode": ("WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
 # Silence alembic loggers decisively
 for logger_name in ["alembic", "alembic.runtime.migration", "sqlalchemy.engine"]:
     logging.getLogger(logger_name).setLevel(logging.ERROR)
@@ -30,6 +62,7 @@ class Class(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)
+    color = Column(String)  # "#rrggbb", fixed once so the palette is stable
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     annotations = relationship("Annotation", back_populates="label_class")
@@ -48,6 +81,15 @@ class Image(Base):
     width = Column(Integer)
     height = Column(Integer)
     depth = Column(Integer)
+    verified = Column(Boolean, nullable=False, default=False, server_default="0")
+    # dHash of the file (signed 64-bit, see libs.image_hash) and the size
+    # and mtime it was computed at; a changed file gets hashed again.
+    content_hash = Column(Integer)
+    file_size = Column(Integer)
+    file_mtime_ns = Column(Integer)
+    # mtime of the annotation file the boxes were read from, 0 when there
+    # was none; NULL until read. See libs.annotation_sync.
+    annotation_mtime_ns = Column(Integer)
 
     annotations = relationship(
         "Annotation", back_populates="image", cascade="all, delete-orphan"
@@ -72,10 +114,153 @@ class Annotation(Base):
     image = relationship("Image", back_populates="annotations")
     label_class = relationship("Class", back_populates="annotations")
 
+    # Both indexes cover the statistics queries, which then never have to
+    # read the table rows themselves.
+    __table_args__ = (
+        Index("ix_annotations_class_id_image_id", "class_id", "image_id"),
+        Index("ix_annotations_image_id", "image_id"),
+    )
+
     def __repr__(self):
         return f"<Annotation(image_id={self.image_id}, class_id={self.class_id})>"
 
 
+# Smaller side of a box in pixels; "boxes smaller than 16 px" compare it.
+BOX_MIN_SIDE = func.min(
+    Annotation.xmax - Annotation.xmin, Annotation.ymax - Annotation.ymin
+)
+# Answers box filters of DatasetQuery by class and size without reading rows.
+Index(
+    "ix_annotations_class_id_min_side",
+    Annotation.class_id,
+    BOX_MIN_SIDE,
+    Annotation.image_id,
+)
+
+
+class ClassCount(Base):
+    """Annotations per class, maintained by triggers on annotations."""
+
+    __tablename__ = "class_counts"
+
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ImageBoxCount(Base):
+    """Annotations per image, maintained by triggers on annotations."""
+
+    __tablename__ = "image_box_counts"
+
+    image_id = Column(Integer, ForeignKey("images.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    # Box count ranges of DatasetQuery.
+    __table_args__ = (Index("ix_image_box_counts_count", "count", "image_id"),)
+
+
+class ProjectStats(Base):
+    """Single row (id 1) of project totals, maintained by triggers."""
+
+    __tablename__ = "project_stats"
+
+    id = Column(Integer, primary_key=True)
+    images = Column(Integer, nullable=False, default=0)
+    annotations = Column(Integer, nullable=False, default=0)
+    verified_images = Column(Integer, nullable=False, default=0)
+
+
+class BoxIssue(Base):
+    """A finding of the last box_checks.check_boxes() run."""
+
+    __tablename__ = "box_issues"
+
+    id = Column(Integer, primary_key=True)
+    image_id = Column(Integer, ForeignKey("images.id"), nullable=False)
+    # Not foreign keys: issues are a snapshot and outlive re-ingested boxes.
+    annotation_id = Column(Integer, nullable=False)
+    other_annotation_id = Column(Integer)  # the box a duplicate overlaps
+    kind = Column(String, nullable=False)  # see libs.box_checks.ISSUE_KINDS
+    value = Column(Float)  # IoU of duplicates
+
+    # "Images with issues of a kind" for DatasetQuery.has_issue.
+    __table_args__ = (Index("ix_box_issues_kind_image_id", "kind", "image_id"),)
+
+
+# Keep the aggregate tables in step with every write, inside the writing
+# transaction, so reading them never needs a scan. The same statements are
+# in the migration that introduced them.
+AGGREGATE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_annotations_insert
+    AFTER INSERT ON annotations BEGIN
+        INSERT INTO class_counts (class_id, count) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET count = count + 1;
+        INSERT INTO image_box_counts (image_id, count) VALUES (NEW.image_id, 1)
+            ON CONFLICT (image_id) DO UPDATE SET count = count + 1;
+        UPDATE project_stats SET annotations = annotations + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_annotations_delete
+    AFTER DELETE ON annotations BEGIN
+        UPDATE class_counts SET count = count - 1 WHERE class_id = OLD.class_id;
+        DELETE FROM class_counts WHERE class_id = OLD.class_id AND count <= 0;
+        UPDATE image_box_counts SET count = count - 1 WHERE image_id = OLD.image_id;
+        DELETE FROM image_box_counts WHERE image_id = OLD.image_id AND count <= 0;
+        UPDATE project_stats SET annotations = annotations - 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_annotations_update
+    AFTER UPDATE OF class_id, image_id ON annotations BEGIN
+        UPDATE class_counts SET count = count - 1 WHERE class_id = OLD.class_id;
+        DELETE FROM class_counts WHERE class_id = OLD.class_id AND count <= 0;
+        UPDATE image_box_counts SET count = count - 1 WHERE image_id = OLD.image_id;
+        DELETE FROM image_box_counts WHERE image_id = OLD.image_id AND count <= 0;
+        INSERT INTO class_counts (class_id, count) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET count = count + 1;
+        INSERT INTO image_box_counts (image_id, count) VALUES (NEW.image_id, 1)
+            ON CONFLICT (image_id) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_images_insert
+    AFTER INSERT ON images BEGIN
+        UPDATE project_stats SET images = images + 1,
+            verified_images = verified_images + NEW.verified WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_images_delete
+    AFTER DELETE ON images BEGIN
+        UPDATE project_stats SET images = images - 1,
+            verified_images = verified_images - OLD.verified WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_images_verified
+    AFTER UPDATE OF verified ON images BEGIN
+        UPDATE project_stats
+            SET verified_images = verified_images + NEW.verified - OLD.verified
+            WHERE id = 1;
+    END
+    """,
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_aggregate_triggers(target, connection, **kw):
+    connection.execute(
+        text(
+            "INSERT OR IGNORE INTO project_stats "
+            "(id, images, annotations, verified_images) VALUES (1, 0, 0, 0)"
+        )
+    )
+    for trigger in AGGREGATE_TRIGGERS:
+        connection.execute(text(trigger))
+
+
 class UndoHistory(Base):
     __tablename__ = "undo_history"
 
@@ -83,11 +268,27 @@ class UndoHistory(Base):
     action_type = Column(String, nullable=False)  # CREATE, UPDATE, DELETE
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     details = Column(Text)  # JSON string or specific format to restore state
+    image_id = Column(Integer, ForeignKey("images.id"), index=True)
+    shape_uuid = Column(String)
 
     def __repr__(self):
         return f"<UndoHistory(action='{self.action_type}')>"
 
 
+class UndoSnapshot(Base):
+    __tablename__ = "undo_snapshots"
+
+    image_id = Column(Integer, ForeignKey("images.id"), primary_key=True)
+    # JSON list of Shape.to_data() as the shapes were when the image was left
+    shapes = Column(Text, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self):
+        return f"<UndoSnapshot(image_id={self.image_id})>"
+
+
 class Setting(Base):
     __tablename__ = "settings"
 
@@ -98,12 +299,175 @@ class Setting(Base):
         return f"<Setting(key='{self.key}')>"
 
 
-def get_db_engine(db_path):
+def _coerce_engine_setting(name, value):
+    choices = _PRAGMA_CHOICES.get(name)
+    if choices:
+        value = str(value).upper()
+        if value not in choices:
+            raise ValueError(f"expected one of {', '.join(choices)}")
+        return value
+    return int(value)
+
+
+def load_engine_settings(db_path):
+    """
+    Returns the engine settings of a project: the defaults updated with the
+    "sqlite.*" rows of its settings table. Read with plain sqlite3 since the
+    engine cannot be created before they are known.
+    """
+    settings = dict(ENGINE_DEFAULTS)
+    if not os.path.exists(db_path):
+        return settings
+    try:
+        connection = sqlite3.connect(db_path)
+        try:
+            rows = connection.execute(
+                "SELECT key, value FROM settings WHERE key LIKE ?",
+                (ENGINE_SETTING_PREFIX + "%",),
+            ).fetchall()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return settings
+    for key, value in rows:
+        name = key[len(ENGINE_SETTING_PREFIX) :]
+        if name not in settings:
+            continue
+        try:
+            settings[name] = _coerce_engine_setting(name, value)
+        except ValueError as e:
+            logger.warning("Ignoring project setting %s=%r: %s", key, value, e)
+    return settings
+
+
+def set_engine_setting(session, name, value):
+    """
+    Stores an engine setting for the project; it applies the next time the
+    database is opened. Projects shared over a network filesystem should
+    use journal_mode DELETE and mmap_size 0, as WAL needs shared memory.
+    """
+    if name not in ENGINE_DEFAULTS:
+        raise KeyError(name)
+    value = _coerce_engine_setting(name, value)
+    session.merge(Setting(key=ENGINE_SETTING_PREFIX + name, value=str(value)))
+    session.commit()
+
+
+def class_distribution(session):
+    """
+    Query of (class name, annotation count), largest first. Counting happens
+    on ix_annotations_class_id_image_id before the join with classes.
+    """
+    counts = (
+        session.query(Annotation.class_id, func.count().label("count"))
+        .group_by(Annotation.class_id)
+        .subquery()
+    )
+    return (
+        session.query(Class.name, counts.c.count)
+        .join(counts, Class.id == counts.c.class_id)
+        .order_by(counts.c.count.desc())
+    )
+
+
+def class_counts(session):
+    """Like class_distribution, read from the class_counts aggregate."""
+    return (
+        session.query(Class.name, ClassCount.count)
+        .join(ClassCount, Class.id == ClassCount.class_id)
+        .order_by(ClassCount.count.desc())
+    )
+
+
+def project_stats(session):
+    """The ProjectStats row of the project."""
+    return session.get(ProjectStats, 1)
+
+
+def rebuild_aggregates(session):
+    """Recompute the aggregate tables from annotations and images."""
+    session.execute(text("DELETE FROM class_counts"))
+    session.execute(text("DELETE FROM image_box_counts"))
+    session.execute(
+        text(
+            "INSERT INTO class_counts (class_id, count) "
+            "SELECT class_id, count(*) FROM annotations GROUP BY class_id"
+        )
+    )
+    session.execute(
+        text(
+            "INSERT INTO image_box_counts (image_id, count) "
+            "SELECT image_id, count(*) FROM annotations GROUP BY image_id"
+        )
+    )
+    session.execute(
+        text(
+            "INSERT OR REPLACE INTO project_stats "
+            "(id, images, annotations, verified_images) SELECT 1, "
+            "(SELECT count(*) FROM images), (SELECT count(*) FROM annotations), "
+            "(SELECT count(*) FROM images WHERE verified)"
+        )
+    )
+    session.commit()
+
+
+def image_box_counts(session):
+    """Query of (image id, annotation count), served by ix_annotations_image_id."""
+    return session.query(Annotation.image_id, func.count()).group_by(
+        Annotation.image_id
+    )
+
+
+def get_db_engine(db_path, settings=None):
     """
     Creates the database engine.
     db_path: Path to the sqlite file (e.g., 'project_statistics.db')
+    settings: Engine settings, by default load_engine_settings(db_path)
+    """
+    if settings is None:
+        settings = load_engine_settings(db_path)
+    # A real pool lets the GUI and the background writers hold connections
+    # at the same time instead of serializing on a single one.
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        poolclass=QueuePool,
+        pool_size=settings["pool_size"],
+        max_overflow=settings["max_overflow"],
+        pool_timeout=settings["pool_timeout"],
+        connect_args={"timeout": settings["busy_timeout"] / 1000},
+    )
+    pragmas = [f"PRAGMA {name}={settings[name]}" for name in _PRAGMAS]
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL with synchronous=NORMAL keeps the frequent small commits of the
+        # background writers cheap and lets the GUI read while they write.
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def schema_revision(db_path):
+    """
+    Returns the revision stamped in alembic_version, or None for a missing
+    or unversioned database. Costs one query and no Alembic import.
     """
-    return create_engine(f"sqlite:///{db_path}")
+    if not os.path.exists(db_path):
+        return None
+    try:
+        connection = sqlite3.connect(db_path)
+        try:
+            row = connection.execute(
+                "SELECT version_num FROM alembic_version"
+            ).fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
 
 
 def apply_migrations(db_path):
@@ -116,6 +480,14 @@ def apply_migrations(db_path):
     if abs_db_path in _MIGRATED_DATABASES:
         return
 
+    if schema_revision(abs_db_path) == SCHEMA_HEAD:
+        _MIGRATED_DATABASES.add(abs_db_path)
+        return
+
+    # Only pay for importing Alembic when there is something to upgrade.
+    from alembic.config import Config
+    from alembic import command
+
     # Path to the alembic.ini file (at the root of the project)
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     ini_path = os.path.join(base_dir, "alembic.ini")
@@ -157,10 +529,13 @@ def init_db(db_path):
     """
     Initializes the database, creating tables if they don't exist.
     """
+    at_head = schema_revision(db_path) == SCHEMA_HEAD
     # Run migrations automatically (only once per path)
-    apply_migrations(db_path)
+    if not at_head:
+        apply_migrations(db_path)
 
     engine = get_db_engine(db_path)
     # create_all is a fallback/safety, migrations should handle it
-    Base.metadata.create_all(engine)
+    if not at_head:
+        Base.metadata.create_all(engine)
     return sessionmaker(bind=engine)
@@ -0,0 +1,111 @@
+"""
+Filters over the project database for finding images to review.
+
+    query = DatasetQuery().with_box("person", smaller_than=16).verified(False)
+    paths = query.paths(session)
+
+Every filter narrows the result. Each one is an ``images.id IN (...)``
+subquery answered from an index (ix_annotations_class_id_min_side,
+ix_annotations_class_id_image_id, ix_image_box_counts_count,
+ix_box_issues_kind_image_id), so SQLite computes it once instead of
+probing annotations per image.
+"""
+from sqlalchemy import func, select
+
+from libs.database import (
+    BOX_MIN_SIDE,
+    Annotation,
+    BoxIssue,
+    Class,
+    Image,
+    ImageBoxCount,
+)
+
+
+class DatasetQuery(object):
+
+    def __init__(self):
+        self._conditions = []
+        self._description = []
+
+    def with_box(self, label=None, smaller_than=None, larger_than=None):
+        """
+        Images having at least one box of class label (any class if None)
+        whose smaller side is below smaller_than / above larger_than pixels.
+        """
+        boxes = select(Annotation.image_id)
+        parts = []
+        if label is not None:
+            boxes = boxes.where(Annotation.class_id == _class_id(label))
+            parts.append(label)
+        if smaller_than is not None:
+            boxes = boxes.where(BOX_MIN_SIDE < smaller_than)
+            parts.append("< %d px" % smaller_than)
+        if larger_than is not None:
+            boxes = boxes.where(BOX_MIN_SIDE > larger_than)
+            parts.append("> %d px" % larger_than)
+        self._conditions.append(Image.id.in_(boxes))
+        self._description.append("box " + " ".join(parts or ["any"]))
+        return self
+
+    def without_class(self, label):
+        boxes = select(Annotation.image_id).where(
+            Annotation.class_id == _class_id(label)
+        )
+        self._conditions.append(Image.id.not_in(boxes))
+        self._description.append("no " + label)
+        return self
+
+    def box_count(self, minimum=None, maximum=None):
+        """Images with minimum <= boxes <= maximum; either bound may be None."""
+        if minimum:
+            counts = select(ImageBoxCount.image_id).where(
+                ImageBoxCount.count >= minimum
+            )
+            if maximum is not None:
+                counts = counts.where(ImageBoxCount.count <= maximum)
+            self._conditions.append(Image.id.in_(counts))
+        elif maximum is not None:
+            # Images without boxes have no image_box_counts row.
+            too_many = select(ImageBoxCount.image_id).where(
+                ImageBoxCount.count > maximum
+            )
+            self._conditions.append(Image.id.not_in(too_many))
+        else:
+            return self
+        self._description.append(
+            "%s..%s boxes" % (minimum or 0, "" if maximum is None else maximum)
+        )
+        return self
+
+    def verified(self, verified=True):
+        self._conditions.append(Image.verified.is_(bool(verified)))
+        self._description.append("verified" if verified else "unverified")
+        return self
+
+    def has_issue(self, kind=None):
+        """Images with a finding of the last box check, of kind if given."""
+        issues = select(BoxIssue.image_id)
+        if kind is not None:
+            issues = issues.where(BoxIssue.kind == kind)
+        self._conditions.append(Image.id.in_(issues))
+        self._description.append((kind or "any").replace("_", " ") + " issue")
+        return self
+
+    def statement(self):
+        return select(Image.path).where(*self._conditions)
+
+    def paths(self, session):
+        return session.execute(self.statement()).scalars().all()
+
+    def count(self, session):
+        return session.execute(
+            select(func.count()).select_from(Image).where(*self._conditions)
+        ).scalar()
+
+    def __str__(self):
+        return ", ".join(self._description) or "all images"
+
+
+def _class_id(label):
+    return select(Class.id).where(Class.name == label).scalar_subquery()
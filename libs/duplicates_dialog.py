@@ -0,0 +1,57 @@
+from PyQt6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QLabel,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+)
+
+
+class DuplicatesDialog(QDialog):
+    """
+    Lists clusters of near-identical images. Activating an image calls
+    open_image(path); "Show as Working Set" accepts the dialog.
+    """
+
+    def __init__(self, parent, clusters, open_image=None):
+        super().__init__(parent)
+        self.setWindowTitle("Duplicate Images")
+        self.resize(600, 400)
+        self.clusters = clusters
+        self.open_image = open_image
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        for number, paths in enumerate(clusters, 1):
+            cluster = QTreeWidgetItem(
+                self.tree, ["Cluster %d: %d images" % (number, len(paths))]
+            )
+            for path in paths:
+                QTreeWidgetItem(cluster, [path])
+        self.tree.itemActivated.connect(self.item_activated)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        show = buttons.addButton(
+            "Show as Working Set", QDialogButtonBox.ButtonRole.AcceptRole
+        )
+        show.setEnabled(bool(clusters))
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(
+            QLabel(
+                "%d clusters, %d images"
+                % (len(clusters), sum(len(paths) for paths in clusters))
+            )
+        )
+        layout.addWidget(self.tree)
+        layout.addWidget(buttons)
+
+    def item_activated(self, item, _column):
+        if item.parent() is not None and self.open_image is not None:
+            self.open_image(item.text(0))
+
+    def paths(self):
+        return [path for paths in self.clusters for path in paths]
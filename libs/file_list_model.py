@@ -0,0 +1,105 @@
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QColor
+
+from libs.annotation_index import VERIFIED
+
+# Background of the image whose annotations have unsaved changes.
+DIRTY_COLOR = QColor("#FFCCCC")
+# Badges of annotated and verified images; unlabelled images have none.
+LABELLED_COLOR = QColor("#5B8DEF")
+VERIFIED_COLOR = QColor("#3BAA4B")
+
+
+class FileListModel(QAbstractListModel):
+    """
+    List model over an ImageCatalog.
+
+    The view asks for the rows it paints, so only the visible paths are
+    ever turned into strings; nothing is copied per image. Badges come
+    from the AnnotationIndex, when one is given.
+    """
+
+    def __init__(self, catalog, annotation_index=None, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.annotation_index = annotation_index
+        self._dirty_row = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.catalog)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        match role:
+            case Qt.ItemDataRole.DisplayRole | Qt.ItemDataRole.ToolTipRole:
+                return self.catalog[index.row()]
+            case Qt.ItemDataRole.BackgroundRole:
+                if index.row() == self._dirty_row:
+                    return DIRTY_COLOR
+            case Qt.ItemDataRole.DecorationRole:
+                return self._badge(index.row())
+        return None
+
+    def _badge(self, row):
+        status = self.annotation_index
+        if status is None or row >= len(status) or not status.is_labelled(row):
+            return None
+        if status.verified_state(row) == VERIFIED:
+            return VERIFIED_COLOR
+        return LABELLED_COLOR
+
+    def path(self, index):
+        return self.catalog[index.row()]
+
+    def index_of(self, path):
+        row = self.catalog.get_index(path)
+        if row is None:
+            return QModelIndex()
+        return self.index(row)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.catalog.set_paths(paths)
+        self._dirty_row = None
+        self.endResetModel()
+
+    def clear(self):
+        self.set_paths(())
+
+    def remove_path(self, path):
+        """Drops path and returns its former row, or None when absent."""
+        row = self.catalog.get_index(path)
+        if row is None:
+            return None
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.catalog.remove(path)
+        if self.annotation_index is not None and row < len(self.annotation_index):
+            self.annotation_index.remove(row)
+        if self._dirty_row is not None and self._dirty_row >= row:
+            self._dirty_row = None if self._dirty_row == row else self._dirty_row - 1
+        self.endRemoveRows()
+        return row
+
+    def refresh_row(self, row):
+        """Repaint the badge of row after its annotation status changed."""
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def refresh_all(self):
+        if self.rowCount():
+            self.dataChanged.emit(
+                self.index(0),
+                self.index(self.rowCount() - 1),
+                [Qt.ItemDataRole.DecorationRole],
+            )
+
+    def set_dirty_row(self, row):
+        """Highlight row as having unsaved changes; None clears it."""
+        previous, self._dirty_row = self._dirty_row, row
+        for changed in {previous, row} - {None}:
+            index = self.index(changed)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.BackgroundRole])
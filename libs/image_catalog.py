@@ -0,0 +1,221 @@
+"""
+Ordered list of the image paths of the open directory.
+
+Directories are interned once. The file names are packed into a single
+bytearray with an offsets array, so an image costs a few dozen bytes
+instead of a str, a list slot and a dict entry. Path strings are only
+built when asked for, e.g. for the rows the file list actually shows.
+
+Lookups by path go through an open-addressing table of rows keyed by
+the path's hash, so membership, index() and neighbour lookups stay O(1)
+for a million images. The catalog supports the read side of a list, so
+code written against the former plain list keeps working.
+
+remove() only marks the row dead and counts it in a Fenwick tree, which
+turns rows into positions and back in O(log n) while any are dead; the
+arrays are compacted once a quarter of the rows are, so removing costs
+O(log n) amortized.
+"""
+import os
+import sys
+from array import array
+
+# How names are packed; the same round trip as os.fsencode()/os.fsdecode().
+_ENCODING = sys.getfilesystemencoding()
+_ERRORS = sys.getfilesystemencodeerrors()
+
+_EMPTY = -1
+_DELETED = -2
+# Dead rows tolerated before compaction: this many, or a quarter of the rows.
+_MIN_COMPACT = 64
+
+
+class ImageCatalog(object):
+
+    def __init__(self, paths=()):
+        self.set_paths(paths)
+
+    def set_paths(self, paths):
+        self._dirs = []
+        self._dir_ids = {}
+        self._names = bytearray()
+        self._offsets = array("Q", [0])
+        self._dir_of = array("I")
+        hashes = array("q")
+        for path in paths:
+            directory, name = os.path.split(path)
+            dir_id = self._dir_ids.get(directory)
+            if dir_id is None:
+                dir_id = self._dir_ids[directory] = len(self._dirs)
+                self._dirs.append(directory)
+            self._names += name.encode(_ENCODING, _ERRORS)
+            self._offsets.append(len(self._names))
+            self._dir_of.append(dir_id)
+            hashes.append(hash(path))
+        self._build_table(hashes)
+        # Removed rows: a flag per row and a Fenwick tree of their counts,
+        # both created by the first remove().
+        self._removed = 0
+        self._dead = None
+        self._tree = None
+
+    def clear(self):
+        self.set_paths(())
+
+    def __len__(self):
+        return len(self._dir_of) - self._removed
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._path(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("image catalog index out of range")
+        return self._path(position)
+
+    def __iter__(self):
+        dead = self._dead
+        for row in range(len(self._dir_of)):
+            if dead is None or not dead[row]:
+                yield self._row_path(row)
+
+    def __contains__(self, path):
+        return self.get_index(path) is not None
+
+    def index(self, path):
+        """Position of path; raises ValueError when absent, like list.index."""
+        position = self.get_index(path)
+        if position is None:
+            raise ValueError("%r is not in the image catalog" % (path,))
+        return position
+
+    def get_index(self, path, default=None):
+        slot = self._find_slot(path)
+        if slot is None:
+            return default
+        return self._position(self._table[slot])
+
+    def path(self, position, default=None):
+        """Path at position, or default when out of range."""
+        if 0 <= position < len(self):
+            return self._path(position)
+        return default
+
+    def neighbour(self, path, step):
+        """Path step positions away from path, or None."""
+        position = self.get_index(path)
+        if position is None:
+            return None
+        return self.path(position + step)
+
+    def remove(self, path):
+        """Drops path and returns its former position, or None when absent."""
+        slot = self._find_slot(path)
+        if slot is None:
+            return None
+        row = self._table[slot]
+        position = self._position(row)
+        self._table[slot] = _DELETED
+        rows = len(self._dir_of)
+        if self._dead is None:
+            self._dead = bytearray(rows)
+            self._tree = array("I", bytes(4 * (rows + 1)))
+        self._dead[row] = 1
+        self._removed += 1
+        tree, i = self._tree, row + 1
+        while i <= rows:
+            tree[i] += 1
+            i += i & -i
+        if self._removed > max(_MIN_COMPACT, rows // 4):
+            self.set_paths(list(self))
+        return position
+
+    def sort(self, key=None, reverse=False):
+        self.set_paths(sorted(self, key=key, reverse=reverse))
+
+    def memory_usage(self):
+        """Approximate bytes held by the packed arrays and interned directories."""
+        usage = (
+            len(self._names)
+            + self._offsets.itemsize * len(self._offsets)
+            + self._dir_of.itemsize * len(self._dir_of)
+            + self._table.itemsize * len(self._table)
+            + sum(len(d) + 49 for d in self._dirs)
+        )
+        if self._dead is not None:
+            usage += len(self._dead) + self._tree.itemsize * len(self._tree)
+        return usage
+
+    def _path(self, position):
+        return self._row_path(self._row(position))
+
+    def _row_path(self, row):
+        name = self._names[self._offsets[row] : self._offsets[row + 1]]
+        return os.path.join(
+            self._dirs[self._dir_of[row]], name.decode(_ENCODING, _ERRORS)
+        )
+
+    def _position(self, row):
+        """Position of a live row: the live rows before it."""
+        if not self._removed:
+            return row
+        tree, dead, i = self._tree, 0, row
+        while i > 0:
+            dead += tree[i]
+            i -= i & -i
+        return row - dead
+
+    def _row(self, position):
+        """Row of the position-th live row, walking down the Fenwick tree."""
+        if not self._removed:
+            return position
+        tree, rows = self._tree, len(self._dir_of)
+        row, remaining = 0, position + 1
+        step = 1 << rows.bit_length()
+        while step:
+            i = row + step
+            # tree[i] counts the dead rows of the step rows ending at row i.
+            if i <= rows and step - tree[i] < remaining:
+                row = i
+                remaining -= step - tree[i]
+            step >>= 1
+        return row
+
+    def _matches(self, row, dir_id, name):
+        return (
+            self._dir_of[row] == dir_id
+            and self._names[self._offsets[row] : self._offsets[row + 1]] == name
+        )
+
+    def _find_slot(self, path):
+        if not isinstance(path, str):
+            return None
+        directory, name = os.path.split(path)
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            return None
+        name = name.encode(_ENCODING, _ERRORS)
+        table, mask = self._table, len(self._table) - 1
+        slot = hash(path) & mask
+        while True:
+            row = table[slot]
+            if row == _EMPTY:
+                return None
+            if row >= 0 and self._matches(row, dir_id, name):
+                return slot
+            slot = (slot + 1) & mask
+
+    def _build_table(self, hashes):
+        # At most half full, so probe sequences stay short.
+        size = 8
+        while size < 2 * len(hashes):
+            size *= 2
+        table = array("q", [_EMPTY]) * size
+        mask = size - 1
+        for row, path_hash in enumerate(hashes):
+            slot = path_hash & mask
+            while table[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = row
+        self._table = table
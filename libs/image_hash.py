@@ -0,0 +1,291 @@
+"""
+Perceptual hashes of the project images, for finding near-duplicate frames.
+
+    job = HashJob(sessionmaker(bind=engine), on_done=print)
+    job.start()
+    ...
+    clusters = duplicate_clusters(session, radius=4)
+
+The hash is a 64-bit dHash: the image is decoded straight to 9x8 pixels
+(QImageReader.setScaledSize lets the JPEG decoder skip most of the work),
+and each bit tells whether a pixel is brighter than its right neighbour.
+Similar images have hashes a few bits apart.
+
+Hashes are stored on the images rows along with the size and mtime of
+the file they were computed from (storage.stat(): for archive members
+and objects, a version standing in for the mtime), so a later run only
+decodes new or changed files. Images are read through libs.storage, so
+archives and object stores are hashed too. Decoding runs in a process
+pool driven from a daemon thread, which writes the hashes with its own
+session.
+
+Clusters are found with a BK-tree over the distinct hashes: identical
+hashes are grouped by a dict first, and only one query per distinct hash
+walks the tree.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select, update
+
+from libs import storage
+from libs.database import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+_SIGN_BIT = 1 << (HASH_BITS - 1)
+_MASK = (1 << HASH_BITS) - 1
+# Below this many files hashing runs on the job thread itself.
+MIN_PARALLEL_FILES = 64
+# Hashes written per transaction.
+BATCH_SIZE = 500
+
+
+def dhash(path):
+    """64-bit difference hash of the image at path, or None if unreadable."""
+    from PyQt6.QtCore import QSize
+    from PyQt6.QtGui import QImage
+
+    reader = storage.image_reader(path)
+    if reader is None:
+        return None
+    reader.setScaledSize(QSize(9, 8))
+    image = reader.read()
+    if image.isNull():
+        return None
+    image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+    if image.width() != 9 or image.height() != 8:
+        image = image.scaled(9, 8)
+    pixels = image.constBits().asstring(image.sizeInBytes())
+    stride = image.bytesPerLine()
+    value = 0
+    for y in range(8):
+        row = pixels[y * stride : y * stride + 9]
+        for x in range(8):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def to_column(value):
+    """Hash as stored in the signed 64-bit INTEGER column."""
+    return value - (1 << HASH_BITS) if value & _SIGN_BIT else value
+
+
+def from_column(value):
+    return value & _MASK
+
+
+def _hash_file(item):
+    """Process pool entry point: (id, path, size, mtime_ns) -> with its hash."""
+    image_id, path, size, mtime_ns = item
+    try:
+        value = dhash(path)
+    except Exception:
+        value = None
+    return image_id, value, size, mtime_ns
+
+
+def stale_images(session):
+    """
+    (id, path, size, mtime_ns) of the images not hashed since their file
+    last changed. An unreadable image keeps content_hash NULL with its
+    size and mtime set, so it is only tried again once it changes.
+    """
+    stale = []
+    for image_id, path, size, mtime_ns in session.execute(
+        select(Image.id, Image.path, Image.file_size, Image.file_mtime_ns)
+    ):
+        try:
+            current = storage.stat(path)
+        except (OSError, KeyError, ValueError):
+            continue
+        if (size, mtime_ns) != current:
+            stale.append((image_id, path) + tuple(current))
+    return stale
+
+
+def hash_images(session, items, max_workers=None, should_stop=None, on_progress=None):
+    """
+    Hashes items of stale_images() and stores the results; returns how
+    many were stored. should_stop() is polled between windows of items and
+    on_progress(done, total) is called after every committed batch.
+    """
+    done = 0
+    batch = []
+
+    def flush():
+        for image_id, value, size, mtime_ns in batch:
+            session.execute(
+                update(Image)
+                .where(Image.id == image_id)
+                .values(
+                    content_hash=None if value is None else to_column(value),
+                    file_size=size,
+                    file_mtime_ns=mtime_ns,
+                )
+            )
+        session.commit()
+        del batch[:]
+        if on_progress is not None:
+            on_progress(done, len(items))
+
+    if len(items) < MIN_PARALLEL_FILES:
+        workers, pool = 1, None
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        # spawn: forking a process that runs Qt threads is not safe.
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    # Items are handed out a window at a time, so stopping only waits for
+    # the window in flight.
+    chunk = max(1, min(64, len(items) // (workers * 8)))
+    window = chunk * workers * 4
+    try:
+        for start in range(0, len(items), window):
+            part = items[start : start + window]
+            if pool is None:
+                results = map(_hash_file, part)
+            else:
+                results = pool.map(_hash_file, part, chunksize=chunk)
+            for result in results:
+                batch.append(result)
+                done += 1
+                if len(batch) >= BATCH_SIZE:
+                    flush()
+            if should_stop is not None and should_stop():
+                break
+        flush()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    return done
+
+
+class HashJob(object):
+    """Hashes the stale images of the project on a daemon thread."""
+
+    def __init__(self, session_factory, on_progress=None, on_done=None):
+        # on_progress(done, total) and on_done(hashed, error) are called on
+        # the job thread.
+        self.session_factory = session_factory
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="HashJob", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    def stop(self):
+        """Stop after the window in flight; what was hashed so far is kept."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        session = self.session_factory()
+        hashed, error = 0, None
+        try:
+            items = stale_images(session)
+            if self.on_progress is not None:
+                self.on_progress(0, len(items))
+            hashed = hash_images(
+                session,
+                items,
+                should_stop=self._stop.is_set,
+                on_progress=self.on_progress,
+            )
+        except Exception as e:
+            error = e
+            logger.error("Hashing images failed: %s", e)
+        finally:
+            session.close()
+        if self.on_done is not None:
+            self.on_done(hashed, error)
+
+
+class BKTree(object):
+    """Hashes indexed for "everything within r bits" queries."""
+
+    def __init__(self):
+        # node: [hash, {distance: child node}]
+        self._root = None
+
+    def add(self, value):
+        if self._root is None:
+            self._root = [value, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """Hashes at most radius bits away from value."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.append(node[0])
+            for child_distance, child in node[1].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def duplicate_clusters(session, radius=4):
+    """
+    Groups of image paths whose hashes are at most radius bits apart,
+    largest first; images without a near duplicate are left out.
+    """
+    by_hash = {}
+    for path, value in session.execute(
+        select(Image.path, Image.content_hash).where(Image.content_hash.is_not(None))
+    ):
+        by_hash.setdefault(from_column(value), []).append(path)
+
+    parent = {value: value for value in by_hash}
+
+    def find(value):
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    if radius > 0:
+        tree = BKTree()
+        for value in by_hash:
+            tree.add(value)
+        for value in by_hash:
+            for other in tree.search(value, radius):
+                root, other_root = find(value), find(other)
+                if root != other_root:
+                    parent[other_root] = root
+
+    clusters = {}
+    for value, paths in by_hash.items():
+        clusters.setdefault(find(value), []).extend(paths)
+    return sorted(
+        (sorted(paths) for paths in clusters.values() if len(paths) > 1),
+        key=lambda paths: (-len(paths), paths[0]),
+    )
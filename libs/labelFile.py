@@ -9,6 +9,7 @@ from enum import Enum
 from libs.create_ml_io import CreateMLWriter
 from libs.pascal_voc_io import PascalVocWriter
 from libs.pascal_voc_io import XML_EXT
+from libs.storage import read_image
 from libs.yolo_io import YOLOWriter
 
 
@@ -37,10 +38,7 @@ class LabelFile(object):
         img_folder_name = os.path.basename(os.path.dirname(image_path))
         img_file_name = os.path.basename(image_path)
 
-        image = QImage()
-        image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.image_shape(image_path, image_data)
         writer = CreateMLWriter(img_folder_name, img_file_name,
                                 image_shape, shapes, filename, local_img_path=image_path)
         writer.verified = self.verified
@@ -54,15 +52,7 @@ class LabelFile(object):
         img_folder_name = os.path.split(img_folder_path)[-1]
         img_file_name = os.path.basename(image_path)
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
-        # Read from file path because self.imageData might be empty if saving to
-        # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.image_shape(image_path, image_data)
         writer = PascalVocWriter(img_folder_name, img_file_name,
                                  image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -84,15 +74,7 @@ class LabelFile(object):
         img_folder_name = os.path.split(img_folder_path)[-1]
         img_file_name = os.path.basename(image_path)
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
-        # Read from file path because self.imageData might be empty if saving to
-        # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.image_shape(image_path, image_data)
         writer = YOLOWriter(img_folder_name, img_file_name,
                             image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -140,6 +122,22 @@ class LabelFile(object):
                     f, ensure_ascii=True, indent=2)
     '''
 
+    @staticmethod
+    def image_shape(image_path, image_data=None):
+        """
+        [height, width, depth] of the image. image_data may already be that
+        list, or a QImage; otherwise the image is decoded from image_path,
+        since self.imageData might be empty if saving to Pascal format.
+        """
+        if isinstance(image_data, (list, tuple)):
+            return list(image_data)
+        if isinstance(image_data, QImage):
+            image = image_data
+        else:
+            image = read_image(image_path)
+        return [image.height(), image.width(),
+                1 if image.isGrayscale() else 3]
+
     @staticmethod
     def is_label_file(filename):
         file_suffix = os.path.splitext(filename)[1].lower()
@@ -0,0 +1,124 @@
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+from libs.utils import generate_color_by_text
+
+
+class LabelListModel(QAbstractListModel):
+    """
+    List model over the shapes loaded in the canvas.
+
+    Rows are the shapes themselves and the check state is the canvas
+    visibility, so there is no parallel item/shape bookkeeping and a
+    visibility change over many rows costs one dataChanged and one repaint.
+    """
+
+    def __init__(self, canvas, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+        self._shapes = []
+        self._rows = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._shapes)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        shape = self._shapes[index.row()]
+        match role:
+            case Qt.ItemDataRole.DisplayRole | Qt.ItemDataRole.EditRole:
+                return shape.label
+            case Qt.ItemDataRole.CheckStateRole:
+                if self.canvas.isVisible(shape):
+                    return Qt.CheckState.Checked
+                return Qt.CheckState.Unchecked
+            case Qt.ItemDataRole.BackgroundRole:
+                return generate_color_by_text(shape.label)
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid():
+            return False
+        shape = self._shapes[index.row()]
+        if role == Qt.ItemDataRole.CheckStateRole:
+            visible = Qt.CheckState(value) == Qt.CheckState.Checked
+            self.canvas.set_shape_visible(shape, visible)
+        elif role == Qt.ItemDataRole.EditRole:
+            shape.label = value
+            shape.line_color = generate_color_by_text(value)
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid():
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+    def shape(self, row):
+        return self._shapes[row]
+
+    def shapes(self):
+        return list(self._shapes)
+
+    def labels(self):
+        return [shape.label for shape in self._shapes]
+
+    def index_of(self, shape):
+        row = self._rows.get(shape)
+        if row is None:
+            return QModelIndex()
+        return self.index(row)
+
+    def set_shapes(self, shapes):
+        self.beginResetModel()
+        self._shapes = list(shapes)
+        self._rows = {shape: row for row, shape in enumerate(self._shapes)}
+        self.endResetModel()
+
+    def clear(self):
+        self.set_shapes([])
+
+    def add_shape(self, shape):
+        row = len(self._shapes)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._shapes.append(shape)
+        self._rows[shape] = row
+        self.endInsertRows()
+
+    def remove_shape(self, shape):
+        row = self._rows.get(shape)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._shapes[row]
+        del self._rows[shape]
+        for i in range(row, len(self._shapes)):
+            self._rows[self._shapes[i]] = i
+        self.endRemoveRows()
+
+    def set_label(self, shape, label):
+        self.setData(self.index_of(shape), label, Qt.ItemDataRole.EditRole)
+
+    def shape_changed(self, shape):
+        """Refresh the row of a shape that was modified elsewhere."""
+        index = self.index_of(shape)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+    def set_visible_where(self, predicate):
+        """Show the shapes matching predicate and hide the rest in one batch."""
+        if not self._shapes:
+            return
+        self.canvas.set_shapes_visible(
+            {shape: bool(predicate(shape)) for shape in self._shapes}
+        )
+        self.dataChanged.emit(
+            self.index(0),
+            self.index(len(self._shapes) - 1),
+            [Qt.ItemDataRole.CheckStateRole],
+        )
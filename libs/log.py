@@ -0,0 +1,120 @@
+"""
+Logging for labelImg.
+
+Modules log through ``logging.getLogger(__name__)`` (``"labelImg"`` for the
+main script). setup_logging() attaches a QueueHandler to the root logger
+and starts a QueueListener thread that formats and writes the records, so
+a slow stderr or log file never blocks the GUI thread.
+
+Configuration, as arguments or environment variables:
+
+- LABELIMG_LOG_LEVEL: level of the labelImg loggers (default INFO)
+- LABELIMG_LOG_LEVELS: per-logger levels, "libs.undo_manager=debug,libs.database=warning"
+- LABELIMG_LOG_JSON: "1" for one JSON object per line
+- LABELIMG_LOG_FILE: append to this file instead of stderr
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Loggers of our own code; everything else stays at WARNING.
+APP_LOGGERS = ("labelImg", "libs")
+
+_listener = None
+_queue_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def parse_levels(spec):
+    """Parses "name=level,name=level" into {name: level}; bad items are skipped."""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        level = logging.getLevelName(level.strip().upper())
+        if name.strip() and isinstance(level, int):
+            levels[name.strip()] = level
+    return levels
+
+
+def setup_logging(
+    level=None, module_levels=None, json_output=None, filename=None, stream=None
+):
+    """Route all logging through a background listener. Safe to call twice."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    if level is None:
+        level = os.environ.get("LABELIMG_LOG_LEVEL", "INFO")
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+    if module_levels is None:
+        module_levels = parse_levels(os.environ.get("LABELIMG_LOG_LEVELS"))
+    if json_output is None:
+        json_output = os.environ.get("LABELIMG_LOG_JSON", "") not in ("", "0")
+    if filename is None:
+        filename = os.environ.get("LABELIMG_LOG_FILE") or None
+
+    if filename:
+        handler = logging.FileHandler(filename, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(stream or sys.stderr)
+    if json_output:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(logging.WARNING)
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(
+        records, handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Write out queued records and stop the listener."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
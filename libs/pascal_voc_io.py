@@ -3,8 +3,7 @@
 import sys
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement
-from lxml import etree
-import codecs
+from libs.atomic_io import atomic_write
 from libs.constants import DEFAULT_ENCODING
 
 
@@ -34,6 +33,8 @@ class PascalVocWriter:
         """
         Return a pretty-printed XML string for the Element.
         """
+        from lxml import etree
+
         rough_string = ElementTree.tostring(elem, "utf8")
         root = etree.fromstring(rough_string)
         return etree.tostring(root, pretty_print=True, encoding=ENCODE_METHOD).replace(
@@ -123,15 +124,11 @@ class PascalVocWriter:
     def save(self, target_file=None):
         root = self.gen_xml()
         self.append_objects(root)
-        out_file = None
         if target_file is None:
-            out_file = codecs.open(self.filename + XML_EXT, "w", encoding=ENCODE_METHOD)
-        else:
-            out_file = codecs.open(target_file, "w", encoding=ENCODE_METHOD)
+            target_file = self.filename + XML_EXT
 
-        prettify_result = self.prettify(root)
-        out_file.write(prettify_result.decode("utf8"))
-        out_file.close()
+        # prettify() already returns bytes in ENCODE_METHOD
+        atomic_write(target_file, self.prettify(root))
 
 
 class PascalVocReader:
@@ -178,6 +175,8 @@ class PascalVocReader:
 
     def parse_xml(self):
         assert self.file_path.endswith(XML_EXT), "Unsupported file format"
+        from lxml import etree
+
         parser = etree.XMLParser(encoding=ENCODE_METHOD)
         xml_tree = ElementTree.parse(self.file_path, parser=parser).getroot()
         # filename = xml_tree.find("filename").text  # Unused and potentially None
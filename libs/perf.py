@@ -0,0 +1,177 @@
+"""
+Timing spans for the hot paths.
+
+    with perf.span("decode_image"):
+        ...
+
+    @perf.timed("save_labels")
+    def save_labels(self, path):
+        ...
+
+Timing is off unless enabled (View > Performance HUD, or LABELIMG_PERF=1).
+While off, span() hands back a shared no-op context manager and timed()
+wrappers call straight through, so the instrumentation costs a flag check.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+# Durations are counted in power-of-two microsecond buckets: bucket i holds
+# durations below 2**i us, so 25 buckets reach past 30 seconds.
+HISTOGRAM_BUCKETS = 25
+# Weight of the newest sample in SpanStats.recent.
+RECENT_WEIGHT = 0.2
+
+_enabled = os.environ.get("LABELIMG_PERF", "") not in ("", "0")
+_stats = {}
+_lock = threading.Lock()
+
+
+class SpanStats(object):
+    """Running totals and a log2 histogram of one span name."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = 0.0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+        if self.count == 1:
+            self.recent = seconds
+        else:
+            self.recent += RECENT_WEIGHT * (seconds - self.recent)
+        bucket = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction):
+        """Upper bound in seconds of the bucket holding the given fraction."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return min(2**bucket / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            # Upper bound of each bucket in microseconds -> samples.
+            "histogram_us": {
+                str(2**bucket): count
+                for bucket, count in enumerate(self.histogram)
+                if count
+            },
+        }
+
+
+class _Span(object):
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing its block under name while enabled."""
+    if _enabled:
+        return _Span(name)
+    return _NULL_SPAN
+
+
+def timed(name):
+    """Decorator timing every call of the function under name while enabled."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def record(name, seconds):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = SpanStats(name)
+        stats.record(seconds)
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+def get(name):
+    """SpanStats recorded under name, or None."""
+    return _stats.get(name)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def snapshot():
+    """All spans as plain dicts, keyed by name."""
+    with _lock:
+        return {name: stats.to_dict() for name, stats in sorted(_stats.items())}
+
+
+def export_histograms(path):
+    """Write snapshot() as JSON to path."""
+    with open(path, "w") as f:
+        json.dump(
+            {"exported_at": time.time(), "spans": snapshot()}, f, indent=2
+        )
@@ -0,0 +1,58 @@
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QLabel
+
+from libs import perf
+
+# (span name, caption) rows shown in the overlay.
+HUD_ROWS = (
+    ("paint_event", "frame"),
+    ("decode_image", "decode"),
+    ("save_labels", "save"),
+)
+
+
+class PerfHud(QLabel):
+    """
+    Overlay in the corner of its parent showing recent span timings.
+
+    It polls perf every refresh_ms instead of being notified, so the
+    instrumented paths never touch the widget.
+    """
+
+    def __init__(self, parent=None, refresh_ms=250):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: #e0e0e0;"
+            "font-family: monospace; padding: 6px; border-radius: 4px;"
+        )
+        self.move(8, 8)
+        self._timer = QTimer(self)
+        self._timer.setInterval(refresh_ms)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def set_active(self, active):
+        perf.enable(active)
+        self.setVisible(active)
+        if active:
+            self.refresh()
+            self.raise_()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def refresh(self):
+        lines = []
+        for name, caption in HUD_ROWS:
+            stats = perf.get(name)
+            if stats is None:
+                lines.append(f"{caption:<7}      -")
+            else:
+                lines.append(
+                    f"{caption:<7}{stats.recent * 1000:7.1f} ms"
+                    f"  (max {stats.max * 1000:.1f})"
+                )
+        self.setText("\n".join(lines))
+        self.adjustSize()
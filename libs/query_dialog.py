@@ -0,0 +1,93 @@
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QFormLayout,
+    QLabel,
+    QSpinBox,
+    QVBoxLayout,
+)
+
+from libs.box_checks import ISSUE_KINDS
+from libs.dataset_query import DatasetQuery
+
+ANY = "(any)"
+NONE = "(none)"
+
+
+def _optional_spin_box(maximum):
+    """Spin box whose lowest value, 0, reads as "off"."""
+    spin = QSpinBox()
+    spin.setRange(0, maximum)
+    spin.setSpecialValueText("off")
+    return spin
+
+
+class QueryDialog(QDialog):
+    """Builds a DatasetQuery from a form; the result becomes the file list."""
+
+    def __init__(self, parent, class_names):
+        super().__init__(parent)
+        self.setWindowTitle("Find Images")
+
+        self.box_class = QComboBox()
+        self.box_class.addItems([ANY] + list(class_names))
+        self.smaller_than = _optional_spin_box(100000)
+        self.smaller_than.setSuffix(" px")
+        self.larger_than = _optional_spin_box(100000)
+        self.larger_than.setSuffix(" px")
+        self.without_class = QComboBox()
+        self.without_class.addItems([NONE] + list(class_names))
+        self.min_boxes = _optional_spin_box(1000000)
+        # -1 is "off" here, so that 0 can select images without boxes.
+        self.max_boxes = QSpinBox()
+        self.max_boxes.setRange(-1, 1000000)
+        self.max_boxes.setValue(-1)
+        self.max_boxes.setSpecialValueText("off")
+        self.verified = QComboBox()
+        self.verified.addItems(["Any", "Verified", "Unverified"])
+        self.issue = QComboBox()
+        self.issue.addItems([NONE, ANY] + [kind.replace("_", " ") for kind in ISSUE_KINDS])
+
+        form = QFormLayout()
+        form.addRow("Has a box of class", self.box_class)
+        form.addRow("  with its smaller side below", self.smaller_than)
+        form.addRow("  with its smaller side above", self.larger_than)
+        form.addRow("Has no box of class", self.without_class)
+        form.addRow("At least boxes", self.min_boxes)
+        form.addRow("At most boxes", self.max_boxes)
+        form.addRow("Verified", self.verified)
+        form.addRow("Box check issue", self.issue)
+
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(
+            QLabel("Show only the images matching all of the following.")
+        )
+        layout.addLayout(form)
+        layout.addWidget(buttons)
+
+    def query(self):
+        query = DatasetQuery()
+        box_class = self.box_class.currentText()
+        smaller_than = self.smaller_than.value() or None
+        larger_than = self.larger_than.value() or None
+        if box_class != ANY or smaller_than or larger_than:
+            query.with_box(
+                None if box_class == ANY else box_class, smaller_than, larger_than
+            )
+        if self.without_class.currentText() != NONE:
+            query.without_class(self.without_class.currentText())
+        maximum = self.max_boxes.value()
+        query.box_count(self.min_boxes.value() or None, None if maximum < 0 else maximum)
+        if self.verified.currentIndex():
+            query.verified(self.verified.currentIndex() == 1)
+        issue = self.issue.currentIndex()
+        if issue:
+            query.has_issue(None if issue == 1 else ISSUE_KINDS[issue - 2])
+        return query
@@ -0,0 +1,310 @@
+"""
+Images read from an S3-compatible object store (AWS, MinIO, ...).
+
+    s3://bucket/datasets/cars/0001.jpg
+
+Needs boto3, which is optional: without it s3:// paths cannot be opened.
+The endpoint comes from AWS_ENDPOINT_URL and the credentials from the
+usual AWS variables and files.
+
+- One client is shared by all threads; its connection pool is sized to
+  the number of concurrent requests.
+- Objects larger than part_size are fetched as concurrent ranged GETs,
+  each pinned with If-Match to the listed ETag, so parts of two versions
+  of an object are never joined.
+- read_ahead() fetches the next images of the file list into the cache
+  in the background while the current one is being annotated.
+- Fetched objects are kept in a local disk cache, keyed by bucket, key
+  and ETag so a changed object is fetched again, and trimmed oldest
+  first to cache_bytes.
+
+Annotations and the project database go to a local project directory,
+like the sidecar directory of an archive. Unlike the cache, they are the
+user's work, so they live under the user data directory
+(LABELIMG_DATA_DIR, else $XDG_DATA_HOME/labelImg or
+~/.local/share/labelImg).
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from libs.atomic_io import atomic_write
+from libs.storage import Storage
+
+try:
+    import boto3
+    from botocore.config import Config
+except ImportError:
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = "LABELIMG_CACHE_DIR"
+DATA_DIR_ENV = "LABELIMG_DATA_DIR"
+PART_SIZE = 8 << 20
+MAX_WORKERS = 8
+READ_AHEAD = 4
+CACHE_BYTES = 2 << 30
+
+
+def default_cache_dir():
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.path.expanduser("~"), ".cache", "labelImg"
+    )
+
+
+def default_data_dir():
+    if os.environ.get(DATA_DIR_ENV):
+        return os.environ[DATA_DIR_ENV]
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(data_home, "labelImg")
+
+
+def open_s3(bucket):
+    if boto3 is None:
+        raise RuntimeError("Reading s3:// paths needs boto3 (pip install boto3)")
+    client = boto3.session.Session().client(
+        "s3",
+        endpoint_url=os.environ.get("AWS_ENDPOINT_URL") or None,
+        config=Config(max_pool_connections=MAX_WORKERS + READ_AHEAD),
+    )
+    return S3Storage(bucket, client)
+
+
+class S3Storage(Storage):
+
+    def __init__(
+        self,
+        bucket,
+        client,
+        cache_dir=None,
+        data_dir=None,
+        part_size=PART_SIZE,
+        max_workers=MAX_WORKERS,
+        read_ahead=READ_AHEAD,
+        cache_bytes=CACHE_BYTES,
+    ):
+        # client: a boto3 S3 client, or anything with its list_objects_v2,
+        # head_object and get_object.
+        self.bucket = bucket
+        self.client = client
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.data_dir = data_dir or default_data_dir()
+        self.part_size = part_size
+        self.read_ahead_count = read_ahead
+        self.cache_bytes = cache_bytes
+        self._prefix = "s3://%s/" % bucket
+        self._objects_dir = os.path.join(self.cache_dir, "objects", bucket)
+        self._lock = threading.Lock()
+        # key -> (size, etag), from listings and HEAD requests
+        self._objects = {}
+        # key -> Future of a read-ahead fetch
+        self._pending = {}
+        self._cached_bytes = None
+        # Ranged parts and read-ahead jobs use separate pools, so a job
+        # waiting for its parts never starves them.
+        self._parts = ThreadPoolExecutor(max_workers, thread_name_prefix="S3Part")
+        self._ahead = ThreadPoolExecutor(
+            max(1, read_ahead), thread_name_prefix="S3ReadAhead"
+        )
+
+    # Paths
+
+    def key(self, path):
+        if not path.startswith(self._prefix):
+            raise ValueError("%s is not in bucket %s" % (path, self.bucket))
+        return path[len(self._prefix) :]
+
+    def path(self, key):
+        return self._prefix + key
+
+    def _root_key(self, root):
+        """Key prefix of an opened root, "" or ending in a slash."""
+        root = root.rstrip("/") + "/"
+        return "" if root == self._prefix else self.key(root)
+
+    # Storage interface
+
+    def scan_images(self, root, extensions):
+        images = []
+        kwargs = {"Bucket": self.bucket, "Prefix": self._root_key(root)}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            with self._lock:
+                for item in page.get("Contents", ()):
+                    self._objects[item["Key"]] = (item["Size"], item.get("ETag", ""))
+                    if item["Key"].lower().endswith(extensions):
+                        images.append(self.path(item["Key"]))
+            if not page.get("IsTruncated"):
+                return images
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def exists(self, path):
+        try:
+            self._stat(self.key(path))
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def read_bytes(self, path):
+        key = self.key(path)
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            return pending.result()
+        return self._fetch(key)
+
+    def read_ahead(self, paths):
+        for path in list(paths)[: self.read_ahead_count]:
+            try:
+                key = self.key(path)
+            except ValueError:
+                continue
+            with self._lock:
+                if key in self._pending:
+                    continue
+                size_etag = self._objects.get(key)
+                if size_etag is not None and os.path.exists(self._cache_path(key, size_etag)):
+                    continue
+                future = self._pending[key] = self._ahead.submit(self._fetch, key)
+            future.add_done_callback(lambda _future, key=key: self._done(key))
+
+    def stat(self, path):
+        size, etag = self._stat(self.key(path))
+        # An INTEGER column holds the version: 63 bits of the ETag's digest.
+        digest = hashlib.sha1(etag.encode("utf-8")).digest()
+        return size, int.from_bytes(digest[:8], "big") >> 1
+
+    def project_dir(self, root):
+        parts = [part for part in self._root_key(root).split("/") if part]
+        return os.path.join(self.data_dir, "projects", self.bucket, *parts)
+
+    def close(self):
+        self._ahead.shutdown(wait=True)
+        self._parts.shutdown(wait=True)
+
+    # Internals
+
+    def _done(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _stat(self, key):
+        """(size, etag) of key; raises KeyError when there is no such object."""
+        with self._lock:
+            found = self._objects.get(key)
+        if found is not None:
+            return found
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            raise KeyError(key) from e
+        found = (head["ContentLength"], head.get("ETag", ""))
+        with self._lock:
+            self._objects[key] = found
+        return found
+
+    def _cache_path(self, key, size_etag):
+        digest = hashlib.sha1(("%s\0%s" % (key, size_etag[1])).encode("utf-8"))
+        return os.path.join(self._objects_dir, digest.hexdigest())
+
+    def _fetch(self, key, retry=True):
+        size_etag = self._stat(key)
+        cache_path = self._cache_path(key, size_etag)
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+            if len(data) == size_etag[0]:
+                os.utime(cache_path)  # most recently used
+                return data
+        except OSError:
+            pass
+
+        size, etag = size_etag
+        try:
+            if size <= self.part_size:
+                data = self._get(key, etag)
+            else:
+                ranges = [
+                    (start, min(start + self.part_size, size) - 1)
+                    for start in range(0, size, self.part_size)
+                ]
+                parts = [self._parts.submit(self._get, key, etag, r) for r in ranges]
+                data = b"".join(part.result() for part in parts)
+        except _Changed:
+            # Replaced since it was listed: look it up again, once.
+            with self._lock:
+                self._objects.pop(key, None)
+            if not retry:
+                raise OSError("s3://%s/%s keeps changing" % (self.bucket, key))
+            return self._fetch(key, retry=False)
+        self._store(cache_path, data)
+        return data
+
+    def _get(self, key, etag, byte_range=None):
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if etag:
+            kwargs["IfMatch"] = etag
+        if byte_range is not None:
+            kwargs["Range"] = "bytes=%d-%d" % byte_range
+        try:
+            body = self.client.get_object(**kwargs)["Body"]
+            try:
+                return body.read()
+            finally:
+                body.close()
+        except OSError:
+            raise
+        except Exception as e:
+            # botocore's errors, which cannot be named without boto3
+            error = getattr(e, "response", None) or {}
+            if error.get("Error", {}).get("Code") in ("PreconditionFailed", "412"):
+                raise _Changed(key) from e
+            raise OSError("Could not read s3://%s/%s: %s" % (self.bucket, key, e)) from e
+
+    def _store(self, cache_path, data):
+        try:
+            os.makedirs(self._objects_dir, exist_ok=True)
+            atomic_write(cache_path, data)
+        except OSError as e:
+            logger.warning("Could not cache %s: %s", cache_path, e)
+            return
+        with self._lock:
+            if self._cached_bytes is None:
+                self._cached_bytes = sum(size for _, size, _ in self._cache_entries())
+            else:
+                self._cached_bytes += len(data)
+            if self._cached_bytes > self.cache_bytes:
+                self._trim()
+
+    def _cache_entries(self):
+        """(mtime, size, path) of the cached objects."""
+        entries = []
+        with os.scandir(self._objects_dir) as found:
+            for entry in found:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _trim(self):
+        """Drop the least recently used objects down to 90% of cache_bytes."""
+        entries = sorted(self._cache_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.cache_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._cached_bytes = total
+
+
+class _Changed(Exception):
+    """The object no longer has the ETag it was listed with."""
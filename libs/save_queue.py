@@ -0,0 +1,118 @@
+"""
+Background writer for annotation files.
+
+The GUI hands over a plain-data snapshot of the annotations and moves on;
+a single daemon thread performs the writes in submission order. A save
+still waiting in the queue is replaced by a newer one for the same
+annotation and image, so rapid navigation writes each file once. Readers
+of an annotation file call wait() with its path first, which only blocks
+while a save of that file is queued or running. A save that failed is
+kept until retry_failed() queues it again or a newer save replaces it.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from libs import perf
+
+logger = logging.getLogger(__name__)
+
+
+class SaveQueue(object):
+
+    def __init__(self, on_done=None):
+        # on_done(annotation_path, image_path, error) is called on the writer
+        # thread after every save; error is None on success.
+        self.on_done = on_done
+        self._cond = threading.Condition()
+        # (annotation_path, image_path) -> (fn, args), oldest first. CreateML
+        # keeps every image of a folder in one file, so the image is part of
+        # the key and only a save of the same image is superseded.
+        self._jobs = OrderedDict()
+        # Saves that raised, by the same key.
+        self._failed = OrderedDict()
+        self._running = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="SaveQueue", daemon=True)
+        self._thread.start()
+
+    def submit(self, annotation_path, image_path, fn, *args):
+        """Queue fn(*args) as the save of annotation_path for image_path."""
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("SaveQueue is closed")
+            self._jobs[(annotation_path, image_path)] = (fn, args)
+            self._failed.pop((annotation_path, image_path), None)
+            self._cond.notify_all()
+
+    def failed(self):
+        """(annotation_path, image_path) of the saves that failed, oldest first."""
+        with self._cond:
+            return list(self._failed)
+
+    def drop_failed(self, annotation_path, image_path):
+        """Forget a failed save, to be redone by the caller; False if none."""
+        with self._cond:
+            return self._failed.pop((annotation_path, image_path), None) is not None
+
+    def retry_failed(self):
+        """Queue the failed saves again; returns how many."""
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("SaveQueue is closed")
+            failed, self._failed = self._failed, OrderedDict()
+            for key, job in failed.items():
+                self._jobs.setdefault(key, job)
+            self._cond.notify_all()
+            return len(failed)
+
+    def pending(self, *annotation_paths):
+        """True while a save of any of the paths (of anything, if none) is queued or running."""
+        with self._cond:
+            return self._busy(annotation_paths)
+
+    def wait(self, *annotation_paths):
+        """Block until the given annotation paths, or all of them, are written."""
+        with self._cond:
+            while self._busy(annotation_paths):
+                self._cond.wait()
+
+    def close(self):
+        """Write everything queued, then stop the thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _busy(self, annotation_paths):
+        keys = list(self._jobs)
+        if self._running is not None:
+            keys.append(self._running)
+        if not annotation_paths:
+            return bool(keys)
+        return any(key[0] in annotation_paths for key in keys)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs and not self._stopped:
+                    self._cond.wait()
+                if not self._jobs:
+                    return
+                key, (fn, args) = self._jobs.popitem(last=False)
+                self._running = key
+            error = None
+            try:
+                # The time of the write itself, as for a save on the GUI thread.
+                with perf.span("save_labels"):
+                    fn(*args)
+            except Exception as e:
+                error = e
+                logger.error("Saving %s failed: %s", key[0], e)
+            with self._cond:
+                self._running = None
+                if error is not None and key not in self._jobs:
+                    self._failed[key] = (fn, args)
+                self._cond.notify_all()
+            if self.on_done is not None:
+                self.on_done(key[0], key[1], error)
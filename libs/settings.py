@@ -1,16 +1,29 @@
+import logging
 import os
 import pickle
+import threading
+
+from libs.atomic_io import atomic_write
+
+logger = logging.getLogger(__name__)
 
 
 class Settings(object):
-    def __init__(self):
+    def __init__(self, save_delay=2.0):
         # Be default, the home will be in the same folder as labelImg
         home = os.path.expanduser("~")
         self.data = {}
         self.path = os.path.join(home, ".labelImgSettings.pkl")
+        # save_later() coalesces every change made within this many seconds
+        # into a single write.
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._timer = None
 
     def __setitem__(self, key, value):
-        self.data[key] = value
+        with self._lock:
+            self.data[key] = value
 
     def __getitem__(self, key):
         return self.data[key]
@@ -21,11 +34,37 @@ class Settings(object):
         return default
 
     def save(self):
-        if self.path:
-            with open(self.path, "wb") as f:
-                pickle.dump(self.data, f, pickle.HIGHEST_PROTOCOL)
-                return True
-        return False
+        """Write the settings now, replacing the file atomically."""
+        self._cancel_pending()
+        if not self.path:
+            return False
+        with self._write_lock:
+            with self._lock:
+                payload = pickle.dumps(self.data, pickle.HIGHEST_PROTOCOL)
+            atomic_write(self.path, payload)
+        return True
+
+    def save_later(self):
+        """Schedule a save in the background, merged with any pending one."""
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self._flush_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_pending(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.save()
+        except OSError:
+            logger.warning("Saving setting failed", exc_info=True)
+
+    def _cancel_pending(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
 
     def load(self):
         try:
@@ -34,11 +73,12 @@ class Settings(object):
                     self.data = pickle.load(f)
                     return True
         except Exception:
-            print("Loading setting failed")
+            logger.warning("Loading setting failed", exc_info=True)
         return False
 
     def reset(self):
+        self._cancel_pending()
         if os.path.exists(self.path):
             os.remove(self.path)
-            print(f"Remove setting pkl file ${self.path}")
+            logger.info("Remove setting pkl file %s", self.path)
         self.data = {}
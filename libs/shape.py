@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 
+from PyQt6.QtCore import QPointF
 from PyQt6.QtGui import QColor, QPen, QPainterPath, QFont
 
 
-from libs.utils import distance
+from libs.utils import distance, generate_color_by_text
 import sys
 import uuid
 import json
@@ -70,6 +71,18 @@ class Shape(object):
             # Colors are transient usually, but can be saved if needed
         }
 
+    @classmethod
+    def from_data(cls, data):
+        """Rebuild a closed shape from to_data() output."""
+        shape = cls(label=data["label"], difficult=data.get("difficult", False))
+        shape.points = [QPointF(x, y) for x, y in data["points"]]
+        shape.close()
+        if shape.label:
+            shape.line_color = generate_color_by_text(shape.label)
+            shape.fill_color = generate_color_by_text(shape.label)
+        shape.uuid = data["uuid"]
+        return shape
+
     def close(self):
         self._closed = True
 
@@ -0,0 +1,96 @@
+"""
+Startup profiling for ``labelImg --profile-startup``.
+
+The application is started again in a child interpreter running with
+``-X importtime``. The child quits as soon as its main window is shown, and
+the parent prints a summary of the import log: totals, time per top-level
+package, and the slowest imports.
+"""
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+PROFILE_FLAG = "--profile-startup"
+# Set in the child; labelImg.main() quits once the window is up.
+EXIT_AFTER_STARTUP_ENV = "LABELIMG_EXIT_AFTER_STARTUP"
+# Optional budget in milliseconds for the total import time, for CI.
+STARTUP_BUDGET_ENV = "LABELIMG_STARTUP_BUDGET_MS"
+
+
+def parse_importtime(text):
+    """
+    Returns (module, self_us, cumulative_us, depth) tuples from the stderr
+    of ``python -X importtime``, in the order they were logged.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # the header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 3) // 2
+        entries.append((name.strip(), self_us, cumulative_us, depth))
+    return entries
+
+
+def summarize(entries, top=20):
+    """Returns the report for parse_importtime() entries as a list of lines."""
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        by_package[name.split(".")[0]] += self_us
+
+    lines = [f"Imports: {len(entries)} modules, {total_us / 1000:.1f} ms", ""]
+    lines.append("Self time by top-level package:")
+    for package, self_us in sorted(by_package.items(), key=lambda i: -i[1])[:top]:
+        lines.append(f"  {self_us / 1000:9.1f} ms  {package}")
+    lines.append("")
+    lines.append("Slowest imports (cumulative):")
+    slowest = sorted(entries, key=lambda e: -e[2])[:top]
+    for name, _, cumulative_us, _ in slowest:
+        lines.append(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+    return lines
+
+
+def profile_startup(argv, stream=None):
+    """
+    Starts labelImg with argv minus the profiling flag under ``-X importtime``
+    and prints the breakdown. Returns a process exit code, non-zero when the
+    child failed or the import time exceeds LABELIMG_STARTUP_BUDGET_MS.
+    """
+    stream = stream or sys.stdout
+    script = os.path.join(os.path.dirname(os.path.dirname(__file__)), "labelImg.py")
+    args = [arg for arg in argv[1:] if arg != PROFILE_FLAG]
+    env = dict(os.environ, **{EXIT_AFTER_STARTUP_ENV: "1"})
+
+    start = time.perf_counter()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", script] + args,
+        env=env,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    entries = parse_importtime(child.stderr)
+    print(f"Startup: {wall_ms:.0f} ms wall clock to the main window", file=stream)
+    for line in summarize(entries):
+        print(line, file=stream)
+    if child.returncode:
+        print(f"labelImg exited with status {child.returncode}", file=stream)
+        return child.returncode
+
+    budget = os.environ.get(STARTUP_BUDGET_ENV)
+    import_ms = sum(self_us for _, self_us, _, _ in entries) / 1000
+    if budget and import_ms > float(budget):
+        print(f"Import time {import_ms:.0f} ms is over the {budget} ms budget", file=stream)
+        return 1
+    return 0
@@ -15,9 +15,11 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QSize, QTimer
 from PyQt6.QtGui import QColor, QBrush
-from libs.database import Class, Image, Annotation
-from sqlalchemy import func
+from libs.database import class_counts, project_stats
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class StatCard(QFrame):
@@ -189,10 +191,12 @@ class StatisticsDialog(QDialog):
         self.summary_layout = QHBoxLayout()
         self.card_images = StatCard("Total Images", 0, "#3498db")
         self.card_annots = StatCard("Annotations", 0, "#2ecc71")
+        self.card_verified = StatCard("Verified", 0, "#9b59b6")
         self.card_classes = StatCard("Classes", 0, "#f1c40f")
 
         self.summary_layout.addWidget(self.card_images)
         self.summary_layout.addWidget(self.card_annots)
+        self.summary_layout.addWidget(self.card_verified)
         self.summary_layout.addWidget(self.card_classes)
         self.summary_layout.addStretch()
 
@@ -253,20 +257,19 @@ class StatisticsDialog(QDialog):
             return
 
         try:
-            total_images = self.db_session.query(Image).count()
-            total_annotations = self.db_session.query(Annotation).count()
+            # Served from the trigger-maintained aggregates, so the cost does
+            # not depend on the size of the project.
+            stats = project_stats(self.db_session)
+            total_images = stats.images if stats else 0
+            total_annotations = stats.annotations if stats else 0
+            verified_images = stats.verified_images if stats else 0
 
             # Group by class
-            results = (
-                self.db_session.query(Class.name, func.count(Annotation.id))
-                .join(Annotation, Class.id == Annotation.class_id)
-                .group_by(Class.name)
-                .order_by(func.count(Annotation.id).desc())
-                .all()
-            )
+            results = class_counts(self.db_session).all()
 
             self.card_images.update_value(total_images)
             self.card_annots.update_value(total_annotations)
+            self.card_verified.update_value(verified_images)
             self.card_classes.update_value(len(results))
 
             self.table.setRowCount(len(results))
@@ -315,6 +318,7 @@ class StatisticsDialog(QDialog):
                 # Feedback effects
                 self.card_images.pulse()
                 self.card_annots.pulse()
+                self.card_verified.pulse()
                 self.card_classes.pulse()
                 self.last_sync_label.setText(
                     f"Last update: {datetime.now().strftime('%H:%M:%S')}"
@@ -346,4 +350,4 @@ class StatisticsDialog(QDialog):
             if sb:
                 sb.showMessage(text, 5000)
         else:
-            print(f"Stats Engine: {text}")
+            logger.info("Stats Engine: %s", text)
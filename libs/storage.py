@@ -0,0 +1,235 @@
+"""
+Where image files are read from.
+
+Image paths stay plain strings throughout labelImg. A path names a local
+file, a member of a dataset archive (the archive file followed by the
+member name, ``/data/set.zip/images/0001.jpg``), or an object in a store
+registered by URL scheme (``s3://bucket/images/0001.jpg``).
+storage_for() returns the provider serving a path and read_image()
+decodes through it (image_reader() for just the header or a scaled
+decode); root_storage() lists the images of an opened
+directory, archive or URL.
+
+Archives and object stores are never written: their annotations, project
+database and indexes live in a local project directory, see
+project_dir(). Providers for more schemes plug in with register_scheme().
+"""
+import os
+
+ARCHIVE_EXTS = (".zip", ".tar")
+SIDECAR_SUFFIX = ".labels"
+
+
+class Storage(object):
+    """Provider interface; paths are full paths as listed by scan_images()."""
+
+    def scan_images(self, root, extensions):
+        """Paths of the images under root ending in one of extensions."""
+        raise NotImplementedError
+
+    def exists(self, path):
+        raise NotImplementedError
+
+    def read_bytes(self, path):
+        raise NotImplementedError
+
+    def stat(self, path):
+        """
+        (size, version) of path, version changing whenever its content
+        does; raises KeyError or OSError when path cannot be read.
+        """
+        raise NotImplementedError
+
+    def read_ahead(self, paths):
+        """Hint that paths are about to be read, in this order."""
+
+    def project_dir(self, root):
+        """Local directory for the database and annotations of root."""
+        return root
+
+    def close(self):
+        pass
+
+
+class LocalStorage(Storage):
+    """Plain files."""
+
+    def scan_images(self, root, extensions):
+        images = []
+        for directory, _dirs, files in os.walk(root):
+            for name in files:
+                if name.lower().endswith(extensions):
+                    images.append(os.path.abspath(os.path.join(directory, name)))
+        return images
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def read_bytes(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def stat(self, path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+
+def _open_s3(bucket):
+    from libs.s3_storage import open_s3
+
+    return open_s3(bucket)
+
+
+LOCAL = LocalStorage()
+# URL scheme -> factory(bucket or host) returning a Storage
+_schemes = {"s3": _open_s3}
+# archive path or (scheme, bucket) -> provider, opened once per session
+_archives = {}
+_remotes = {}
+
+
+def register_scheme(scheme, factory):
+    """Serve scheme://name/... paths from factory(name)."""
+    _schemes[scheme] = factory
+
+
+def split_url(path):
+    """(scheme, bucket, key) of a registered URL, or None."""
+    scheme, separator, rest = path.partition("://")
+    if not separator or scheme not in _schemes:
+        return None
+    bucket, _, key = rest.partition("/")
+    return scheme, bucket, key
+
+
+def is_remote(path):
+    return split_url(path) is not None
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTS) and os.path.isfile(path)
+
+
+def is_dataset_root(path):
+    """Whether path can be opened like a directory of images."""
+    return os.path.isdir(path) or is_archive(path) or is_remote(path)
+
+
+def is_local(path):
+    return storage_for(path) is LOCAL
+
+
+def absolute(path):
+    return path if is_remote(path) else os.path.abspath(path)
+
+
+def sidecar_dir(archive_path):
+    """Directory holding the annotations and index of archive_path."""
+    return archive_path + SIDECAR_SUFFIX
+
+
+def project_dir(root):
+    """Where the database and annotations of an opened root go."""
+    if is_archive(root):
+        return sidecar_dir(root)
+    return root_storage(root).project_dir(root)
+
+
+def open_archive(archive_path):
+    archive_path = os.path.abspath(archive_path)
+    storage = _archives.get(archive_path)
+    if storage is None:
+        from libs.archive_storage import ArchiveStorage
+
+        storage = _archives[archive_path] = ArchiveStorage(
+            archive_path, sidecar_dir(archive_path)
+        )
+    return storage
+
+
+def open_remote(scheme, bucket):
+    storage = _remotes.get((scheme, bucket))
+    if storage is None:
+        storage = _remotes[(scheme, bucket)] = _schemes[scheme](bucket)
+    return storage
+
+
+def archive_of(path):
+    """The archive path points into, or None for a plain path."""
+    lowered = path.lower()
+    for ext in ARCHIVE_EXTS:
+        start = 0
+        while True:
+            position = lowered.find(ext + os.sep, start)
+            if position < 0:
+                break
+            archive = path[: position + len(ext)]
+            if archive in _archives or os.path.isfile(archive):
+                return archive
+            start = position + 1
+    return None
+
+
+def storage_for(path):
+    url = split_url(path)
+    if url is not None:
+        return open_remote(url[0], url[1])
+    archive = archive_of(path)
+    if archive is None:
+        return LOCAL
+    return open_archive(archive)
+
+
+def root_storage(root):
+    """Provider listing the images of an opened directory, archive or URL."""
+    if is_archive(root):
+        return open_archive(root)
+    return storage_for(root)
+
+
+def exists(path):
+    return storage_for(path).exists(path)
+
+
+def close_all():
+    for storage in list(_archives.values()) + list(_remotes.values()):
+        storage.close()
+    _archives.clear()
+    _remotes.clear()
+
+
+def stat(path):
+    """(size, version) of path, see Storage.stat()."""
+    return storage_for(path).stat(path)
+
+
+def image_reader(path):
+    """QImageReader of path, or None when it cannot be read."""
+    from PyQt6.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt6.QtGui import QImageReader
+
+    storage = storage_for(path)
+    if storage is LOCAL:
+        reader = QImageReader(path)
+    else:
+        try:
+            data = storage.read_bytes(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        buffer = QBuffer()
+        buffer.setData(QByteArray(data))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        reader = QImageReader(buffer, os.path.splitext(path)[1][1:].encode())
+        reader.setDecideFormatFromContent(True)
+        # The reader keeps no reference of its own.
+        reader.buffer = buffer
+    reader.setAutoTransform(True)
+    return reader
+
+
+def read_image(path):
+    """QImage of path, null when it cannot be read."""
+    from PyQt6.QtGui import QImage
+
+    reader = image_reader(path)
+    return QImage() if reader is None else reader.read()
@@ -5,6 +5,7 @@ if items were added in files in the resources/strings folder,
 then execute "pyrcc5 resources.qrc -o resources.py" in the root directory
 and execute "pyrcc5 ../resources.qrc -o resources.py" in the libs directory
 """
+import logging
 import re
 import os
 import sys
@@ -12,6 +13,8 @@ import locale
 
 from PyQt6.QtCore import QFile, QIODevice, QTextStream, QStringConverter
 
+logger = logging.getLogger(__name__)
+
 
 class StringBundle:
 
@@ -36,7 +39,7 @@ class StringBundle:
                     else os.getenv("LANG")
                 )
             except Exception:
-                print("Invalid locale")
+                logger.warning("Invalid locale")
                 locale_str = "en"
 
         return StringBundle(cls.__create_key, locale_str)
@@ -0,0 +1,203 @@
+import json
+import logging
+import queue
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from libs.database import Image, UndoHistory, UndoSnapshot
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_FLUSH = object()
+
+# Commands kept per image; older ones are compacted away when the image is
+# left, which bounds how much has to be replayed when it is reopened.
+MAX_REPLAY_DEPTH = 500
+
+
+def open_journal(db_session):
+    """Journal writing to the database of db_session with its own sessions."""
+    return UndoJournal(sessionmaker(bind=db_session.get_bind()))
+
+
+class UndoJournal:
+    """
+    Write-behind log of undo commands.
+
+    Entries are queued from the GUI thread and a daemon thread writes them
+    with its own session, committing whatever arrived within
+    flush_interval as one transaction. Commands are keyed by image and
+    shape uuid; a snapshot of the shapes is stored whenever an image is
+    left so the log can be replayed when it is opened again.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size=256,
+        flush_interval=0.5,
+        max_pending=10000,
+        max_rows=50000,
+        max_depth=MAX_REPLAY_DEPTH,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Keep at most this many rows in undo_history, None for no limit.
+        self.max_rows = max_rows
+        self.max_depth = max_depth
+        self.dropped = 0
+        self._image_ids = {}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(
+            target=self._run, name="UndoJournal", daemon=True
+        )
+        self._thread.start()
+
+    def log(self, action_type, details, image_path=None, shape_uuid=None):
+        self._put(("log", image_path, action_type, shape_uuid, json.dumps(details)))
+
+    def snapshot(self, image_path, shapes_data):
+        self._put(("snapshot", image_path, json.dumps(shapes_data)))
+
+    def discard(self, image_path):
+        self._put(("discard", image_path))
+
+    def _put(self, entry):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # Never block the GUI on the journal; losing history is acceptable.
+            self.dropped += 1
+
+    def flush(self):
+        """Block until everything logged so far is committed."""
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def read_snapshot(self, session, image_path):
+        """The shapes data stored when image_path was last left, or None."""
+        shapes = (
+            session.query(UndoSnapshot.shapes)
+            .join(Image, Image.id == UndoSnapshot.image_id)
+            .filter(Image.path == image_path)
+            .scalar()
+        )
+        return json.loads(shapes) if shapes else None
+
+    def read_history(self, session, image_path):
+        """The newest max_depth (action_type, details) rows, oldest first."""
+        self.flush()
+        records = (
+            session.query(UndoHistory.action_type, UndoHistory.details)
+            .join(Image, Image.id == UndoHistory.image_id)
+            .filter(Image.path == image_path)
+            .order_by(UndoHistory.id.desc())
+            .limit(self.max_depth)
+            .all()
+        )
+        records.reverse()
+        return records
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while batch[-1] not in (_STOP, _FLUSH) and len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        session = self.session_factory()
+        try:
+            while True:
+                batch = self._next_batch()
+                entries = [entry for entry in batch if entry not in (_STOP, _FLUSH)]
+                try:
+                    if entries:
+                        self._write(session, entries)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if batch[-1] is _STOP:
+                    return
+        finally:
+            session.close()
+
+    def _write(self, session, entries):
+        try:
+            for entry in entries:
+                op, image_path = entry[0], entry[1]
+                image_id = self._image_id(session, image_path)
+                if image_id is None and image_path is not None:
+                    # Not ingested yet; history is best effort.
+                    logger.debug("No image row for %s, undo entry dropped", image_path)
+                    continue
+                if op == "log":
+                    _, _, action_type, shape_uuid, details = entry
+                    session.add(
+                        UndoHistory(
+                            action_type=action_type,
+                            details=details,
+                            image_id=image_id,
+                            shape_uuid=shape_uuid,
+                        )
+                    )
+                elif op == "snapshot":
+                    session.merge(UndoSnapshot(image_id=image_id, shapes=entry[2]))
+                    self._compact(session, image_id)
+                elif op == "discard":
+                    session.query(UndoHistory).filter_by(image_id=image_id).delete()
+                    session.query(UndoSnapshot).filter_by(image_id=image_id).delete()
+            if self.max_rows:
+                session.flush()
+                session.execute(
+                    text(
+                        "DELETE FROM undo_history WHERE id <= ("
+                        "SELECT id FROM undo_history ORDER BY id DESC "
+                        "LIMIT 1 OFFSET :max_rows)"
+                    ),
+                    {"max_rows": self.max_rows},
+                )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self._image_ids.clear()
+            logger.error("Failed to log undo history: %s", e)
+
+    def _image_id(self, session, image_path):
+        """
+        Row id of image_path, or None when it has not been ingested yet.
+        Image rows belong to ingestion, which reads the annotation file of
+        an image only when it creates its row.
+        """
+        if image_path is None:
+            return None
+        image_id = self._image_ids.get(image_path)
+        if image_id is None:
+            image_id = session.query(Image.id).filter_by(path=image_path).scalar()
+            if image_id is not None:
+                self._image_ids[image_path] = image_id
+        return image_id
+
+    def _compact(self, session, image_id):
+        session.flush()
+        session.execute(
+            text(
+                "DELETE FROM undo_history WHERE image_id = :image_id AND id <= ("
+                "SELECT id FROM undo_history WHERE image_id = :image_id "
+                "ORDER BY id DESC LIMIT 1 OFFSET :max_depth)"
+            ),
+            {"image_id": image_id, "max_depth": self.max_depth},
+        )
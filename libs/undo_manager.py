@@ -1,44 +1,127 @@
 from PyQt6.QtGui import QUndoCommand, QUndoStack
-from PyQt6.QtCore import QObject
+from PyQt6.QtCore import QObject, QPointF
+from collections import OrderedDict
 import json
-from libs.database import UndoHistory
+import logging
+from libs.shape import Shape
+from libs.utils import generate_color_by_text
+
+logger = logging.getLogger(__name__)
 
 
 class UndoManager:
-    def __init__(self, db_session=None):
+    def __init__(self, db_session=None, log_history=True):
         self.stack = QUndoStack()
-        self.db_session = db_session
+        self.db_session = None
+        self.journal = None
+        self.log_history = log_history
+        self.canvas = None
+        self.image_path = None
+        # The current image has logged history that is not on the stack yet.
+        self._pending_history = False
+        self._snapshots = OrderedDict()
+        self.set_db_session(db_session)
 
     def set_db_session(self, db_session):
+        if db_session is self.db_session:
+            return
+        self.close()
         self.db_session = db_session
+        self._snapshots.clear()
+        self._open_journal()
+
+    def set_log_history(self, enabled):
+        self.log_history = enabled
+        if enabled:
+            self._open_journal()
+        else:
+            self.close()
+
+    def _open_journal(self):
+        if self.journal is None and self.db_session and self.log_history:
+            # Imported here so SQLAlchemy is only loaded once a project is open.
+            from libs.undo_journal import open_journal
+
+            self.journal = open_journal(self.db_session)
+
+    def _log_to_db(self, action_type, details, shape_uuid=None):
+        if self.journal:
+            self.journal.log(action_type, details, self.image_path, shape_uuid)
+
+    def open_image(self, image_path, canvas):
+        """
+        Start the history of a freshly loaded image.
+
+        If the shapes on the canvas are the ones the image was last left
+        with, they take over the logged shape uuids and the logged commands
+        are put back on the stack the first time they are needed.
+        """
+        self.stack.clear()
+        self.canvas = canvas
+        self.image_path = image_path
+        self._pending_history = False
+        if not self.journal:
+            return
+        snapshot = self._load_snapshot(image_path)
+        if snapshot is None:
+            return
+        if adopt_snapshot(snapshot, canvas.shapes):
+            self._pending_history = True
+        else:
+            # The annotation changed outside of the logged commands.
+            self._snapshots.pop(image_path, None)
+            self.journal.discard(image_path)
+
+    def close_image(self, shapes):
+        """Snapshot the shapes the current image is left with."""
+        if self.journal and self.image_path:
+            if self._pending_history or self.stack.count():
+                data = [shape.to_data() for shape in shapes]
+                self._remember_snapshot(self.image_path, data)
+                self.journal.snapshot(self.image_path, data)
+        self.stack.clear()
+        self.image_path = None
+        self._pending_history = False
 
-    def _log_to_db(self, action_type, details):
-        if self.db_session:
-            try:
-                history = UndoHistory(
-                    action_type=action_type, details=json.dumps(details)
-                )
-                self.db_session.add(history)
-                self.db_session.commit()
-            except Exception as e:
-                print(f"Failed to log undo history: {e}")
+    def _remember_snapshot(self, image_path, data):
+        self._snapshots[image_path] = data
+        self._snapshots.move_to_end(image_path)
+        while len(self._snapshots) > 256:
+            self._snapshots.popitem(last=False)
+
+    def _load_snapshot(self, image_path):
+        if image_path in self._snapshots:
+            return self._snapshots[image_path]
+        return self.journal.read_snapshot(self.db_session, image_path)
+
+    def _hydrate(self):
+        if not self._pending_history:
+            return
+        self._pending_history = False
+        records = self.journal.read_history(self.db_session, self.image_path)
+        for command in rebuild_commands(self.canvas, records):
+            self.stack.push(command)
 
     def push(self, command):
-        print(f"UndoManager: Pushed command {command.text()}")
+        logger.debug("Pushed command %s", command.text())
+        self._hydrate()
         self.stack.push(command)
         if hasattr(command, "to_data"):
-            self._log_to_db(command.text(), command.to_data())
+            self._log_to_db(
+                command.action_type, command.to_data(), command.shape.uuid
+            )
 
     def undo(self):
-        print("UndoManager: Undo called")
+        logger.debug("Undo")
+        self._hydrate()
         self.stack.undo()
 
     def redo(self):
-        print("UndoManager: Redo called")
+        logger.debug("Redo")
         self.stack.redo()
 
     def can_undo(self):
-        return self.stack.canUndo()
+        return self._pending_history or self.stack.canUndo()
 
     def can_redo(self):
         return self.stack.canRedo()
@@ -46,85 +129,192 @@ class UndoManager:
     def clear(self):
         self.stack.clear()
 
+    def close(self):
+        """Flush and stop the history journal."""
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+
+def adopt_snapshot(snapshot, shapes, tolerance=1.5):
+    """
+    Give shapes the uuids of the snapshot if they describe the same boxes.
 
-# Abstract Command Classes or Concrete Commands
-# We can define them here or in a separate file.
-# For simplicity, let's look at what actions we need.
+    Saved annotations round coordinates, so points only have to agree
+    within tolerance pixels.
+    """
+    if len(snapshot) != len(shapes):
+        return False
+    for data, shape in zip(snapshot, shapes):
+        if data["label"] != shape.label or len(data["points"]) != len(shape.points):
+            return False
+        for (x, y), point in zip(data["points"], shape.points):
+            if abs(x - point.x()) > tolerance or abs(y - point.y()) > tolerance:
+                return False
+    for data, shape in zip(snapshot, shapes):
+        shape.uuid = data["uuid"]
+    return True
 
 
-class CreateShapeCommand(QUndoCommand):
-    def __init__(self, canvas, shape):
+def rebuild_commands(canvas, records):
+    """
+    Turn logged (action_type, details) rows, oldest first, into commands.
+
+    Shapes are resolved by uuid against the canvas, or recreated from the
+    most recent logged copy for shapes that no longer exist. Only the
+    suffix of the log that can be fully resolved is returned.
+    """
+    records = [(action_type, json.loads(details)) for action_type, details in records]
+    shapes_by_uuid = {shape.uuid: shape for shape in canvas.shapes}
+    for _, data in reversed(records):
+        if "uuid" in data and data["uuid"] not in shapes_by_uuid:
+            shapes_by_uuid[data["uuid"]] = Shape.from_data(data)
+
+    commands = []
+    for action_type, data in records:
+        command_type = COMMAND_TYPES.get(action_type)
+        command = command_type and command_type.from_data(canvas, shapes_by_uuid, data)
+        if command is None:
+            commands = []
+        else:
+            commands.append(command)
+    return commands
+
+
+class ShapeCommand(QUndoCommand):
+    """
+    Base for commands that are logged to the project history.
+
+    Commands rebuilt from the log describe changes that are already on the
+    canvas, so they are created with applied=True and the redo() run by
+    QUndoStack.push() is skipped once. Subclasses define apply() and
+    revert().
+    """
+
+    action_type = None
+
+    def __init__(self, canvas, shape, applied=False):
         super().__init__()
         self.canvas = canvas
         self.shape = shape
-        self.shape = shape
+        self.applied = applied
+
+    def redo(self):
+        if self.applied:
+            self.applied = False
+            return
+        self.apply()
+
+    def undo(self):
+        self.revert()
+
+
+class CreateShapeCommand(ShapeCommand):
+    action_type = "CREATE"
+
+    def __init__(self, canvas, shape, applied=False):
+        super().__init__(canvas, shape, applied)
         self.setText(f"Create Shape {shape.label}")
 
+    @classmethod
+    def from_data(cls, canvas, shapes_by_uuid, data):
+        return cls(canvas, shapes_by_uuid[data["uuid"]], applied=True)
+
     def to_data(self):
         return self.shape.to_data()
 
-    def redo(self):
+    def apply(self):
         # Initial create logic or restore shape
         if self.shape not in self.canvas.shapes:
             self.canvas.shapes.append(self.shape)
             self.canvas.repaint()
 
-    def undo(self):
+    def revert(self):
         if self.shape in self.canvas.shapes:
             self.canvas.shapes.remove(self.shape)
             self.canvas.repaint()
         # Also need to handle selection if it was selected
 
 
-class DeleteShapeCommand(QUndoCommand):
-    def __init__(self, canvas, shape):
-        super().__init__()
-        self.canvas = canvas
-        self.shape = shape
-        self.shape = shape
+class DeleteShapeCommand(ShapeCommand):
+    action_type = "DELETE"
+
+    def __init__(self, canvas, shape, applied=False):
+        super().__init__(canvas, shape, applied)
         self.setText(f"Delete Shape {shape.label}")
 
+    @classmethod
+    def from_data(cls, canvas, shapes_by_uuid, data):
+        return cls(canvas, shapes_by_uuid[data["uuid"]], applied=True)
+
     def to_data(self):
         return self.shape.to_data()
 
-    def redo(self):
+    def apply(self):
         if self.shape in self.canvas.shapes:
             self.canvas.shapes.remove(self.shape)
             self.canvas.selected_shape = None
             self.canvas.repaint()
 
-    def undo(self):
+    def revert(self):
         if self.shape not in self.canvas.shapes:
             self.canvas.shapes.append(self.shape)
             self.canvas.repaint()
 
 
-class EditLabelCommand(QUndoCommand):
-    def __init__(self, shape, old_label, new_label):
-        super().__init__()
-        self.shape = shape
+class EditLabelCommand(ShapeCommand):
+    action_type = "UPDATE_LABEL"
+
+    def __init__(self, canvas, shape, old_label, new_label, applied=False):
+        super().__init__(canvas, shape, applied)
         self.old_label = old_label
         self.new_label = new_label
         self.setText(f"Change Label from {old_label} to {new_label}")
 
-    def redo(self):
-        self.shape.label = self.new_label
-        # potentially update color?
+    @classmethod
+    def from_data(cls, canvas, shapes_by_uuid, data):
+        shape = shapes_by_uuid.get(data["shape_uuid"])
+        if shape is None:
+            return None
+        return cls(canvas, shape, data["old_label"], data["new_label"], applied=True)
 
-    def undo(self):
-        self.shape.label = self.old_label
+    def to_data(self):
+        return {
+            "shape_uuid": self.shape.uuid,
+            "old_label": self.old_label,
+            "new_label": self.new_label,
+        }
 
+    def set_label(self, label):
+        self.shape.label = label
+        self.shape.line_color = generate_color_by_text(label)
+        self.canvas.update()
 
-class MoveShapeCommand(QUndoCommand):
-    def __init__(self, canvas, shape, old_points, new_points):
-        super().__init__()
-        self.canvas = canvas
-        self.shape = shape
-        self.old_points = old_points
-        self.new_points = new_points
-        self.new_points = new_points
+    def apply(self):
+        self.set_label(self.new_label)
+
+    def revert(self):
+        self.set_label(self.old_label)
+
+
+class MoveShapeCommand(ShapeCommand):
+    action_type = "MOVE"
+
+    def __init__(self, canvas, shape, old_points, new_points, applied=False):
+        super().__init__(canvas, shape, applied)
+        self.old_points = list(old_points)
+        self.new_points = list(new_points)
         self.setText("Move/Edit Shape")
 
+    @classmethod
+    def from_data(cls, canvas, shapes_by_uuid, data):
+        shape = shapes_by_uuid.get(data["shape_uuid"])
+        if shape is None:
+            return None
+        old_points = [QPointF(x, y) for x, y in data["old_points"]]
+        new_points = [QPointF(x, y) for x, y in data["new_points"]]
+        return cls(canvas, shape, old_points, new_points, applied=True)
+
     def to_data(self):
         return {
             "shape_uuid": self.shape.uuid,
@@ -132,10 +322,21 @@ class MoveShapeCommand(QUndoCommand):
             "new_points": [(p.x(), p.y()) for p in self.new_points],
         }
 
-    def redo(self):
-        self.shape.points = self.new_points
+    def apply(self):
+        self.shape.points = list(self.new_points)
         self.canvas.repaint()
 
-    def undo(self):
-        self.shape.points = self.old_points
+    def revert(self):
+        self.shape.points = list(self.old_points)
         self.canvas.repaint()
+
+
+COMMAND_TYPES = {
+    command_type.action_type: command_type
+    for command_type in (
+        CreateShapeCommand,
+        DeleteShapeCommand,
+        EditLabelCommand,
+        MoveShapeCommand,
+    )
+}
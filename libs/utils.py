@@ -1,3 +1,4 @@
+from functools import lru_cache
 from math import sqrt
 import hashlib
 import re
@@ -80,13 +81,37 @@ def format_shortcut(text):
     return f"<b>{mod}</b>+<b>{key}</b>"
 
 
-def generate_color_by_text(text):
-    s = text
-    hash_code = int(hashlib.sha256(s.encode("utf-8")).hexdigest(), 16)
+# Project-level class colors, label -> (r, g, b). Filled from the project
+# database so that every class keeps the same color across sessions.
+_color_palette = {}
+
+
+def set_color_palette(palette):
+    """Replace the project palette. Values may be QColor, "#rrggbb" or (r, g, b)."""
+    _color_palette.clear()
+    for label, color in palette.items():
+        if not color:
+            continue
+        if isinstance(color, (list, tuple)):
+            color = QColor(*color[:3])
+        _color_palette[label] = QColor(color).getRgb()[:3]
+
+
+@lru_cache(maxsize=1024)
+def _rgb_by_text(text):
+    hash_code = int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
     r = int((hash_code / 255) % 255)
     g = int((hash_code / 65025) % 255)
     b = int((hash_code / 16581375) % 255)
-    return QColor(r, g, b, 100)
+    return r, g, b
+
+
+def generate_color_by_text(text):
+    """Return a new QColor for the label; the hashing itself is cached."""
+    rgb = _color_palette.get(text)
+    if rgb is None:
+        rgb = _rgb_by_text(text)
+    return QColor(*rgb, 100)
 
 
 def natural_sort(list, key=lambda s: s):
@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
-import codecs
 import os
 
+from libs.atomic_io import atomic_write
 from libs.constants import DEFAULT_ENCODING
 
 TXT_EXT = ".txt"
@@ -55,45 +55,52 @@ class YOLOWriter:
         return class_index, x_center, y_center, w, h
 
     def save(self, class_list=[], target_file=None):
-
-        out_file = None  # Update yolo .txt
-        out_class_file = None  # Update class list .txt
-
         if target_file is None:
-            out_file = open(self.filename + TXT_EXT, "w", encoding=ENCODE_METHOD)
-            classes_file = os.path.join(
-                os.path.dirname(os.path.abspath(self.filename)), "classes.txt"
-            )
-            out_class_file = open(classes_file, "w")
-
-        else:
-            out_file = codecs.open(target_file, "w", encoding=ENCODE_METHOD)
-            classes_file = os.path.join(
-                os.path.dirname(os.path.abspath(target_file)), "classes.txt"
-            )
-            out_class_file = open(classes_file, "w")
-
+            target_file = self.filename + TXT_EXT
+        classes_file = os.path.join(
+            os.path.dirname(os.path.abspath(target_file)), "classes.txt"
+        )
+
+        # The other annotation files of the directory refer to classes.txt
+        # by index, so its classes keep their place whatever class_list
+        # holds now; new ones are appended. Renaming, merging and deleting
+        # classes go through libs.class_ops, which rewrites those files.
+        classes = _read_classes(classes_file)
+        classes += [name for name in class_list if name not in classes]
+
+        # Build both files before touching either, so a failure leaves the
+        # old pair in place.
+        lines = []
         for box in self.box_list:
             class_index, x_center, y_center, w, h = self.bnd_box_to_yolo_line(
-                box, class_list
+                box, classes
             )
-            # print (classIndex, x_center, y_center, w, h)
-            out_file.write(
+            if box["name"] not in class_list:
+                class_list.append(box["name"])
+            lines.append(
                 f"{class_index} {x_center:.6f} {y_center:.6f} {w:.6f} {h:.6f}\n"
             )
 
-        # print (classList)
-        # print (out_class_file)
-        for c in class_list:
-            out_class_file.write(c + "\n")
+        # Classes first: the list only grows, so the annotation never refers
+        # to an index missing from it.
+        atomic_write(
+            classes_file, "".join(c + "\n" for c in classes), ENCODE_METHOD
+        )
+        atomic_write(target_file, "".join(lines), ENCODE_METHOD)
+
 
-        out_class_file.close()
-        out_file.close()
+def _read_classes(classes_file):
+    try:
+        with open(classes_file, encoding=ENCODE_METHOD) as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
 
 
 class YoloReader:
 
-    def __init__(self, file_path, image, class_list_path=None):
+    def __init__(self, file_path, image, class_list_path=None, img_size=None):
+        # img_size: (height, width, depth) to use instead of image's.
         # shapes type:
         # [labbel, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
         self.shapes = []
@@ -112,7 +119,8 @@ class YoloReader:
 
         # print (self.classes)
 
-        img_size = [image.height(), image.width(), 1 if image.isGrayscale() else 3]
+        if img_size is None:
+            img_size = [image.height(), image.width(), 1 if image.isGrayscale() else 3]
 
         self.img_size = img_size
 
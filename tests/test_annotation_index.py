@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.annotation_index import AnnotationIndex, UNKNOWN, UNVERIFIED, VERIFIED
+from libs.image_catalog import ImageCatalog
+from libs.pascal_voc_io import PascalVocWriter
+
+
+class TestAnnotationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.images = [os.path.join(self.dir, 'img_%d.jpg' % i) for i in range(6)]
+        for path in self.images:
+            open(path, 'wb').close()
+        self.write_voc(1, verified=True)
+        self.write_voc(3, verified=False)
+        open(os.path.join(self.dir, 'img_4.txt'), 'w').close()
+        self.catalog = ImageCatalog(self.images)
+        self.index = AnnotationIndex(self.catalog)
+        self.index.rebuild()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_voc(self, i, verified):
+        writer = PascalVocWriter(self.dir, 'img_%d.jpg' % i, (10, 10, 3))
+        writer.verified = verified
+        writer.add_bnd_box(1, 1, 5, 5, 'cat', 0)
+        writer.save(os.path.join(self.dir, 'img_%d.xml' % i))
+
+    def test_scan_flags(self):
+        self.assertEqual([self.index.is_labelled(i) for i in range(6)],
+                         [False, True, False, True, True, False])
+        self.assertEqual(self.index.annotation_path(self.images[1]),
+                         os.path.join(self.dir, 'img_1.xml'))
+        self.assertEqual(self.index.annotation_path(self.images[0]), '')
+        self.assertIsNone(self.index.annotation_path('/elsewhere/img_1.jpg'))
+
+    def test_unlabelled_navigation(self):
+        self.assertEqual(self.index.next_unlabelled(-1), 0)
+        self.assertEqual(self.index.next_unlabelled(0), 2)
+        self.assertEqual(self.index.next_unlabelled(2), 5)
+        self.assertIsNone(self.index.next_unlabelled(5))
+        self.assertEqual(self.index.prev_unlabelled(5), 2)
+        self.assertIsNone(self.index.prev_unlabelled(0))
+
+    def test_next_unverified_probes_lazily(self):
+        self.assertEqual(self.index.verified_state(1), UNKNOWN)
+        self.assertEqual(self.index.next_unverified(-1), 3)
+        self.assertEqual(self.index.verified_state(1), VERIFIED)
+        self.assertEqual(self.index.verified_state(3), UNVERIFIED)
+        self.assertEqual(self.index.next_unverified(3), 4)
+        self.assertIsNone(self.index.next_unverified(4))
+
+    def test_incremental_updates(self):
+        saved = os.path.join(self.dir, 'img_0.xml')
+        self.assertEqual(self.index.mark_saved(self.images[0], saved, True), 0)
+        self.assertEqual(self.index.next_unlabelled(-1), 2)
+        self.assertIsNone(self.index.mark_saved(self.images[2], '/other/img_2.xml', False))
+        self.index.set_verified(self.images[3], True)
+        self.assertEqual(self.index.next_unverified(-1), 4)
+
+        self.catalog.remove(self.images[2])
+        self.index.remove(2)
+        self.assertEqual(self.index.next_unlabelled(-1), 4)
+        self.assertEqual(self.index.formats(self.images[4]), 2)
+
+    def test_save_dir(self):
+        save_dir = os.path.join(self.dir, 'labels')
+        os.mkdir(save_dir)
+        open(os.path.join(save_dir, 'img_5.json'), 'w').close()
+        self.index.rebuild(save_dir)
+        self.assertEqual(self.index.next_unlabelled(-1), 0)
+        self.assertEqual(self.index.prev_unlabelled(6), 4)
+        self.assertEqual(self.index.annotation_path(self.images[5]),
+                         os.path.join(save_dir, 'img_5.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import select
+
+from libs.annotation_sync import set_verified, sync_annotations
+from libs.database import Annotation, Class, Image, init_db
+from libs.labelFile import LabelFile
+
+
+def box(label, x1, y1, x2, y2):
+    return {'label': label, 'points': [(x1, y1), (x2, y1), (x2, y2), (x1, y2)],
+            'difficult': False}
+
+
+class TestAnnotationSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        self.Session = init_db(os.path.join(self.dir, 'labelImg.db'))
+        self.session = self.Session()
+        self.label_file = LabelFile()
+        self.images = {stem: os.path.join(self.dir, stem + '.jpg')
+                       for stem in ('voc', 'yolo', 'ml', 'none')}
+        self.shape = [80, 100, 3]
+
+    def tearDown(self):
+        self.session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def annotation(self, stem, ext):
+        return os.path.join(self.dir, stem + ext)
+
+    def write_voc(self, shapes):
+        self.label_file.save_pascal_voc_format(
+            self.annotation('voc', '.xml'), shapes, self.images['voc'], self.shape)
+
+    def write_all(self):
+        self.write_voc([box('dog', 10, 10, 50, 50), box('cat', 60, 5, 90, 70)])
+        self.label_file.save_yolo_format(
+            self.annotation('yolo', '.txt'), [box('dog', 10, 20, 50, 40)],
+            self.images['yolo'], self.shape, ['dog', 'cat'])
+        self.label_file.verified = True
+        self.label_file.save_create_ml_format(
+            self.annotation('ml', '.json'), [box('bird', 1, 2, 30, 40)],
+            self.images['ml'], self.shape, [])
+        self.label_file.verified = False
+
+    def sync(self):
+        return sync_annotations(self.session, self.images.values(),
+                                size_of=lambda path: (100, 80))
+
+    def boxes(self, stem):
+        return sorted(self.session.execute(
+            select(Class.name, Annotation.xmin, Annotation.ymin, Annotation.xmax, Annotation.ymax)
+            .join(Annotation.label_class)
+            .join(Annotation.image)
+            .where(Image.path == self.images[stem])
+        ).all())
+
+    def verified(self, stem):
+        return self.session.scalar(select(Image.verified).where(Image.path == self.images[stem]))
+
+    def test_reads_every_format(self):
+        self.write_all()
+        self.assertEqual(self.sync(), 4)
+        self.assertEqual(self.boxes('voc'), [('cat', 60, 5, 90, 70), ('dog', 10, 10, 50, 50)])
+        self.assertEqual(self.boxes('yolo'), [('dog', 10, 20, 50, 40)])
+        self.assertEqual(self.boxes('ml'), [('bird', 1, 2, 30, 40)])
+        self.assertEqual(self.boxes('none'), [])
+        self.assertTrue(self.verified('ml'))
+        self.assertFalse(self.verified('voc'))
+        # Nothing changed since.
+        self.assertEqual(self.sync(), 0)
+
+    def test_changed_and_removed_files(self):
+        self.write_all()
+        self.sync()
+        self.write_voc([box('cat', 1, 1, 9, 9)])
+        os.utime(self.annotation('voc', '.xml'), ns=(1, 1))
+        os.remove(self.annotation('ml', '.json'))
+        self.assertEqual(self.sync(), 2)
+        self.assertEqual(self.boxes('voc'), [('cat', 1, 1, 9, 9)])
+        self.assertEqual(self.boxes('ml'), [])
+        self.assertFalse(self.verified('ml'))
+
+    def test_yolo_keeps_the_stored_verified(self):
+        self.write_all()
+        self.sync()
+        self.assertTrue(set_verified(self.session, self.images['yolo'], True))
+        self.assertFalse(set_verified(self.session, os.path.join(self.dir, 'new.jpg'), True))
+        os.utime(self.annotation('yolo', '.txt'), ns=(1, 1))
+        self.assertEqual(self.sync(), 1)
+        self.assertTrue(self.verified('yolo'))
+
+    def test_yolo_waits_for_the_image_size(self):
+        self.write_all()
+        sync_annotations(self.session, [self.images['yolo']])
+        self.assertEqual(self.boxes('yolo'), [])
+        self.assertEqual(sync_annotations(self.session, [self.images['yolo']],
+                                          size_of=lambda path: (100, 80)), 1)
+        self.assertEqual(self.boxes('yolo'), [('dog', 10, 20, 50, 40)])
+
+
+if __name__ == '__main__':
+    unittest.main()
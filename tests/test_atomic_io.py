@@ -0,0 +1,127 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+libs_path = os.path.join(dir_name, '..', 'libs')
+sys.path.insert(0, libs_path)
+from atomic_io import atomic_open, atomic_write, batched_fsync
+from create_ml_io import CreateMLWriter
+from pascal_voc_io import PascalVocWriter
+from yolo_io import YOLOWriter
+
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'a.xml')
+        with open(self.path, 'w') as f:
+            f.write('old')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name), encoding='utf-8') as f:
+            return f.read()
+
+    def assert_only_files(self, *names):
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted(names))
+
+    def test_replaces_content(self):
+        os.chmod(self.path, 0o640)
+        atomic_write(self.path, 'new 臉', 'utf-8')
+        self.assertEqual(self.read('a.xml'), 'new 臉')
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+        self.assert_only_files('a.xml')
+
+    def test_exception_while_writing_keeps_old_file(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.path) as f:
+                f.write('partial')
+                raise RuntimeError('interrupted')
+        self.assertEqual(self.read('a.xml'), 'old')
+        self.assert_only_files('a.xml')
+
+    def test_disk_full_keeps_old_file(self):
+        with mock.patch('atomic_io.os.fsync', side_effect=OSError(28, 'No space left on device')):
+            with self.assertRaises(OSError):
+                atomic_write(self.path, 'new')
+        self.assertEqual(self.read('a.xml'), 'old')
+        self.assert_only_files('a.xml')
+
+    def test_batched_fsync_syncs_once_at_the_end(self):
+        with mock.patch('atomic_io.os.fsync') as fsync:
+            with batched_fsync():
+                for i in range(3):
+                    atomic_write(os.path.join(self.dir, '%d.txt' % i), str(i))
+                self.assertEqual(fsync.call_count, 0)
+            # three files and their directory
+            self.assertEqual(fsync.call_count, 4)
+        self.assertEqual(self.read('2.txt'), '2')
+
+    def test_pascal_voc_interrupted(self):
+        writer = PascalVocWriter('tests', 'test', (512, 512, 1))
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+        with mock.patch.object(PascalVocWriter, 'prettify', side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                writer.save(self.path)
+        self.assertEqual(self.read('a.xml'), 'old')
+        writer.save(self.path)
+        self.assertIn('<name>person</name>', self.read('a.xml'))
+
+    def test_yolo_interrupted_keeps_classes(self):
+        target = os.path.join(self.dir, 'a.txt')
+        writer = YOLOWriter('tests', 'a', (512, 512, 1))
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+        writer.save(['person'], target)
+        annotation, classes = self.read('a.txt'), self.read('classes.txt')
+
+        broken = YOLOWriter('tests', 'a', (0, 0, 1))
+        broken.add_bnd_box(60, 40, 430, 504, 'dog', 0)
+        with self.assertRaises(ZeroDivisionError):
+            broken.save(['person'], target)
+        self.assertEqual(self.read('a.txt'), annotation)
+        self.assertEqual(self.read('classes.txt'), classes)
+        self.assertEqual(classes, 'person\n')
+
+    def test_yolo_keeps_existing_class_indices(self):
+        with open(os.path.join(self.dir, 'classes.txt'), 'w') as f:
+            f.write('dog\ncat\n')
+        target = os.path.join(self.dir, 'a.txt')
+        writer = YOLOWriter('tests', 'a', (512, 512, 1))
+        writer.add_bnd_box(60, 40, 430, 504, 'cat', 0)
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+        class_list = ['person']
+        writer.save(class_list, target)
+        self.assertEqual(self.read('classes.txt'), 'dog\ncat\nperson\n')
+        self.assertEqual([line.split()[0] for line in self.read('a.txt').splitlines()],
+                         ['1', '2'])
+        self.assertEqual(class_list, ['person', 'cat'])
+
+    def test_new_file_mode_follows_umask(self):
+        atomic_write(os.path.join(self.dir, 'new.txt'), 'x')
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.dir, 'new.txt')).st_mode),
+                         0o666 & ~umask)
+
+    def test_create_ml_interrupted_keeps_dataset(self):
+        output = os.path.join(self.dir, 'dataset.json')
+        shape = {'label': 'person', 'points': ((65, 45), (420, 45), (420, 512), (65, 512))}
+        CreateMLWriter('tests', 'a.bmp', (512, 512, 1), [shape], output).write()
+        before = self.read('dataset.json')
+        with mock.patch('atomic_io.os.replace', side_effect=OSError('interrupted')):
+            with self.assertRaises(OSError):
+                CreateMLWriter('tests', 'b.bmp', (512, 512, 1), [shape], output).write()
+        self.assertEqual(self.read('dataset.json'), before)
+        self.assert_only_files('a.xml', 'dataset.json')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+from libs import box_checks
+from libs.box_checks import DEGENERATE, DUPLICATE, OUT_OF_BOUNDS, check_boxes
+from libs.database import Annotation, BoxIssue, Class, Image, init_db
+from libs.dataset_query import DatasetQuery
+
+
+class TestBoxChecks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.Session = init_db(os.path.join(self.tmp_dir.name, 'labelImg.db'))
+        self.session = self.Session()
+        person, car = Class(name='person'), Class(name='car')
+        self.session.add_all([person, car])
+        self.session.flush()
+        # image -> (size, [(class, xmin, ymin, xmax, ymax)])
+        layout = {
+            'clean.jpg': ((100, 100), [(person, 10, 10, 50, 50), (person, 60, 60, 90, 90)]),
+            'outside.jpg': ((100, 100), [(person, 10, 10, 120, 50)]),
+            'flat.jpg': ((100, 100), [(car, 10, 10, 50, 10)]),
+            'twice.jpg': ((100, 100), [(car, 10, 10, 50, 50), (car, 11, 10, 50, 50),
+                                       (person, 10, 10, 50, 50)]),
+            'unsized.jpg': (None, [(car, 500, 500, 900, 900)]),
+        }
+        for path, (size, boxes) in layout.items():
+            image = Image(path=path)
+            if size:
+                image.width, image.height = size
+            self.session.add(image)
+            self.session.flush()
+            for label_class, x1, y1, x2, y2 in boxes:
+                self.session.add(Annotation(image_id=image.id, class_id=label_class.id,
+                                            xmin=x1, ymin=y1, xmax=x2, ymax=y2))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def paths(self, kind=None):
+        return sorted(DatasetQuery().has_issue(kind).paths(self.session))
+
+    def check(self, use_numpy):
+        counts = check_boxes(self.session, use_numpy=use_numpy)
+        self.assertEqual(counts, {OUT_OF_BOUNDS: 1, DEGENERATE: 1, DUPLICATE: 1})
+        self.assertEqual(self.paths(OUT_OF_BOUNDS), ['outside.jpg'])
+        self.assertEqual(self.paths(DEGENERATE), ['flat.jpg'])
+        self.assertEqual(self.paths(DUPLICATE), ['twice.jpg'])
+        self.assertEqual(self.paths(), ['flat.jpg', 'outside.jpg', 'twice.jpg'])
+        duplicate = self.session.query(BoxIssue).filter_by(kind=DUPLICATE).one()
+        self.assertAlmostEqual(duplicate.value, 39 / 40)
+        self.assertLess(duplicate.other_annotation_id, duplicate.annotation_id)
+
+    def test_python(self):
+        self.check(use_numpy=False)
+
+    @unittest.skipIf(box_checks.numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        self.check(use_numpy=True)
+
+    @unittest.skipIf(box_checks.numpy is None, 'NumPy is not installed')
+    def test_numpy_matches_python_in_batches(self):
+        image = self.session.query(Image).filter_by(path='clean.jpg').one()
+        class_id = self.session.query(Class.id).filter_by(name='car').scalar()
+        for i in range(40):
+            self.session.add(Annotation(image_id=image.id, class_id=class_id,
+                                        xmin=i, ymin=0, xmax=i + 20, ymax=20))
+        self.session.commit()
+        check_boxes(self.session, iou_threshold=0.8, use_numpy=False)
+        expected = self.issues()
+        self.assertGreater(len(expected), 3)
+        original = box_checks._BATCH_PAIRS
+        # One image per batch, then also a few rows of its boxes at a time.
+        for batch_pairs in (2000, 100, 1):
+            box_checks._BATCH_PAIRS = batch_pairs
+            try:
+                check_boxes(self.session, iou_threshold=0.8, use_numpy=True)
+            finally:
+                box_checks._BATCH_PAIRS = original
+            self.assertEqual(self.issues(), expected, batch_pairs)
+
+    def issues(self):
+        return sorted((issue.kind, issue.annotation_id, issue.other_annotation_id,
+                       round(issue.value or 0, 9))
+                      for issue in self.session.query(BoxIssue))
+
+    def test_sizes_are_filled_in_and_runs_replace_findings(self):
+        check_boxes(self.session, use_numpy=False,
+                    size_of=lambda path: (800, 800) if path == 'unsized.jpg' else None)
+        image = self.session.query(Image).filter_by(path='unsized.jpg').one()
+        self.assertEqual((image.width, image.height), (800, 800))
+        self.assertIn('unsized.jpg', self.paths(OUT_OF_BOUNDS))
+        self.session.query(Annotation).filter_by(image_id=image.id).delete()
+        self.session.commit()
+        check_boxes(self.session, use_numpy=False)
+        self.assertNotIn('unsized.jpg', self.paths())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import json
+import os
+import tempfile
+import unittest
+
+from libs import class_ops
+from libs.class_ops import apply_class_change, plan_class_change
+from libs.database import Annotation, Class, ClassCount, class_counts, init_db
+from libs.pascal_voc_io import PascalVocReader, PascalVocWriter
+
+
+class TestClassOps(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        self.Session = init_db(os.path.join(self.dir, 'labelImg.db'))
+        self.session = self.Session()
+        self.classes = {}
+        for name in ('dog', 'cat', 'puppy'):
+            self.classes[name] = Class(name=name)
+            self.session.add(self.classes[name])
+        self.session.commit()
+        self.images = [self.path(stem + '.jpg') for stem in 'abc']
+
+    def tearDown(self):
+        self.session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def plan(self, mapping, images=None):
+        return plan_class_change(self.session, images or self.images, mapping,
+                                 size_of=lambda path: (20, 20))
+
+    def write_all_voc(self):
+        self.write_voc('a', ['dog', 'cat'])
+        self.write_voc('b', ['puppy'])
+        self.write_voc('c', ['cat'])
+
+    def write_voc(self, stem, labels):
+        writer = PascalVocWriter(self.dir, stem + '.jpg', (20, 20, 3))
+        for label in labels:
+            writer.add_bnd_box(1, 1, 9, 9, label, 0)
+        writer.save(self.path(stem + '.xml'))
+
+    def write_text(self, name, text):
+        with open(self.path(name), 'w') as f:
+            f.write(text)
+
+    def read_text(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
+
+    def voc_labels(self, stem):
+        return [shape[0] for shape in PascalVocReader(self.path(stem + '.xml')).get_shapes()]
+
+    def test_rename_touches_only_affected_files(self):
+        self.write_all_voc()
+        before = os.stat(self.path('c.xml')).st_mtime_ns
+        plan = self.plan({'dog': 'hound'})
+        self.assertEqual(list(plan.files), [self.path('a.xml')])
+        self.assertIn('dog -> hound: 1 boxes', plan.report())
+        self.assertEqual(apply_class_change(self.session, plan), [])
+        self.assertEqual(self.voc_labels('a'), ['hound', 'cat'])
+        self.assertEqual(os.stat(self.path('c.xml')).st_mtime_ns, before)
+        names = {name for (name,) in self.session.query(Class.name)}
+        self.assertEqual(names, {'hound', 'cat', 'puppy'})
+
+    def test_dry_run_changes_nothing(self):
+        self.write_voc('a', ['dog', 'cat'])
+        plan = self.plan({'cat': None})
+        self.assertIn('1 .xml files to rewrite', plan.report())
+        self.assertEqual(self.voc_labels('a'), ['dog', 'cat'])
+        self.assertEqual(self.session.query(Class).count(), 3)
+
+    def test_merge_updates_counts(self):
+        self.write_all_voc()
+        plan = self.plan({'puppy': 'dog'})
+        self.assertEqual(apply_class_change(self.session, plan), [])
+        self.assertEqual(self.voc_labels('b'), ['dog'])
+        self.assertEqual(dict(class_counts(self.session)), {'dog': 2, 'cat': 2})
+        self.assertEqual(self.session.query(ClassCount).count(), 2)
+
+    def test_delete_shifts_yolo_indices(self):
+        self.write_text('classes.txt', 'dog\ncat\npuppy\n')
+        self.write_text('a.txt', '0 0.5 0.5 0.2 0.2\n1 0.5 0.5 0.2 0.2\n')
+        self.write_text('b.txt', '2 0.5 0.5 0.2 0.2\n')
+        # Not in the database, but its indices move all the same.
+        self.write_text('d.txt', '2 0.1 0.1 0.1 0.1\n')
+        plan = self.plan({'cat': None})
+        self.assertEqual(apply_class_change(self.session, plan), [])
+        self.assertEqual(self.read_text('classes.txt'), 'dog\npuppy\n')
+        self.assertEqual(self.read_text('a.txt'), '0 0.5 0.5 0.2 0.2\n')
+        self.assertEqual(self.read_text('b.txt'), '1 0.5 0.5 0.2 0.2\n')
+        self.assertEqual(self.read_text('d.txt'), '1 0.1 0.1 0.1 0.1\n')
+        self.assertEqual(self.session.query(Annotation).count(), 2)
+
+    def test_worker_processes(self):
+        self.write_all_voc()
+        plan = self.plan({'cat': 'kitten'})
+        original = class_ops.MIN_PARALLEL_FILES
+        class_ops.MIN_PARALLEL_FILES = 0
+        try:
+            self.assertEqual(apply_class_change(self.session, plan, max_workers=2), [])
+        finally:
+            class_ops.MIN_PARALLEL_FILES = original
+        self.assertEqual(self.voc_labels('a'), ['dog', 'kitten'])
+        self.assertEqual(self.voc_labels('c'), ['kitten'])
+
+    def test_yolo_rename_only_rewrites_classes(self):
+        self.write_text('classes.txt', 'dog\ncat\npuppy\n')
+        self.write_text('a.txt', '0 0.5 0.5 0.2 0.2\n')
+        plan = self.plan({'dog': 'hound'})
+        self.assertEqual(plan.files, {})
+        apply_class_change(self.session, plan)
+        self.assertEqual(self.read_text('classes.txt'), 'hound\ncat\npuppy\n')
+        self.assertEqual(self.read_text('a.txt'), '0 0.5 0.5 0.2 0.2\n')
+        self.assertEqual({name for (name,) in self.session.query(Class.name)},
+                         {'hound', 'cat', 'puppy'})
+        self.assertEqual(self.session.query(Annotation).count(), 1)
+
+    def test_create_ml(self):
+        box = {'x': 5, 'y': 5, 'width': 8, 'height': 8}
+        self.write_text('a.json', json.dumps([{
+            'image': 'a.jpg', 'verified': False,
+            'annotations': [{'label': 'dog', 'coordinates': box},
+                            {'label': 'cat', 'coordinates': box}]}]))
+        plan = self.plan({'cat': 'dog'})
+        self.assertEqual(apply_class_change(self.session, plan), [])
+        entries = json.loads(self.read_text('a.json'))
+        self.assertEqual([a['label'] for a in entries[0]['annotations']], ['dog', 'dog'])
+
+    def test_failed_file_changes_nothing(self):
+        self.write_all_voc()
+        self.write_text('classes.txt', 'dog\ncat\npuppy\n')
+        plan = self.plan({'cat': 'kitty'})
+        self.assertEqual(sorted(plan.files), [self.path('a.xml'), self.path('c.xml')])
+        self.write_text('a.xml', '<annotation><object>')
+        errors = apply_class_change(self.session, plan)
+        self.assertEqual([path for path, _ in errors], [self.path('a.xml')])
+        self.assertEqual(self.voc_labels('c'), ['cat'])
+        self.assertEqual(self.read_text('classes.txt'), 'dog\ncat\npuppy\n')
+        self.assertEqual(sorted(name for name in os.listdir(self.dir)
+                                if not name.startswith('labelImg.db')),
+                         ['a.xml', 'b.xml', 'c.xml', 'classes.txt'])
+        self.assertEqual(self.session.query(Class).filter_by(name='cat').count(), 1)
+
+    def test_boxes_without_files_stay_in_database(self):
+        self.write_all_voc()
+        self.plan({})
+        # Only a.jpg is open now: the puppy box of b.jpg is in no planned file.
+        plan = self.plan({'puppy': 'dog'}, images=[self.path('a.jpg')])
+        self.assertEqual(plan.unlocated(), ['puppy'])
+        self.assertIn('puppy: no annotation file has these boxes; the database keeps them',
+                      plan.report())
+        self.assertEqual(apply_class_change(self.session, plan), [])
+        self.assertEqual(self.voc_labels('b'), ['puppy'])
+        self.assertEqual(self.session.query(Class).filter_by(name='puppy').count(), 1)
+
+    def test_database_follows_edited_files(self):
+        self.write_all_voc()
+        self.plan({})
+        # A box added after the first sync is renamed with the others.
+        self.write_voc('b', ['puppy', 'dog'])
+        plan = self.plan({'dog': 'hound'})
+        self.assertEqual(sorted(plan.files), [self.path('a.xml'), self.path('b.xml')])
+        self.assertEqual(apply_class_change(self.session, plan), [])
+        self.assertEqual(self.voc_labels('b'), ['puppy', 'hound'])
+        self.assertEqual(dict(class_counts(self.session)), {'hound': 2, 'cat': 2, 'puppy': 1})
+
+    def test_identity_mapping_rejected(self):
+        with self.assertRaises(ValueError):
+            self.plan({'dog': 'dog'})
+
+
+if __name__ == '__main__':
+    unittest.main()
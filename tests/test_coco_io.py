@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+import unittest
+
+from libs import coco_io
+from libs.annotation_sync import sync_annotations
+from libs.coco_io import INDEX_FILE, CocoIndex, export_coco
+from libs.database import Annotation, Class, Image, init_db
+from libs.pascal_voc_io import PascalVocWriter
+
+
+class TestCocoIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        self.Session = init_db(os.path.join(self.dir, 'labelImg.db'))
+        self.session = self.Session()
+        person, car = Class(name='person'), Class(name='carro é')
+        self.session.add_all([person, car])
+        self.session.flush()
+        # image -> (size, [(class, xmin, ymin, xmax, ymax)])
+        layout = {
+            'images/a.jpg': ((100, 80), [(person, 10, 10, 50, 50), (car, 60, 5, 90, 70)]),
+            'images/sub/臉書.jpg': ((64, 64), [(car, 1, 2, 3, 4)]),
+            'images/empty.jpg': (None, []),
+        }
+        self.images = {}
+        for name, (size, boxes) in layout.items():
+            image = Image(path=os.path.join(self.dir, *name.split('/')))
+            if size:
+                image.width, image.height = size
+            self.session.add(image)
+            self.session.flush()
+            self.images[name] = image.path
+            for label_class, x1, y1, x2, y2 in boxes:
+                self.session.add(Annotation(image_id=image.id, class_id=label_class.id,
+                                            xmin=x1, ymin=y1, xmax=x2, ymax=y2))
+        self.session.commit()
+        self.json_path = os.path.join(self.dir, 'instances.json')
+        self.index_dir = os.path.join(self.dir, 'index')
+
+    def tearDown(self):
+        self.session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def export(self):
+        return export_coco(self.session, self.json_path, root=os.path.join(self.dir, 'images'),
+                           size_of=lambda path: (7, 9))
+
+    def test_export(self):
+        self.assertEqual(self.export(), (3, 3))
+        with open(self.json_path, encoding='utf-8') as f:
+            document = json.load(f)
+        self.assertEqual([c['name'] for c in document['categories']], ['person', 'carro é'])
+        self.assertEqual(sorted((i['file_name'], i['width'], i['height'])
+                                for i in document['images']),
+                         [('a.jpg', 100, 80), ('empty.jpg', 7, 9), ('sub/臉書.jpg', 64, 64)])
+        self.assertEqual([a['bbox'] for a in document['annotations']],
+                         [[10, 10, 40, 40], [60, 5, 30, 65], [1, 2, 2, 2]])
+        self.assertEqual(document['annotations'][1]['area'], 30 * 65)
+
+    def test_export_after_sync(self):
+        # a.jpg was relabelled since it was read.
+        os.makedirs(os.path.join(self.dir, 'images'))
+        writer = PascalVocWriter(self.dir, 'a.jpg', (80, 100, 3))
+        writer.add_bnd_box(1, 1, 20, 20, 'person', 0)
+        writer.save(os.path.join(self.dir, 'images', 'a.xml'))
+        sync_annotations(self.session, [self.images['images/a.jpg']])
+        self.assertEqual(self.export(), (3, 2))
+        with open(self.json_path, encoding='utf-8') as f:
+            document = json.load(f)
+        self.assertEqual([a['bbox'] for a in document['annotations']],
+                         [[1, 1, 19, 19], [1, 2, 2, 2]])
+
+    def test_export_skips_boxes_without_coordinates(self):
+        image_id = self.session.query(Image.id).filter_by(
+            path=self.images['images/empty.jpg']).scalar()
+        class_id = self.session.query(Class.id).filter_by(name='person').scalar()
+        self.session.add(Annotation(image_id=image_id, class_id=class_id))
+        self.session.commit()
+        self.assertEqual(self.export(), (3, 3))
+
+    def test_index_round_trip(self):
+        self.export()
+        original = coco_io.CHUNK_SIZE
+        # Chunks of a few bytes split every record and multibyte character.
+        coco_io.CHUNK_SIZE = 7
+        try:
+            index = CocoIndex(self.json_path, self.index_dir)
+        finally:
+            coco_io.CHUNK_SIZE = original
+        self.check(index)
+
+    def check(self, index):
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.shapes(self.images['images/a.jpg']), [
+            ('person', [(10, 10), (50, 10), (50, 50), (10, 50)], None, None, False),
+            ('carro é', [(60, 5), (90, 5), (90, 70), (60, 70)], None, None, False),
+        ])
+        self.assertEqual(index.shapes(self.images['images/sub/臉書.jpg'])[0][0], 'carro é')
+        self.assertEqual(index.shapes(self.images['images/empty.jpg']), [])
+        self.assertEqual(index.shapes(os.path.join(self.dir, 'unknown.jpg')), [])
+        # Matched on the end of the path, however the dataset is mounted.
+        self.assertIsNotNone(index.image_id('/elsewhere/sub/臉書.jpg'))
+        self.assertIsNone(index.image_id('/elsewhere/臉書.jpg'))
+
+    def test_index_is_persisted(self):
+        self.export()
+        CocoIndex(self.json_path, self.index_dir)
+        self.assertTrue(os.path.isfile(os.path.join(self.index_dir, INDEX_FILE)))
+
+        original = CocoIndex._build_index
+        CocoIndex._build_index = lambda self: self.fail_build()
+        try:
+            self.check(CocoIndex(self.json_path, self.index_dir))
+        finally:
+            CocoIndex._build_index = original
+
+        # A changed file is indexed again.
+        self.session.add(Image(path=os.path.join(self.dir, 'images', 'new.jpg')))
+        self.session.commit()
+        self.export()
+        self.assertEqual(len(CocoIndex(self.json_path, self.index_dir)), 4)
+
+    def test_foreign_layout(self):
+        # Keys in another order, extra top-level values, a byte order mark
+        # and numbers cut by chunk boundaries.
+        document = ('{"annotations": [{"image_id": 12, "bbox": [1.5, 2, 3, 4], "category_id": 3},'
+                    ' {"image_id": 12, "bbox": [0, 0, 1e1, 12345678], "category_id": 9}],'
+                    ' "licenses": [{"id": 1}], "info": {"year": 2017}, "version": 12345,'
+                    ' "images": [{"id": 12, "file_name": "val/x.jpg"}],'
+                    ' "categories": [{"id": 3, "name": "dog"}], "empty": []}')
+        with open(self.json_path, 'wb') as f:
+            f.write(b'\xef\xbb\xbf' + document.encode('utf-8'))
+        original = coco_io.CHUNK_SIZE
+        coco_io.CHUNK_SIZE = 5
+        try:
+            index = CocoIndex(self.json_path, self.index_dir)
+        finally:
+            coco_io.CHUNK_SIZE = original
+        shapes = index.shapes('/data/val/x.jpg')
+        self.assertEqual([shape[0] for shape in shapes], ['dog', '9'])
+        self.assertEqual(shapes[0][1][2], (4.5, 6))
+        self.assertEqual(shapes[1][1][2], (10.0, 12345678))
+
+    def test_invalid_json(self):
+        with open(self.json_path, 'w') as f:
+            f.write('{"images": [{"id": 1, "file_name": "a.jpg"}, {"id": ')
+        with self.assertRaises(ValueError):
+            CocoIndex(self.json_path, self.index_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import func, text
+
+from libs.database import (
+    ENGINE_SETTING_PREFIX,
+    SCHEMA_HEAD,
+    Annotation,
+    Class,
+    Image,
+    ImageBoxCount,
+    Setting,
+    class_counts,
+    class_distribution,
+    get_db_engine,
+    image_box_counts,
+    init_db,
+    load_engine_settings,
+    project_stats,
+    rebuild_aggregates,
+    schema_revision,
+    set_engine_setting,
+)
+
+
+class TestEngineSettings(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'labelImg.db')
+        self.Session = init_db(self.db_path)
+
+    def tearDown(self):
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def pragma(self, engine, name):
+        with engine.connect() as connection:
+            return connection.execute(text(f'PRAGMA {name}')).scalar()
+
+    def test_defaults_are_applied(self):
+        engine = self.Session.kw['bind']
+        self.assertEqual(self.pragma(engine, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(engine, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(engine, 'temp_store'), 2)  # MEMORY
+
+    def test_project_setting_overrides_default(self):
+        session = self.Session()
+        set_engine_setting(session, 'synchronous', 'full')
+        set_engine_setting(session, 'cache_size', -1000)
+        session.close()
+
+        engine = get_db_engine(self.db_path)
+        try:
+            self.assertEqual(self.pragma(engine, 'synchronous'), 2)  # FULL
+            self.assertEqual(self.pragma(engine, 'cache_size'), -1000)
+        finally:
+            engine.dispose()
+
+    def test_invalid_values_are_rejected(self):
+        session = self.Session()
+        with self.assertRaises(ValueError):
+            set_engine_setting(session, 'journal_mode', 'WAL; DROP TABLE images')
+        with self.assertRaises(KeyError):
+            set_engine_setting(session, 'page_size', 4096)
+        # A bad value written by hand falls back to the default.
+        session.merge(Setting(key=ENGINE_SETTING_PREFIX + 'temp_store', value='disk'))
+        session.commit()
+        session.close()
+        self.assertEqual(load_engine_settings(self.db_path)['temp_store'], 'MEMORY')
+
+
+def open_sample_project(test):
+    """Session on a new project of three images with 2, 3 and 4 boxes."""
+    tmp_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp_dir.cleanup)
+    Session = init_db(os.path.join(tmp_dir.name, 'labelImg.db'))
+    test.addCleanup(Session.kw['bind'].dispose)
+    session = Session()
+    test.addCleanup(session.close)
+    dog, cat = Class(name='dog'), Class(name='cat')
+    images = [Image(path=f'{i}.jpg') for i in range(3)]
+    session.add_all([dog, cat] + images)
+    session.flush()
+    for i, image in enumerate(images):
+        for label_class in [dog] * (i + 1) + [cat]:
+            session.add(Annotation(image_id=image.id, class_id=label_class.id))
+    session.commit()
+    return session
+
+
+def query_plan(session, query):
+    sql = str(query.statement.compile(
+        dialect=session.get_bind().dialect,
+        compile_kwargs={'literal_binds': True}))
+    rows = session.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+    return [row[-1] for row in rows]
+
+
+class TestStatisticsQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.session = open_sample_project(self)
+
+    def query_plan(self, query):
+        return query_plan(self.session, query)
+
+    def test_class_distribution(self):
+        self.assertEqual(class_distribution(self.session).all(),
+                         [('dog', 6), ('cat', 3)])
+        plan = self.query_plan(class_distribution(self.session))
+        self.assertIn(
+            'SCAN annotations USING COVERING INDEX ix_annotations_class_id_image_id',
+            plan)
+
+    def test_image_box_counts(self):
+        self.assertEqual(sorted(c for _, c in image_box_counts(self.session)), [2, 3, 4])
+        plan = self.query_plan(image_box_counts(self.session))
+        self.assertIn('SCAN annotations USING COVERING INDEX ix_annotations_image_id', plan)
+
+    def test_annotation_count_uses_index(self):
+        plan = self.query_plan(self.session.query(func.count(Annotation.id)))
+        self.assertTrue(all('COVERING INDEX' in step for step in plan), plan)
+
+
+class TestAggregates(unittest.TestCase):
+
+    def setUp(self):
+        self.session = open_sample_project(self)
+
+    def snapshot(self):
+        stats = project_stats(self.session)
+        return (stats.images, stats.annotations, stats.verified_images,
+                class_counts(self.session).all(),
+                sorted((r.image_id, r.count) for r in self.session.query(ImageBoxCount)))
+
+    def test_triggers_follow_writes(self):
+        self.assertEqual(project_stats(self.session).annotations, 9)
+        self.assertEqual(class_counts(self.session).all(), [('dog', 6), ('cat', 3)])
+
+        dog_id = self.session.query(Class.id).filter_by(name='dog').scalar()
+        for annotation in self.session.query(Annotation).filter_by(class_id=dog_id).limit(4):
+            self.session.delete(annotation)
+        cat = self.session.query(Annotation).join(Class).filter(Class.name == 'cat').first()
+        cat.class_id = dog_id
+        image = self.session.query(Image).first()
+        image.verified = True
+        self.session.add(Image(path='new.jpg', verified=True))
+        self.session.commit()
+
+        self.assertEqual(class_counts(self.session).all(), [('dog', 3), ('cat', 2)])
+        self.assertEqual(project_stats(self.session).verified_images, 2)
+        maintained = self.snapshot()
+        rebuild_aggregates(self.session)
+        self.assertEqual(self.snapshot(), maintained)
+
+    def test_reading_does_not_scan_annotations(self):
+        for step in query_plan(self.session, class_counts(self.session)):
+            self.assertNotIn('annotations', step)
+
+
+class TestSchemaHead(unittest.TestCase):
+
+    def test_schema_head_matches_migrations(self):
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        config = Config(os.path.join(root, 'alembic.ini'))
+        config.set_main_option('script_location', os.path.join(root, 'alembic'))
+        self.assertEqual(ScriptDirectory.from_config(config).get_current_head(), SCHEMA_HEAD)
+
+    def test_new_database_is_stamped_with_head(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'labelImg.db')
+            self.assertIsNone(schema_revision(db_path))
+            Session = init_db(db_path)
+            Session.kw['bind'].dispose()
+            self.assertEqual(schema_revision(db_path), SCHEMA_HEAD)
+
+
+if __name__ == '__main__':
+    unittest.main()
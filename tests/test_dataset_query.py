@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from libs.database import Annotation, Class, Image, init_db
+from libs.dataset_query import DatasetQuery
+
+
+class TestDatasetQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.Session = init_db(os.path.join(self.tmp_dir.name, 'labelImg.db'))
+        self.session = self.Session()
+        person, car = Class(name='person'), Class(name='car')
+        self.session.add_all([person, car])
+        self.session.flush()
+        # image -> (verified, [(class, width, height)])
+        layout = {
+            'tiny_person.jpg': (False, [(person, 10, 40), (car, 100, 80)]),
+            'big_person.jpg': (True, [(person, 60, 120)]),
+            'cars.jpg': (False, [(car, 12, 12)] * 3),
+            'empty.jpg': (True, []),
+        }
+        for path, (verified, boxes) in layout.items():
+            image = Image(path=path, verified=verified)
+            self.session.add(image)
+            self.session.flush()
+            for label_class, width, height in boxes:
+                self.session.add(Annotation(
+                    image_id=image.id, class_id=label_class.id,
+                    xmin=5, ymin=5, xmax=5 + width, ymax=5 + height))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def paths(self, query):
+        return sorted(query.paths(self.session))
+
+    def test_box_filters(self):
+        self.assertEqual(self.paths(DatasetQuery().with_box('person', smaller_than=16)),
+                         ['tiny_person.jpg'])
+        self.assertEqual(self.paths(DatasetQuery().with_box(smaller_than=16)),
+                         ['cars.jpg', 'tiny_person.jpg'])
+        self.assertEqual(self.paths(DatasetQuery().with_box('person', larger_than=50)),
+                         ['big_person.jpg'])
+        self.assertEqual(self.paths(DatasetQuery().with_box('unknown')), [])
+        self.assertEqual(self.paths(DatasetQuery().without_class('car')),
+                         ['big_person.jpg', 'empty.jpg'])
+
+    def test_counts_and_verified(self):
+        self.assertEqual(self.paths(DatasetQuery().box_count(minimum=2)),
+                         ['cars.jpg', 'tiny_person.jpg'])
+        self.assertEqual(self.paths(DatasetQuery().box_count(maximum=1)),
+                         ['big_person.jpg', 'empty.jpg'])
+        self.assertEqual(self.paths(DatasetQuery().box_count(maximum=0).verified()),
+                         ['empty.jpg'])
+        query = DatasetQuery().verified(False).box_count(minimum=3)
+        self.assertEqual(self.paths(query), ['cars.jpg'])
+        self.assertEqual(query.count(self.session), 1)
+        self.assertEqual(str(query), 'unverified, 3.. boxes')
+
+    def test_plans_use_indexes(self):
+        query = DatasetQuery().with_box('person', smaller_than=16).box_count(minimum=50)
+        sql = str(query.statement().compile(
+            dialect=self.session.get_bind().dialect,
+            compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in self.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+        self.assertTrue(any('ix_annotations_class_id_min_side' in step for step in plan), plan)
+        self.assertTrue(any('ix_image_box_counts_count' in step for step in plan), plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from libs.image_catalog import ImageCatalog
+
+
+class TestImageCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = ImageCatalog(['/d/a.jpg', '/d/b.jpg', '/d/c.jpg'])
+
+    def test_lookups(self):
+        self.assertEqual(len(self.catalog), 3)
+        self.assertIn('/d/b.jpg', self.catalog)
+        self.assertNotIn('/d/x.jpg', self.catalog)
+        self.assertEqual(self.catalog.index('/d/c.jpg'), 2)
+        self.assertIsNone(self.catalog.get_index('/d/x.jpg'))
+        with self.assertRaises(ValueError):
+            self.catalog.index('/d/x.jpg')
+        self.assertEqual(self.catalog[0], '/d/a.jpg')
+        self.assertEqual(self.catalog.path(3), None)
+        self.assertEqual(self.catalog.neighbour('/d/b.jpg', -1), '/d/a.jpg')
+        self.assertIsNone(self.catalog.neighbour('/d/a.jpg', -1))
+
+    def test_remove_keeps_index_consistent(self):
+        self.assertEqual(self.catalog.remove('/d/a.jpg'), 0)
+        self.assertIsNone(self.catalog.remove('/d/a.jpg'))
+        self.assertEqual(list(self.catalog), ['/d/b.jpg', '/d/c.jpg'])
+        self.assertEqual(self.catalog.index('/d/c.jpg'), 1)
+
+    def test_sort_and_reset(self):
+        self.catalog.sort(reverse=True)
+        self.assertEqual(self.catalog.index('/d/c.jpg'), 0)
+        self.catalog.set_paths(['/e/z.jpg'])
+        self.assertNotIn('/d/c.jpg', self.catalog)
+        self.assertEqual(self.catalog.index('/e/z.jpg'), 0)
+        self.catalog.clear()
+        self.assertEqual(len(self.catalog), 0)
+
+    def test_packed_names_round_trip(self):
+        paths = ['/data/part_%d/img_%d.jpg' % (i % 3, i) for i in range(100)]
+        paths += ['/data/臉書.jpg', '/data/bad_\udcff.jpg', 'relative.jpg']
+        catalog = ImageCatalog(paths)
+        self.assertEqual(list(catalog), paths)
+        self.assertEqual(catalog[-1], 'relative.jpg')
+        self.assertEqual(catalog[1:3], paths[1:3])
+        for i, path in enumerate(paths):
+            self.assertEqual(catalog.index(path), i)
+        self.assertNotIn('/data/part_0/img_1.jpg', catalog)
+        self.assertNotIn(None, catalog)
+
+    def test_remove_many(self):
+        paths = ['/d/%d.jpg' % i for i in range(50)]
+        catalog = ImageCatalog(paths)
+        for path in paths[::2]:
+            catalog.remove(path)
+        self.assertEqual(list(catalog), paths[1::2])
+        for i, path in enumerate(paths[1::2]):
+            self.assertEqual(catalog.index(path), i)
+        self.assertNotIn('/d/0.jpg', catalog)
+
+    def test_remove_across_compaction(self):
+        paths = ['/d/%d.jpg' % i for i in range(300)]
+        catalog = ImageCatalog(paths)
+        expected = list(paths)
+        # Every third image, from the end, then the first one: the arrays are
+        # compacted along the way.
+        for path in paths[::-3] + [paths[0]]:
+            self.assertEqual(catalog.remove(path), expected.index(path))
+            expected.remove(path)
+            self.assertEqual(len(catalog), len(expected))
+            self.assertEqual(catalog[len(expected) // 2], expected[len(expected) // 2])
+        self.assertEqual(list(catalog), expected)
+        self.assertEqual([catalog.index(path) for path in expected], list(range(len(expected))))
+        self.assertEqual(catalog.neighbour(expected[5], 1), expected[6])
+
+
+if __name__ == '__main__':
+    unittest.main()
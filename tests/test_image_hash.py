@@ -0,0 +1,133 @@
+import os
+import random
+import tempfile
+import unittest
+import zipfile
+
+from PyQt6.QtGui import QColor, QImage, QPainter
+
+from libs import image_hash, storage
+from libs.database import Image, init_db
+from libs.image_hash import (
+    BKTree,
+    dhash,
+    duplicate_clusters,
+    from_column,
+    hamming,
+    hash_images,
+    stale_images,
+    to_column,
+)
+
+
+def draw(path, width, height, seed):
+    """A few random rectangles, so differently seeded images differ."""
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(128, 128, 128))
+    painter = QPainter(image)
+    for _ in range(6):
+        painter.fillRect(rng.randrange(width), rng.randrange(height),
+                         width // 3, height // 3, QColor.fromHsv(rng.randrange(360), 200, rng.randrange(256)))
+    painter.end()
+    image.save(path)
+
+
+class TestImageHash(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        self.Session = init_db(os.path.join(self.dir, 'labelImg.db'))
+        self.session = self.Session()
+        self.paths = {}
+        for name, size, seed in (('a.png', (320, 240), 1), ('a_small.jpg', (160, 120), 1),
+                                 ('b.png', (320, 240), 2), ('c.png', (320, 240), 3)):
+            path = self.paths[name] = os.path.join(self.dir, name)
+            draw(path, size[0], size[1], seed)
+            self.session.add(Image(path=path))
+        self.session.commit()
+
+    def tearDown(self):
+        storage.close_all()
+        self.session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def test_dhash_is_stable_across_size_and_format(self):
+        a = dhash(self.paths['a.png'])
+        self.assertLessEqual(hamming(a, dhash(self.paths['a_small.jpg'])), 4)
+        self.assertGreater(hamming(a, dhash(self.paths['b.png'])), 10)
+        self.assertIsNone(dhash(os.path.join(self.dir, 'labelImg.db')))
+
+    def test_column_round_trip(self):
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            stored = to_column(value)
+            self.assertTrue(-(1 << 63) <= stored < (1 << 63))
+            self.assertEqual(from_column(stored), value)
+
+    def test_bk_tree_matches_brute_force(self):
+        rng = random.Random(0)
+        values = [rng.getrandbits(64) for _ in range(300)]
+        values += [v ^ (1 << rng.randrange(64)) for v in values[:50]]
+        tree = BKTree()
+        for value in values:
+            tree.add(value)
+        for query in values[:20] + [rng.getrandbits(64)]:
+            expected = sorted({v for v in values if hamming(v, query) <= 3})
+            self.assertEqual(sorted(tree.search(query, 3)), expected)
+
+    def test_incremental_hashing_and_clusters(self):
+        self.assertEqual(len(stale_images(self.session)), 4)
+        self.assertEqual(hash_images(self.session, stale_images(self.session)), 4)
+        self.assertEqual(stale_images(self.session), [])
+        self.assertEqual(duplicate_clusters(self.session),
+                         [sorted([self.paths['a.png'], self.paths['a_small.jpg']])])
+
+        draw(self.paths['c.png'], 320, 240, 1)
+        stat = os.stat(self.paths['c.png'])
+        os.utime(self.paths['c.png'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual([item[1] for item in stale_images(self.session)], [self.paths['c.png']])
+        hash_images(self.session, stale_images(self.session))
+        self.assertEqual(duplicate_clusters(self.session),
+                         [sorted([self.paths['a.png'], self.paths['a_small.jpg'],
+                                  self.paths['c.png']])])
+        self.assertEqual(len(duplicate_clusters(self.session, radius=0)), 1)
+
+    def test_unreadable_image_is_tried_once(self):
+        broken = os.path.join(self.dir, 'broken.jpg')
+        with open(broken, 'wb') as f:
+            f.write(b'not an image')
+        self.session.add(Image(path=broken))
+        self.session.commit()
+        self.assertEqual(hash_images(self.session, stale_images(self.session)), 5)
+        self.assertEqual(stale_images(self.session), [])
+        self.assertIsNone(self.session.query(Image.content_hash).filter_by(path=broken).scalar())
+
+    def test_archive_members_are_hashed(self):
+        archive = os.path.join(self.dir, 'set.zip')
+        with zipfile.ZipFile(archive, 'w') as f:
+            f.write(self.paths['a.png'], 'images/a.png')
+        member = os.path.join(archive, 'images', 'a.png')
+        self.session.add(Image(path=member))
+        self.session.commit()
+        self.assertIn(member, [item[1] for item in stale_images(self.session)])
+        self.assertEqual(dhash(member), dhash(self.paths['a.png']))
+        hash_images(self.session, stale_images(self.session))
+        self.assertEqual(stale_images(self.session), [])
+
+    def test_process_pool(self):
+        original = image_hash.MIN_PARALLEL_FILES
+        image_hash.MIN_PARALLEL_FILES = 0
+        try:
+            self.assertEqual(hash_images(self.session, stale_images(self.session),
+                                         max_workers=2), 4)
+        finally:
+            image_hash.MIN_PARALLEL_FILES = original
+        hashes = {path: from_column(value) for path, value
+                  in self.session.query(Image.path, Image.content_hash)}
+        self.assertEqual(hashes[self.paths['b.png']], dhash(self.paths['b.png']))
+
+
+if __name__ == '__main__':
+    unittest.main()
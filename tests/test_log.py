@@ -0,0 +1,47 @@
+import io
+import json
+import logging
+import unittest
+
+from libs import log
+
+
+class TestLog(unittest.TestCase):
+
+    def tearDown(self):
+        log.shutdown_logging()
+        for name in log.APP_LOGGERS + ('libs.test_module',):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+
+    def test_parse_levels(self):
+        levels = log.parse_levels('libs.database=debug, labelImg=WARNING,bad,x=nope')
+        self.assertEqual(levels, {'libs.database': logging.DEBUG,
+                                  'labelImg': logging.WARNING})
+        self.assertEqual(log.parse_levels(None), {})
+
+    def test_json_output_through_listener(self):
+        stream = io.StringIO()
+        log.setup_logging(level='INFO', module_levels={'libs.test_module': logging.DEBUG},
+                          json_output=True, stream=stream)
+        logging.getLogger('libs.test_module').debug('loaded %d images', 3)
+        logging.getLogger('libs.other').debug('filtered out')
+        log.shutdown_logging()
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        entry = json.loads(lines[0])
+        self.assertEqual(entry['level'], 'DEBUG')
+        self.assertEqual(entry['logger'], 'libs.test_module')
+        self.assertEqual(entry['message'], 'loaded 3 images')
+
+    def test_setup_twice_is_harmless(self):
+        stream = io.StringIO()
+        log.setup_logging(stream=stream)
+        log.setup_logging(stream=io.StringIO())
+        logging.getLogger('labelImg').info('once')
+        log.shutdown_logging()
+        self.assertEqual(stream.getvalue().count('once'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from libs import perf
+
+
+class TestPerf(unittest.TestCase):
+
+    def setUp(self):
+        self.was_enabled = perf.is_enabled()
+        perf.reset()
+
+    def tearDown(self):
+        perf.enable(self.was_enabled)
+        perf.reset()
+
+    def test_disabled_records_nothing(self):
+        perf.enable(False)
+        with perf.span('block'):
+            pass
+        perf.timed('call')(lambda: None)()
+        self.assertEqual(perf.snapshot(), {})
+
+    def test_span_and_timed_record(self):
+        perf.enable(True)
+        for _ in range(3):
+            with perf.span('block'):
+                time.sleep(0.001)
+
+        @perf.timed('call')
+        def fails():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            fails()
+        self.assertEqual(perf.get('block').count, 3)
+        self.assertGreaterEqual(perf.get('block').max, 0.001)
+        self.assertEqual(perf.get('call').count, 1)
+
+    def test_histogram_export(self):
+        perf.enable(True)
+        for seconds in (0.0005, 0.001, 0.002, 0.1):
+            perf.record('save_labels', seconds)
+        stats = perf.get('save_labels')
+        self.assertLessEqual(stats.percentile(0.5), 0.002)
+        self.assertEqual(stats.percentile(1.0), 0.1)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'perf.json')
+            perf.export_histograms(path)
+            with open(path) as f:
+                exported = json.load(f)['spans']['save_labels']
+        self.assertEqual(exported['count'], 4)
+        self.assertEqual(sum(exported['histogram_us'].values()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,25 @@
 
-from unittest import TestCase
+import os
+from unittest import TestCase, mock
 
 from labelImg import get_main_app
+from libs.shape import Shape
+
+
+class TestArguments(TestCase):
+
+    def main_window_args(self, *args):
+        with mock.patch('labelImg.MainWindow') as main_window:
+            app, _win = get_main_app(['labelImg.py'] + list(args))
+        app.quit()
+        return main_window.call_args.args
+
+    def test_remote_image_dir_is_kept(self):
+        self.assertEqual(self.main_window_args('s3://bucket/images')[0], 's3://bucket/images')
+
+    def test_local_image_dir_is_normalized(self):
+        image_dir = os.path.join('images', 'sub', '..')
+        self.assertEqual(self.main_window_args(image_dir)[0], 'images')
 
 
 class TestMainWindow(TestCase):
@@ -18,3 +36,19 @@ class TestMainWindow(TestCase):
 
     def test_noop(self):
         pass
+
+    def test_label_model_visibility(self):
+        shapes = [Shape(label='dog'), Shape(label='cat')]
+        self.win.canvas.load_shapes(shapes)
+        self.win.label_model.set_shapes(shapes)
+        self.assertEqual(self.win.label_model.labels(), ['dog', 'cat'])
+
+        self.win.toggle_polygons(False)
+        self.assertFalse(any(self.win.canvas.isVisible(s) for s in shapes))
+
+        self.win.label_model.set_visible_where(lambda shape: shape.label == 'cat')
+        self.assertFalse(self.win.canvas.isVisible(shapes[0]))
+        self.assertTrue(self.win.canvas.isVisible(shapes[1]))
+
+        self.win.remove_label(shapes[0])
+        self.assertEqual(self.win.label_model.labels(), ['cat'])
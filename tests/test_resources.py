@@ -0,0 +1,23 @@
+import subprocess
+import unittest
+from unittest import mock
+
+from libs import compile_resources
+
+
+class TestCompileResources(unittest.TestCase):
+
+    def test_missing_rcc_says_how_to_build(self):
+        with mock.patch.object(subprocess, 'run', side_effect=FileNotFoundError('pyside6-rcc')):
+            with self.assertRaisesRegex(ImportError, 'make resources'):
+                compile_resources()
+
+    def test_failed_rcc_reports_its_error(self):
+        error = subprocess.CalledProcessError(1, 'pyside6-rcc', stderr=b'bad qrc')
+        with mock.patch.object(subprocess, 'run', side_effect=error):
+            with self.assertRaisesRegex(ImportError, 'bad qrc'):
+                compile_resources()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from libs import storage
+from libs.s3_storage import S3Storage
+
+
+class PreconditionFailed(Exception):
+    """Like botocore's ClientError for an If-Match that does not match."""
+    response = {'Error': {'Code': 'PreconditionFailed'}}
+
+
+class FakeS3Client(object):
+    """In-memory stand-in for a boto3 S3 client, paging listings like MinIO."""
+
+    def __init__(self, objects, page_size=2):
+        self.objects = dict(objects)
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.gets = []
+        self.heads = 0
+        self.lists = 0
+
+    def etag(self, key):
+        return '"%s"' % hashlib.md5(self.objects[key]).hexdigest()
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None):
+        with self.lock:
+            self.lists += 1
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + self.page_size]
+        result = {
+            'Contents': [{'Key': key, 'Size': len(self.objects[key]), 'ETag': self.etag(key)}
+                         for key in page],
+            'IsTruncated': start + self.page_size < len(keys),
+        }
+        if result['IsTruncated']:
+            result['NextContinuationToken'] = str(start + self.page_size)
+        return result
+
+    def head_object(self, Bucket, Key):
+        with self.lock:
+            self.heads += 1
+        if Key not in self.objects:
+            raise LookupError('404 %s' % Key)
+        return {'ContentLength': len(self.objects[Key]), 'ETag': self.etag(Key)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        with self.lock:
+            self.gets.append((Key, Range))
+        if Key not in self.objects:
+            raise LookupError('NoSuchKey %s' % Key)
+        if IfMatch is not None and IfMatch != self.etag(Key):
+            raise PreconditionFailed()
+        data = self.objects[Key]
+        if Range is not None:
+            first, last = Range[len('bytes='):].split('-')
+            data = data[int(first):int(last) + 1]
+        return {'Body': io.BytesIO(data)}
+
+
+class TestS3Storage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+        self.client = FakeS3Client({
+            'set/a.jpg': b'a' * 100,
+            'set/b.PNG': bytes(range(256)) * 10,
+            'set/sub/c.jpg': b'c' * 30,
+            'set/notes.txt': b'text',
+            'other/d.jpg': b'd',
+        })
+        self.storages = []
+
+    def tearDown(self):
+        for s3 in self.storages:
+            s3.close()
+        storage.close_all()
+        self.tmp_dir.cleanup()
+
+    def open(self, **kwargs):
+        kwargs.setdefault('cache_dir', self.cache_dir)
+        kwargs.setdefault('data_dir', os.path.join(self.cache_dir, 'data'))
+        s3 = S3Storage('bucket', self.client, **kwargs)
+        self.storages.append(s3)
+        return s3
+
+    def test_listing_pages_and_prefix(self):
+        s3 = self.open()
+        images = s3.scan_images('s3://bucket/set', ('.jpg', '.png'))
+        self.assertEqual(sorted(images), ['s3://bucket/set/a.jpg', 's3://bucket/set/b.PNG',
+                                          's3://bucket/set/sub/c.jpg'])
+        self.assertEqual(self.client.lists, 2)
+        self.assertEqual(len(s3.scan_images('s3://bucket', ('.jpg',))), 3)
+        # Listed objects need no HEAD request.
+        self.assertTrue(s3.exists('s3://bucket/set/a.jpg'))
+        self.assertEqual(self.client.heads, 0)
+        self.assertFalse(s3.exists('s3://bucket/set/missing.jpg'))
+        self.assertFalse(s3.exists('s3://elsewhere/set/a.jpg'))
+        size, version = s3.stat('s3://bucket/set/a.jpg')
+        self.assertEqual(size, 100)
+        self.assertTrue(0 <= version < 1 << 63)
+
+    def test_ranged_reads_and_cache(self):
+        s3 = self.open(part_size=1000)
+        data = s3.read_bytes('s3://bucket/set/b.PNG')
+        self.assertEqual(data, self.client.objects['set/b.PNG'])
+        self.assertEqual(sorted(r for _, r in self.client.gets),
+                         ['bytes=0-999', 'bytes=1000-1999', 'bytes=2000-2559'])
+        self.assertEqual(s3.read_bytes('s3://bucket/set/a.jpg'), b'a' * 100)
+        self.assertEqual(self.client.gets[-1], ('set/a.jpg', None))
+
+        # Another session reads from the disk cache.
+        gets = len(self.client.gets)
+        again = self.open(part_size=1000)
+        self.assertEqual(again.read_bytes('s3://bucket/set/b.PNG'), data)
+        self.assertEqual(len(self.client.gets), gets)
+
+        # A changed object has a new ETag and is fetched again.
+        self.client.objects['set/a.jpg'] = b'A' * 100
+        self.assertEqual(self.open().read_bytes('s3://bucket/set/a.jpg'), b'A' * 100)
+        self.assertEqual(len(self.client.gets), gets + 1)
+
+        with self.assertRaises(KeyError):
+            s3.read_bytes('s3://bucket/set/missing.jpg')
+        # Listed, then gone: the failed GET surfaces as OSError.
+        s3.scan_images('s3://bucket/set', ('.jpg',))
+        del self.client.objects['set/sub/c.jpg']
+        with self.assertRaises(OSError):
+            s3.read_bytes('s3://bucket/set/sub/c.jpg')
+
+    def test_object_replaced_after_listing(self):
+        s3 = self.open(part_size=1000)
+        s3.scan_images('s3://bucket/set', ('.png',))
+        # Same size, new content: the pinned parts fail and the object is
+        # looked up and read again, never mixing the two versions.
+        new = bytes(reversed(range(256))) * 10
+        self.client.objects['set/b.PNG'] = new
+        self.assertEqual(s3.read_bytes('s3://bucket/set/b.PNG'), new)
+        self.assertEqual(self.client.heads, 1)
+
+    def test_read_ahead(self):
+        s3 = self.open()
+        paths = ['s3://bucket/set/a.jpg', 's3://bucket/set/sub/c.jpg', 's3://bucket/other/d.jpg']
+        s3.scan_images('s3://bucket', ('.jpg',))
+        s3.read_ahead(paths)
+        self.assertEqual(s3.read_bytes(paths[1]), b'c' * 30)
+        s3._ahead.shutdown(wait=True)
+        fetched = sorted(key for key, _ in self.client.gets)
+        self.assertEqual(fetched, ['other/d.jpg', 'set/a.jpg', 'set/sub/c.jpg'])
+        self.assertEqual(s3._pending, {})
+        for path in paths:
+            s3.read_bytes(path)
+        self.assertEqual(len(self.client.gets), 3)
+
+    def test_cache_eviction(self):
+        s3 = self.open(cache_bytes=120)
+        objects_dir = os.path.join(self.cache_dir, 'objects', 'bucket')
+        s3.read_bytes('s3://bucket/set/a.jpg')
+        oldest = os.listdir(objects_dir)[0]
+        os.utime(os.path.join(objects_dir, oldest), (0, 0))
+        s3.read_bytes('s3://bucket/other/d.jpg')
+        self.assertEqual(len(os.listdir(objects_dir)), 2)
+        # Past cache_bytes the least recently used object goes.
+        s3.read_bytes('s3://bucket/set/sub/c.jpg')
+        remaining = os.listdir(objects_dir)
+        self.assertNotIn(oldest, remaining)
+        self.assertEqual(len(remaining), 2)
+
+    def test_scheme_routing(self):
+        storage.register_scheme('s3', lambda bucket: self.open())
+        self.addCleanup(storage.register_scheme, 's3', storage._open_s3)
+        path = 's3://bucket/set/a.jpg'
+        self.assertTrue(storage.is_remote(path))
+        self.assertTrue(storage.is_dataset_root('s3://bucket/set'))
+        self.assertFalse(storage.is_local(path))
+        self.assertEqual(storage.absolute(path), path)
+        s3 = storage.storage_for(path)
+        self.assertIs(storage.root_storage('s3://bucket/set'), s3)
+        self.assertTrue(storage.exists(path))
+        self.assertEqual(storage.project_dir('s3://bucket/set/'),
+                         os.path.join(self.cache_dir, 'data', 'projects', 'bucket', 'set'))
+        self.assertTrue(storage.read_image(path).isNull())
+
+
+if __name__ == '__main__':
+    unittest.main()
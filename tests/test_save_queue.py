@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+libs_path = os.path.join(dir_name, '..', 'libs')
+sys.path.insert(0, libs_path)
+from save_queue import SaveQueue
+
+from libs import perf
+
+
+class TestSaveQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.done = []
+        self.queue = SaveQueue(on_done=lambda path, image_path, error: self.done.append((path, error)))
+
+    def tearDown(self):
+        self.queue.close()
+
+    def block_writer(self):
+        """Occupy the writer thread until the returned event is set."""
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(5)
+
+        self.queue.submit('hold.xml', 'hold.jpg', hold)
+        started.wait(5)
+        return release
+
+    def test_superseded_save_is_skipped(self):
+        written = []
+        release = self.block_writer()
+        self.queue.submit('a.xml', 'a.jpg', written.append, 'first')
+        self.queue.submit('b.xml', 'b.jpg', written.append, 'other')
+        self.queue.submit('a.xml', 'a.jpg', written.append, 'second')
+        self.assertTrue(self.queue.pending('a.xml'))
+        release.set()
+        self.queue.wait()
+        self.assertEqual(written, ['second', 'other'])
+        self.assertFalse(self.queue.pending())
+
+    def test_shared_file_keeps_every_image(self):
+        written = []
+        release = self.block_writer()
+        self.queue.submit('folder.json', 'a.jpg', written.append, 'a')
+        self.queue.submit('folder.json', 'b.jpg', written.append, 'b')
+        release.set()
+        self.queue.wait('folder.json')
+        self.assertEqual(written, ['a', 'b'])
+
+    def test_wait_only_blocks_on_that_file(self):
+        release = self.block_writer()
+        self.queue.wait('other.xml')
+        self.assertTrue(self.queue.pending('hold.xml'))
+        release.set()
+        self.queue.wait('hold.xml')
+        self.assertFalse(self.queue.pending('hold.xml'))
+
+    def test_errors_are_reported(self):
+        def fail():
+            raise IOError('disk full')
+
+        self.queue.submit('a.xml', 'a.jpg', fail)
+        self.queue.wait()
+        self.queue.close()
+        self.assertEqual(self.done[0][0], 'a.xml')
+        self.assertIsInstance(self.done[0][1], IOError)
+        with self.assertRaises(RuntimeError):
+            self.queue.submit('a.xml', 'a.jpg', fail)
+
+    def test_failed_saves_can_be_retried(self):
+        attempts = []
+
+        def flaky(name):
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise IOError('disk full')
+
+        self.queue.submit('a.xml', 'a.jpg', flaky, 'a')
+        self.queue.wait()
+        self.assertEqual(self.queue.failed(), [('a.xml', 'a.jpg')])
+        self.assertEqual(self.queue.retry_failed(), 1)
+        self.queue.wait()
+        self.assertEqual(attempts, ['a', 'a'])
+        self.assertEqual(self.queue.failed(), [])
+        self.assertIsNone(self.done[-1][1])
+
+        # A newer save of the same file replaces the failed one.
+        attempts.clear()
+        self.queue.submit('a.xml', 'a.jpg', flaky, 'old')
+        self.queue.wait()
+        self.queue.submit('a.xml', 'a.jpg', flaky, 'new')
+        self.queue.wait()
+        self.assertEqual(self.queue.failed(), [])
+        self.assertEqual(self.queue.retry_failed(), 0)
+
+        attempts.clear()
+        self.queue.submit('b.xml', 'b.jpg', flaky, 'b')
+        self.queue.wait()
+        self.assertTrue(self.queue.drop_failed('b.xml', 'b.jpg'))
+        self.assertFalse(self.queue.drop_failed('b.xml', 'b.jpg'))
+        self.assertEqual(self.queue.retry_failed(), 0)
+
+    def test_write_is_timed(self):
+        was_enabled = perf.is_enabled()
+        perf.enable(True)
+        perf.reset()
+        self.addCleanup(perf.enable, was_enabled)
+        self.addCleanup(perf.reset)
+        self.queue.submit('a.xml', 'a.jpg', time.sleep, 0.02)
+        self.queue.wait()
+        self.assertEqual(perf.get('save_labels').count, 1)
+        self.assertGreaterEqual(perf.get('save_labels').max, 0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
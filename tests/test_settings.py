@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import os
 import sys
+import tempfile
 import time
 import unittest
 
@@ -26,7 +27,33 @@ class TestSettings(unittest.TestCase):
         self.assertEqual(settings.get('test1'), 10)
 
         settings.reset()
-        
+
+    def test_save_later_coalesces_writes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            settings = Settings(save_delay=0.05)
+            settings.path = os.path.join(tmp_dir, 'settings.pkl')
+            for i in range(3):
+                settings['count'] = i
+                settings.save_later()
+            self.assertFalse(os.path.exists(settings.path))
+
+            time.sleep(0.5)
+            self.assertEqual(os.listdir(tmp_dir), ['settings.pkl'])
+            reloaded = Settings()
+            reloaded.path = settings.path
+            reloaded.load()
+            self.assertEqual(reloaded.get('count'), 2)
+
+    def test_save_cancels_pending_write(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            settings = Settings(save_delay=60)
+            settings.path = os.path.join(tmp_dir, 'settings.pkl')
+            settings['key'] = 'value'
+            settings.save_later()
+            self.assertTrue(settings.save())
+            self.assertIsNone(settings._timer)
+            self.assertEqual(os.listdir(tmp_dir), ['settings.pkl'])
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,30 @@
+import unittest
+
+from libs.startup_profile import parse_importtime, summarize
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       542 |        628 |   codecs
+import time:       300 |        300 |     sqlalchemy.util
+import time:      1200 |       1500 |   sqlalchemy
+import time:        80 |         80 |   libs.constants
+unrelated output
+"""
+
+
+class TestStartupProfile(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        entries = parse_importtime(IMPORTTIME)
+        self.assertEqual(entries[0], ('codecs', 542, 628, 0))
+        self.assertEqual(entries[1], ('sqlalchemy.util', 300, 300, 1))
+        self.assertEqual(len(entries), 4)
+
+    def test_summarize_groups_by_package(self):
+        lines = summarize(parse_importtime(IMPORTTIME))
+        self.assertEqual(lines[0], 'Imports: 4 modules, 2.1 ms')
+        self.assertIn('        1.5 ms  sqlalchemy', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
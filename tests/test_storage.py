@@ -0,0 +1,122 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from PyQt6.QtCore import QBuffer, QIODevice
+from PyQt6.QtGui import QColor, QImage
+
+from libs import storage
+from libs.archive_storage import INDEX_FILE, ArchiveStorage
+
+
+def png_bytes(width, height):
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(10, 200, 30))
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(buffer.data())
+
+
+class TestArchiveStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        self.files = {
+            'images/a.png': png_bytes(16, 8),
+            'images/sub/b.png': png_bytes(4, 4),
+            'notes.txt': b'not an image',
+        }
+
+    def tearDown(self):
+        storage.close_all()
+        self.tmp_dir.cleanup()
+
+    def make_zip(self):
+        path = os.path.join(self.dir, 'set.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for i, (name, data) in enumerate(self.files.items()):
+                method = zipfile.ZIP_DEFLATED if i % 2 else zipfile.ZIP_STORED
+                archive.writestr(name, data, compress_type=method)
+        return path
+
+    def make_tar(self, mode='w'):
+        path = os.path.join(self.dir, 'set.tar' if mode == 'w' else 'set.tar.gz')
+        with tarfile.open(path, mode) as archive:
+            for name, data in self.files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return path
+
+    def check(self, path):
+        self.assertTrue(storage.is_archive(path))
+        archive = storage.open_archive(path)
+        images = archive.scan_images(path, ('.png',))
+        self.assertEqual(images, [os.path.join(path, 'images', 'a.png'),
+                                  os.path.join(path, 'images', 'sub', 'b.png')])
+        for name, data in self.files.items():
+            member_path = os.path.join(path, *name.split('/'))
+            self.assertIs(storage.storage_for(member_path), archive)
+            self.assertEqual(archive.read_bytes(member_path), data)
+        self.assertFalse(storage.exists(os.path.join(path, 'missing.png')))
+        image = storage.read_image(images[0])
+        self.assertEqual((image.width(), image.height()), (16, 8))
+        self.assertTrue(storage.read_image(os.path.join(path, 'missing.png')).isNull())
+        # Headers are read without decoding the image.
+        self.assertEqual(storage.image_reader(images[1]).size().width(), 4)
+        self.assertIsNone(storage.image_reader(os.path.join(path, 'missing.png')))
+        self.assertEqual(storage.stat(images[1])[0], len(self.files['images/sub/b.png']))
+
+    def test_zip(self):
+        self.check(self.make_zip())
+
+    def test_tar(self):
+        self.check(self.make_tar())
+
+    def test_index_is_persisted(self):
+        path = self.make_zip()
+        index_dir = storage.sidecar_dir(path)
+        ArchiveStorage(path, index_dir).close()
+        self.assertTrue(os.path.isfile(os.path.join(index_dir, INDEX_FILE)))
+
+        original = ArchiveStorage._build_index
+        ArchiveStorage._build_index = lambda self: self.fail_build()
+        try:
+            archive = ArchiveStorage(path, index_dir)
+        finally:
+            ArchiveStorage._build_index = original
+        self.assertEqual(archive.read_bytes(os.path.join(path, 'notes.txt')), b'not an image')
+        archive.close()
+
+        # A changed archive is indexed again.
+        self.files['images/c.png'] = png_bytes(2, 2)
+        os.remove(path)
+        self.make_zip()
+        archive = ArchiveStorage(path, index_dir)
+        self.assertIn('images/c.png', archive.members)
+        archive.close()
+
+    def test_compressed_tar_refused(self):
+        with self.assertRaises(ValueError):
+            ArchiveStorage(self.make_tar('w:gz'), self.dir)
+
+    def test_plain_paths(self):
+        path = os.path.join(self.dir, 'plain.png')
+        with open(path, 'wb') as f:
+            f.write(self.files['images/a.png'])
+        self.assertIsNone(storage.archive_of(path))
+        self.assertIs(storage.storage_for(path), storage.LOCAL)
+        self.assertFalse(storage.is_archive(path))
+        self.assertEqual(storage.read_image(path).width(), 16)
+        # A directory named like an archive is a plain directory.
+        os.makedirs(os.path.join(self.dir, 'fake.zip'))
+        self.assertIsNone(storage.archive_of(os.path.join(self.dir, 'fake.zip', 'x.png')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import tempfile
+import unittest
+
+from PyQt6.QtCore import QPointF
+
+from libs.database import Image, init_db, UndoHistory
+from libs.shape import Shape
+from libs.undo_journal import UndoJournal
+from libs.undo_manager import CreateShapeCommand, MoveShapeCommand, UndoManager
+
+
+class CanvasStub:
+    def __init__(self, shapes):
+        self.shapes = shapes
+        self.selected_shape = None
+
+    def repaint(self):
+        pass
+
+    def update(self):
+        pass
+
+
+def make_shape(label, x, y):
+    shape = Shape(label=label)
+    shape.points = [QPointF(x, y), QPointF(x + 10, y), QPointF(x + 10, y + 10), QPointF(x, y + 10)]
+    shape.close()
+    return shape
+
+
+class TestUndoJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.Session = init_db(os.path.join(self.tmp_dir.name, 'labelImg.db'))
+
+    def tearDown(self):
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def count_rows(self):
+        session = self.Session()
+        try:
+            return session.query(UndoHistory).count()
+        finally:
+            session.close()
+
+    def test_log_is_written_in_background(self):
+        journal = UndoJournal(self.Session, flush_interval=0.01)
+        for i in range(100):
+            journal.log('Move/Edit Shape', {'step': i})
+        journal.flush()
+        self.assertEqual(self.count_rows(), 100)
+        journal.close()
+
+    def test_max_rows_bounds_table(self):
+        journal = UndoJournal(self.Session, flush_interval=0.01, max_rows=10)
+        for i in range(50):
+            journal.log('Move/Edit Shape', {'step': i})
+        journal.close()
+        self.assertEqual(self.count_rows(), 10)
+
+    def test_disabled_manager_has_no_journal(self):
+        session = self.Session()
+        manager = UndoManager(session, log_history=False)
+        self.assertIsNone(manager.journal)
+        manager.set_log_history(True)
+        self.assertIsNotNone(manager.journal)
+        manager.close()
+        session.close()
+
+
+class TestPersistentHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.Session = init_db(os.path.join(self.tmp_dir.name, 'labelImg.db'))
+        self.sessions = []
+        # Ingestion owns the image rows; the journal only looks them up.
+        session = self.Session()
+        session.add_all([Image(path='/data/a.jpg'), Image(path='/data/b.jpg')])
+        session.commit()
+        session.close()
+
+    def tearDown(self):
+        for session in self.sessions:
+            session.close()
+        self.Session.kw['bind'].dispose()
+        self.tmp_dir.cleanup()
+
+    def new_manager(self):
+        session = self.Session()
+        self.sessions.append(session)
+        return UndoManager(session)
+
+    def edit_image(self, path):
+        manager = self.new_manager()
+        dog = make_shape('dog', 0, 0)
+        canvas = CanvasStub([dog])
+        manager.open_image(path, canvas)
+        old_points = list(dog.points)
+        dog.points = [p + QPointF(5, 0) for p in dog.points]
+        manager.push(MoveShapeCommand(canvas, dog, old_points, dog.points))
+        cat = make_shape('cat', 50, 50)
+        manager.push(CreateShapeCommand(canvas, cat))
+        manager.close_image(canvas.shapes)
+        manager.close()
+
+    def test_history_is_replayed_after_restart(self):
+        self.edit_image('/data/a.jpg')
+
+        # Reload the saved annotation: same boxes, fresh shape objects.
+        manager = self.new_manager()
+        canvas = CanvasStub([make_shape('dog', 5, 0), make_shape('cat', 50, 50)])
+        manager.open_image('/data/a.jpg', canvas)
+        self.assertTrue(manager.can_undo())
+
+        manager.undo()
+        self.assertEqual([s.label for s in canvas.shapes], ['dog'])
+        manager.undo()
+        self.assertEqual(canvas.shapes[0].points[0], QPointF(0, 0))
+        manager.redo()
+        manager.redo()
+        self.assertEqual([s.label for s in canvas.shapes], ['dog', 'cat'])
+        self.assertEqual(canvas.shapes[0].points[0], QPointF(5, 0))
+        manager.close()
+
+    def test_changed_annotation_discards_history(self):
+        self.edit_image('/data/a.jpg')
+
+        manager = self.new_manager()
+        canvas = CanvasStub([make_shape('dog', 30, 30)])
+        manager.open_image('/data/a.jpg', canvas)
+        self.assertFalse(manager.can_undo())
+        manager.close()
+
+        session = self.Session()
+        self.sessions.append(session)
+        self.assertEqual(session.query(UndoHistory).count(), 0)
+
+    def test_unknown_image_gets_no_row(self):
+        self.edit_image('/data/new.jpg')
+        session = self.Session()
+        self.sessions.append(session)
+        self.assertIsNone(session.query(Image).filter_by(path='/data/new.jpg').first())
+        self.assertEqual(session.query(UndoHistory).count(), 0)
+
+    def test_snapshot_compacts_history(self):
+        manager = self.new_manager()
+        manager.close()
+        manager.journal = UndoJournal(self.Session, flush_interval=0.01, max_depth=3)
+        dog = make_shape('dog', 0, 0)
+        canvas = CanvasStub([dog])
+        manager.open_image('/data/b.jpg', canvas)
+        for i in range(10):
+            old_points = list(dog.points)
+            dog.points = [p + QPointF(1, 0) for p in dog.points]
+            manager.push(MoveShapeCommand(canvas, dog, old_points, dog.points))
+        manager.close_image(canvas.shapes)
+        manager.close()
+
+        session = self.Session()
+        self.sessions.append(session)
+        self.assertEqual(session.query(UndoHistory).count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
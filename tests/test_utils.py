@@ -1,7 +1,7 @@
 import os
 import sys
 import unittest
-from libs.utils import Struct, new_action, new_icon, add_actions, format_shortcut, generate_color_by_text, natural_sort
+from libs.utils import Struct, new_action, new_icon, add_actions, format_shortcut, generate_color_by_text, natural_sort, set_color_palette
 
 class TestUtils(unittest.TestCase):
 
@@ -11,6 +11,20 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(res.red() >= 0)
         self.assertTrue(res.blue() >= 0)
 
+    def test_generateColorByText_returnsIndependentCopies(self):
+        first = generate_color_by_text('dog')
+        first.setRed(0)
+        second = generate_color_by_text('dog')
+        self.assertEqual(generate_color_by_text('dog').getRgb(), second.getRgb())
+        self.assertNotEqual(first.getRgb(), second.getRgb())
+
+    def test_colorPalette_overridesHash(self):
+        set_color_palette({'dog': '#102030'})
+        try:
+            self.assertEqual(generate_color_by_text('dog').getRgb(), (16, 32, 48, 100))
+        finally:
+            set_color_palette({})
+
     def test_nautalSort_noError(self):
         l1 = ['f1', 'f11', 'f3']
         expected_l1 = ['f1', 'f3', 'f11']